@@ -0,0 +1,288 @@
+"""
+Pelacakan pelanggar berulang.
+
+AbuseTracker menyimpan skor pelanggaran per user di memori dengan peluruhan
+eksponensial (ABUSE_HALF_LIFE_SECONDS). Begitu skor mencapai
+ABUSE_BLOCK_SCORE, user diblokir sementara: ABUSE_BLOCK_SECONDS untuk blok
+pertama, dua kali lipat untuk tiap blok berikutnya dalam 24 jam (maksimal
+ABUSE_MAX_BLOCK_SECONDS). Blok dicatat di tabel abuse_blocks dan diumumkan
+lewat bus invalidasi, jadi semua worker menolak user itu tanpa perlu
+menjalankan scan regex/keyword lagi; cek-nya cukup satu lookup dict.
+
+SecurityEventLog menggantikan insert security_log per event: event identik
+(user, jenis, detail) dijumlahkan di memori dan ditulis sebagai satu baris
+ber-count tiap SECURITY_LOG_FLUSH_SECONDS. Bila flush gagal, event dikembalikan
+ke antrian; antrian dibatasi SECURITY_LOG_MAX_PENDING baris dan yang tertua
+dibuang lebih dulu, jadi database yang mati tidak membuat memori terus naik.
+"""
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from config import (
+    ABUSE_BLOCK_SCORE, ABUSE_HALF_LIFE_SECONDS, ABUSE_BLOCK_SECONDS, ABUSE_MAX_BLOCK_SECONDS,
+    SECURITY_LOG_FLUSH_SECONDS, SECURITY_LOG_MAX_PENDING
+)
+from database import get_connection
+from invalidation import register_cache, publish
+
+VIOLATION_WEIGHTS = {
+    "prompt_injection": 4,
+    "harmful_content": 4,
+    "length_exceeded": 1,
+    "rate_limit": 1,
+}
+
+
+class AbuseTracker:
+    def __init__(self):
+        self.scores = {}
+        self.blocks = {}
+        self.loaded = False
+        self.fast_rejects = 0
+        self.blocks_issued = 0
+        self.lock = threading.Lock()
+
+    def blocked_for(self, user_id: str) -> float:
+        """Sisa detik blok user (0 bila tidak diblokir)."""
+        if not self.loaded:
+            self.load()
+        with self.lock:
+            until = self.blocks.get(user_id)
+            if until is None:
+                return 0
+            remaining = until - time.time()
+            if remaining <= 0:
+                self.blocks.pop(user_id, None)
+                return 0
+            self.fast_rejects += 1
+            return remaining
+
+    def record_violation(self, user_id: str, reason: str) -> float:
+        """Tambah skor user; mengembalikan durasi blok bila pelanggaran ini memicu blok."""
+        weight = VIOLATION_WEIGHTS.get(reason, 0)
+        if not weight:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            score, updated = self.scores.get(user_id, (0.0, now))
+            score = score * 0.5 ** ((now - updated) / ABUSE_HALF_LIFE_SECONDS) + weight
+            if score < ABUSE_BLOCK_SCORE:
+                self.scores[user_id] = (score, now)
+                if len(self.scores) > 10000:
+                    self._prune(now)
+                return 0
+            self.scores.pop(user_id, None)
+        return self.block(user_id, reason)
+
+    def _prune(self, now: float):
+        self.scores = {
+            user_id: (score, updated) for user_id, (score, updated) in self.scores.items()
+            if score * 0.5 ** ((now - updated) / ABUSE_HALF_LIFE_SECONDS) >= 0.5
+        }
+
+    def block(self, user_id: str, reason: str) -> float:
+        until = time.time() + ABUSE_BLOCK_SECONDS
+        strikes = 1
+        try:
+            conn = get_connection()
+            try:
+                cursor = conn.cursor()
+                # Blok berulang dalam 24 jam menggandakan durasi; dihitung di DB supaya konsisten antar worker.
+                cursor.execute(
+                    """INSERT INTO abuse_blocks (user_id, blocked_until, strikes, reason)
+                       VALUES (%(user_id)s, NOW() + %(base)s * INTERVAL '1 second', 1, %(reason)s)
+                       ON CONFLICT (user_id) DO UPDATE SET
+                           strikes = CASE WHEN abuse_blocks.blocked_until > NOW() - INTERVAL '1 day'
+                                          THEN abuse_blocks.strikes + 1 ELSE 1 END,
+                           blocked_until = NOW() + LEAST(%(cap)s, %(base)s * POWER(2,
+                               CASE WHEN abuse_blocks.blocked_until > NOW() - INTERVAL '1 day'
+                                    THEN abuse_blocks.strikes ELSE 0 END)) * INTERVAL '1 second',
+                           reason = EXCLUDED.reason,
+                           updated_at = NOW()
+                       RETURNING blocked_until, strikes""",
+                    {"user_id": user_id, "base": ABUSE_BLOCK_SECONDS, "cap": ABUSE_MAX_BLOCK_SECONDS, "reason": reason}
+                )
+                row = cursor.fetchone()
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+            until, strikes = row['blocked_until'].timestamp(), row['strikes']
+        except Exception as e:
+            logging.error(f"[ABUSE] Simpan blok {user_id} gagal, blok hanya berlaku di worker ini: {e}")
+
+        with self.lock:
+            self.blocks[user_id] = until
+            self.blocks_issued += 1
+        publish('abuse_blocks', f"{user_id}:{until}")
+        duration = until - time.time()
+        logging.warning(f"[ABUSE] User {user_id} diblokir {duration:.0f} detik ({reason}, strike {strikes})")
+        return duration
+
+    def unblock(self, user_id: str) -> dict:
+        """Cabut blok. Blok lokal dan di worker lain tetap dicabut walau database sedang bermasalah."""
+        with self.lock:
+            found = self.blocks.pop(user_id, 0) > time.time()
+        persisted = True
+        try:
+            conn = get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("UPDATE abuse_blocks SET blocked_until = NOW(), updated_at = NOW() WHERE user_id = %s", (user_id,))
+                found = found or cursor.rowcount > 0
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            persisted = False
+            logging.error(f"[ABUSE] Gagal mencabut blok user {user_id} di database: {e}")
+        publish('abuse_blocks', f"{user_id}:0")
+        return {"found": found, "persisted": persisted}
+
+    def on_invalidate(self, key):
+        """Handler bus invalidasi: key "user_id:until" dari worker lain, None = muat ulang dari DB."""
+        if key is None:
+            self.load()
+            return
+        user_id, until = key.rsplit(':', 1)
+        with self.lock:
+            if float(until) > time.time():
+                self.blocks[user_id] = float(until)
+            else:
+                self.blocks.pop(user_id, None)
+
+    def load(self):
+        self.loaded = True
+        try:
+            conn = get_connection(readonly=True)
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT user_id, blocked_until FROM abuse_blocks WHERE blocked_until > NOW()")
+                rows = cursor.fetchall()
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            logging.error(f"[ABUSE] Load blok aktif gagal: {e}")
+            return
+        with self.lock:
+            self.blocks = {row['user_id']: row['blocked_until'].timestamp() for row in rows}
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        with self.lock:
+            return {
+                "tracked": len(self.scores),
+                "blocked": sum(1 for until in self.blocks.values() if until > now),
+                "blocks_issued": self.blocks_issued,
+                "fast_rejects": self.fast_rejects
+            }
+
+    def active_blocks(self) -> list:
+        now = time.time()
+        with self.lock:
+            return [
+                {"user_id": user_id, "remaining_seconds": int(until - now)}
+                for user_id, until in sorted(self.blocks.items(), key=lambda item: item[1], reverse=True)
+                if until > now
+            ]
+
+
+class SecurityEventLog:
+    def __init__(self, flush_seconds: float = SECURITY_LOG_FLUSH_SECONDS, max_pending: int = SECURITY_LOG_MAX_PENDING):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.events = {}
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self._flush_thread = None
+
+    def record(self, user_id: str, event_type: str, details: str = ""):
+        now = datetime.now()
+        key = (user_id, event_type, details or "")
+        with self.lock:
+            event = self.events.get(key)
+            if event is None:
+                self.events[key] = [now, now, 1]
+                self._trim()
+            else:
+                event[1] = now
+                event[2] += 1
+            if self._flush_thread is None:
+                self._flush_thread = threading.Thread(target=self._flush_loop, name="security-log-flush", daemon=True)
+                self._flush_thread.start()
+
+    def _trim(self):
+        # Dipanggil dengan self.lock; dict urut sisip, jadi entri terdepan yang tertua.
+        overflow = len(self.events) - self.max_pending
+        if overflow <= 0:
+            return
+        for key in list(self.events)[:overflow]:
+            del self.events[key]
+        self.dropped += overflow
+        logging.warning(f"[SECURITY LOG] Antrian penuh ({self.max_pending}), {overflow} baris tertua dibuang")
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self) -> int:
+        with self.lock:
+            events, self.events = self.events, {}
+        if not events:
+            return 0
+
+        from psycopg2.extras import execute_values
+
+        rows = [key + tuple(values) for key, values in events.items()]
+        try:
+            conn = get_connection()
+            try:
+                cursor = conn.cursor()
+                execute_values(
+                    cursor,
+                    "INSERT INTO security_log (user_id, event_type, details, timestamp, last_seen, count) VALUES %s",
+                    rows
+                )
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+            logging.debug(f"[SECURITY LOG] Flushed {len(rows)} rows ({sum(row[5] for row in rows)} events)")
+            return len(rows)
+        except Exception as e:
+            logging.error(f"[SECURITY LOG] Flush failed, events dikembalikan: {e}")
+            with self.lock:
+                # Event yang gagal lebih tua dari yang masuk selama flush: taruh di depan.
+                for key, (first_seen, last_seen, count) in self.events.items():
+                    event = events.setdefault(key, [first_seen, last_seen, 0])
+                    event[0] = min(event[0], first_seen)
+                    event[1] = max(event[1], last_seen)
+                    event[2] += count
+                self.events = events
+                self._trim()
+            return 0
+
+_abuse_tracker_instance = None
+
+def get_abuse_tracker():
+    global _abuse_tracker_instance
+    if _abuse_tracker_instance is None:
+        _abuse_tracker_instance = AbuseTracker()
+        register_cache('abuse_blocks', _abuse_tracker_instance.on_invalidate)
+    return _abuse_tracker_instance
+
+_security_log_instance = None
+
+def get_security_log():
+    global _security_log_instance
+    if _security_log_instance is None:
+        _security_log_instance = SecurityEventLog()
+        atexit.register(_security_log_instance.flush)
+    return _security_log_instance
@@ -0,0 +1,162 @@
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from config import ANALYTICS_FLUSH_SECONDS, ANALYTICS_MAX_PENDING
+from database import get_connection, execute_query
+from rules import label_for_reply
+from tenants import current_tenant
+
+
+def topic_for(intent: str, reply_text: str, tenant=None) -> str:
+    tenant = tenant or current_tenant()
+    if intent == 'doctor_info':
+        names = [d['nama'] for d in tenant.all_doctors if d['nama'] in reply_text]
+        return ', '.join(names)[:255]
+    label = label_for_reply(reply_text, tenant)
+    if label and ':' in label:
+        return label.split(':', 1)[1]
+    for topic, answer in tenant.faq.items():
+        if answer in reply_text:
+            return topic
+    return ''
+
+
+class AnalyticsCollector:
+    def __init__(self, flush_seconds: float = ANALYTICS_FLUSH_SECONDS, max_pending: int = ANALYTICS_MAX_PENDING):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.counters = {}
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self._flush_thread = None
+
+    def record(self, intent: str, source: str, topic: str = '', latency_ms: float = 0,
+               prompt_tokens: int = 0, completion_tokens: int = 0, tenant_id: str | None = None):
+        hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+        key = (tenant_id or current_tenant().id, hour, intent, source, topic or '')
+        with self.lock:
+            counter = self.counters.get(key)
+            if counter is None:
+                counter = self.counters[key] = [0, 0, 0, 0]
+            counter[0] += 1
+            counter[1] += int(latency_ms)
+            counter[2] += prompt_tokens or 0
+            counter[3] += completion_tokens or 0
+            if self._flush_thread is None:
+                self._flush_thread = threading.Thread(target=self._flush_loop, name="analytics-flush", daemon=True)
+                self._flush_thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self) -> int:
+        with self.lock:
+            counters, self.counters = self.counters, {}
+        if not counters:
+            return 0
+
+        from psycopg2.extras import execute_values
+
+        rows = [key + tuple(values) for key, values in counters.items()]
+        try:
+            conn = get_connection()
+            try:
+                cursor = conn.cursor()
+                execute_values(
+                    cursor,
+                    """INSERT INTO chat_stats_hourly
+                       (tenant_id, hour, intent, source, topic, requests, latency_ms_total, prompt_tokens, completion_tokens)
+                       VALUES %s
+                       ON CONFLICT (tenant_id, hour, intent, source, topic) DO UPDATE SET
+                           requests = chat_stats_hourly.requests + EXCLUDED.requests,
+                           latency_ms_total = chat_stats_hourly.latency_ms_total + EXCLUDED.latency_ms_total,
+                           prompt_tokens = chat_stats_hourly.prompt_tokens + EXCLUDED.prompt_tokens,
+                           completion_tokens = chat_stats_hourly.completion_tokens + EXCLUDED.completion_tokens""",
+                    rows
+                )
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+            logging.debug(f"[ANALYTICS] Flushed {len(rows)} rollup rows")
+            return len(rows)
+        except Exception as e:
+            logging.error(f"[ANALYTICS] Flush failed, counters dikembalikan: {e}")
+            with self.lock:
+                for key, values in counters.items():
+                    counter = self.counters.setdefault(key, [0, 0, 0, 0])
+                    for i, value in enumerate(values):
+                        counter[i] += value
+                self._trim()
+            return 0
+
+    def _trim(self):
+        # Dipanggil dengan self.lock; key[1] = jam rollup, yang tertua dibuang lebih dulu.
+        overflow = len(self.counters) - self.max_pending
+        if overflow <= 0:
+            return
+        oldest = sorted(self.counters, key=lambda key: key[1])[:overflow]
+        for key in oldest:
+            del self.counters[key]
+        self.dropped += overflow
+        logging.warning(
+            f"[ANALYTICS] Antrian penuh ({self.max_pending}), {overflow} baris rollup dibuang "
+            f"(jam {oldest[0][1]:%Y-%m-%d %H:00} s/d {oldest[-1][1]:%Y-%m-%d %H:00})"
+        )
+
+
+def get_stats(hours: int = 24, tenant_id: str | None = None) -> dict:
+    """Statistik satu tenant (default: tenant request ini)."""
+    tenant_id = tenant_id or current_tenant().id
+    since = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    rows = execute_query(
+        """SELECT intent, source, topic, SUM(requests) AS requests, SUM(latency_ms_total) AS latency_ms_total,
+                  SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens
+           FROM chat_stats_hourly WHERE tenant_id = %s AND hour >= %s
+           GROUP BY intent, source, topic""",
+        (tenant_id, since),
+        fetch=True,
+        readonly=True
+    )
+
+    by_intent, by_source, by_topic = {}, {}, {}
+    totals = {"requests": 0, "latency_ms_total": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    for row in rows:
+        requests = int(row['requests'])
+        by_intent[row['intent']] = by_intent.get(row['intent'], 0) + requests
+        by_source[row['source']] = by_source.get(row['source'], 0) + requests
+        if row['topic']:
+            topic_key = f"{row['intent']}:{row['topic']}"
+            by_topic[topic_key] = by_topic.get(topic_key, 0) + requests
+        for field in totals:
+            totals[field] += int(row[field])
+
+    llm_bound = by_source.get('llm', 0) + by_source.get('cache', 0) + by_source.get('fallback', 0)
+    return {
+        "success": True,
+        "tenant": tenant_id,
+        "hours": hours,
+        "since": since.isoformat(),
+        "requests": totals["requests"],
+        "avg_latency_ms": round(totals["latency_ms_total"] / totals["requests"], 1) if totals["requests"] else None,
+        "prompt_tokens": totals["prompt_tokens"],
+        "completion_tokens": totals["completion_tokens"],
+        "by_intent": by_intent,
+        "by_source": by_source,
+        "by_topic": dict(sorted(by_topic.items(), key=lambda item: item[1], reverse=True)),
+        "llm_fallback_rate": round(by_source.get('fallback', 0) / llm_bound, 4) if llm_bound else None
+    }
+
+_analytics_instance = None
+
+def get_analytics():
+    global _analytics_instance
+    if _analytics_instance is None:
+        _analytics_instance = AnalyticsCollector()
+        atexit.register(_analytics_instance.flush)
+    return _analytics_instance
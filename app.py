@@ -1,16 +1,24 @@
-import os
+import io
 import logging
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from flask_cors import CORS
-from dotenv import load_dotenv
+from flask import Flask, Response, request, jsonify, session, redirect, url_for, send_from_directory
 from datetime import timedelta
 
-from database import get_db, init_db, close_connection, execute_query
-from auth import create_user, authenticate_user, create_session, get_current_user, logout_user, login_required
-from llm import call_llm
-from rules import generate_chatty_response, doctors_db, INFO_FAQ
-from security import check_security, sanitize_output, get_user_id
-from data import HOSPITAL_NAME
+from config import SECRET_KEY, SESSION_MODE, DB_REPLICAS, CORS_ORIGINS, FLASK_DEBUG, HOST, PORT, PROFILE_DIR
+from database import get_db, init_db, close_connection, execute_query, get_replica_router, mark_write
+from auth import create_user, authenticate_user, create_session, get_current_user, logout_user, login_required, admin_required, group_admin_required, get_revocation_list, check_session_config
+from llm import log_config as log_llm_config, get_backend_pool, get_singleflight, get_model_router
+from retrieval import get_retriever
+from history import get_history_page, parse_export_filters, stream_export
+from analytics import get_stats
+from chat_service import process_message
+from abuse import get_abuse_tracker
+from assets import asset_url, render_page, get_asset_manifest
+from ws_chat import handle_chat_socket, get_socket_stats
+from serve import process_memory
+from invalidation import get_invalidation_bus
+from profiling import init_profiling, list_profiles
+from bulk_io import IMPORT_SPECS, import_file, stream_export as stream_bulk_export, refresh_doctor_roster
+from tenants import init_tenancy, current_tenant, get_tenant_registry, memory_report, thaw
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,50 +29,52 @@ logging.basicConfig(
     ]
 )
 
-load_dotenv()
+check_session_config()
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
-app.secret_key = os.getenv('SECRET_KEY', 'change_this_in_production')
+app.secret_key = SECRET_KEY
 app.permanent_session_lifetime = timedelta(days=7)
-CORS(app)
+app.jinja_env.globals['asset_url'] = asset_url
+init_profiling(app)
+init_tenancy(app)
+if CORS_ORIGINS:
+    # UI dilayani dari origin yang sama; flask_cors hanya dimuat bila origin lain diizinkan.
+    from flask_cors import CORS
+    CORS(app, origins=CORS_ORIGINS, supports_credentials=True)
 
 logging.info("=" * 50)
 logging.info("STARTING RS CHATBOT - VERSION 4.0 AUTH + POSTGRES")
-logging.info(f"Hospital: {HOSPITAL_NAME}")
+logging.info(f"Hospitals: {', '.join(t.name for t in get_tenant_registry().all())}")
+log_llm_config()
 logging.info("=" * 50)
 
+get_retriever()
+
 @app.before_request
 def setup_database():
     if not hasattr(app, '_db_initialized'):
         init_db(app)
+        refresh_doctor_roster()
         app._db_initialized = True
+    get_invalidation_bus().start()
 
 @app.teardown_appcontext
 def teardown_database(exception):
     close_connection(exception)
 
-def log_security_event(user_id: str, event_type: str, details: str = ""):
-    try:
-        execute_query(
-            "INSERT INTO security_log (user_id, event_type, details) VALUES (%s, %s, %s)",
-            (user_id, event_type, details)
-        )
-    except Exception as e:
-        logging.error(f"[SECURITY LOG] Failed: {e}")
-
 @app.route('/login')
 def login():
-    user = get_current_user(get_db())
+    user = get_current_user()
     if user:
         return redirect(url_for('index'))
-    return render_template('login.html')
+    return render_page('login.html')
 
 @app.route('/signup')
 def signup():
-    user = get_current_user(get_db())
+    user = get_current_user()
     if user:
         return redirect(url_for('index'))
-    return render_template('signup.html')
+    return render_page('signup.html')
 
 @app.route('/api/auth/signup', methods=['POST'])
 def api_signup():
@@ -77,8 +87,8 @@ def api_signup():
     result = create_user(db, data['email'], data['password'], data['name'])
     
     if result['success']:
+        create_session(db, result['user'])
         result['user'] = result['user'].to_dict()
-        create_session(db, result['user']['id'])
     
     return jsonify(result)
 
@@ -93,124 +103,194 @@ def api_login():
     result = authenticate_user(db, data['email'], data['password'])
     
     if result['success']:
-        create_session(db, result['user'].id)
+        create_session(db, result['user'])
         result['user']=result['user'].to_dict()
     
     return jsonify(result)
 
 @app.route('/api/auth/logout', methods=['POST'])
 def api_logout():
-    db = get_db()
-    logout_user(db)
+    logout_user()
     return jsonify({"success": True, "message": "Logout berhasil"})
 
 @app.route('/api/auth/me', methods=['GET'])
 def api_me():
-    db = get_db()
-    user = get_current_user(db)
+    user = get_current_user()
     
     if user:
-        return jsonify({"success": True, "user": user.tp_dict()})
+        return jsonify({"success": True, "user": user.to_dict()})
     else:
         return jsonify({"success": False, "message": "Not authenticated"})
 
 @app.route('/')
 @login_required
 def index():
-    return render_template('index.html')
+    return render_page('index.html')
+
+@app.route('/assets/<path:filename>')
+def built_asset(filename):
+    return get_asset_manifest().response(filename)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "version": "4.0-auth"})
+    llm_state = get_backend_pool().get_state()
+    llm_state["coalescing"] = get_singleflight().get_stats()
+    llm_state["routing"] = get_model_router().get_state()
+    worker = process_memory()
+    if SESSION_MODE == 'signed':
+        worker["revocation"] = get_revocation_list().get_stats()
+    if DB_REPLICAS:
+        worker["db"] = get_replica_router().get_state()
+    worker["invalidation"] = get_invalidation_bus().get_stats()
+    worker["websocket"] = get_socket_stats()
+    worker["abuse"] = get_abuse_tracker().get_stats()
+    if llm_state["available"] == 0:
+        return jsonify({"status": "degraded", "version": "4.0-auth", "llm": llm_state, "worker": worker}), 503
+    return jsonify({"status": "healthy", "version": "4.0-auth", "llm": llm_state, "worker": worker})
+
+@app.route('/api/admin/llm/backends', methods=['GET'])
+@group_admin_required
+def list_llm_backends():
+    return jsonify(get_backend_pool().get_state())
+
+@app.route('/api/admin/llm/backends', methods=['POST'])
+@group_admin_required
+def add_llm_backend():
+    data = request.get_json() or {}
+    url = data.get('url', '').strip()
+    if not url:
+        return jsonify({"success": False, "message": "URL backend wajib diisi"}), 400
+    added = get_backend_pool().add_backend(url)
+    return jsonify({"success": added, "message": "Backend ditambahkan" if added else "Backend sudah terdaftar"})
+
+@app.route('/api/admin/llm/backends', methods=['DELETE'])
+@group_admin_required
+def remove_llm_backend():
+    url = request.args.get('url', '').strip()
+    removed = get_backend_pool().remove_backend(url)
+    return jsonify({"success": removed, "message": "Backend dihapus" if removed else "Backend tidak ditemukan"})
+
+@app.route('/api/admin/cache/invalidate', methods=['POST'])
+@group_admin_required
+def invalidate_cache():
+    data = request.get_json() or {}
+    cache = data.get('cache', '').strip()
+    bus = get_invalidation_bus()
+    if cache not in bus.caches:
+        return jsonify({"success": False, "message": "Cache tidak dikenal", "caches": sorted(bus.caches)}), 400
+    bus.publish(cache, data.get('key'))
+    return jsonify({"success": True, "message": f"Invalidasi {cache} dikirim ke semua worker"})
+
+@app.route('/api/admin/abuse/blocks', methods=['GET'])
+@group_admin_required
+def list_abuse_blocks():
+    return jsonify({"success": True, "blocks": get_abuse_tracker().active_blocks()})
+
+@app.route('/api/admin/abuse/blocks', methods=['DELETE'])
+@group_admin_required
+def remove_abuse_block():
+    user_id = request.args.get('user_id', '').strip()
+    result = get_abuse_tracker().unblock(user_id)
+    if not result["persisted"]:
+        return jsonify({
+            "success": True, "partial": True,
+            "message": "Blok dicabut di semua worker, tapi gagal disimpan ke database; blok bisa aktif lagi saat daftar blok dimuat ulang"
+        })
+    return jsonify({"success": result["found"], "message": "Blok dicabut" if result["found"] else "User tidak sedang diblokir"})
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@group_admin_required
+def get_profiles():
+    return jsonify({"success": True, "profiles": list_profiles()})
+
+@app.route('/api/admin/profiles/<path:name>', methods=['GET'])
+@group_admin_required
+def download_profile(name):
+    return send_from_directory(PROFILE_DIR, name, as_attachment=True)
 
 @app.route('/api/chat', methods=['POST'])
 @login_required
 def chat():
     data = request.get_json()
-    user_input = data.get("message", "").strip()
-    
-    db = get_db()
-    user = get_current_user(db)
-    user_id = str(user.id)
-    
-    logging.info(f"[CHAT] User {user.email}: '{user_input[:50]}...'")
+    return jsonify(process_message(get_current_user(), data.get("message", "").strip()))
 
-    security_check = check_security(user_input, user_id)
-    
-    if not security_check["allowed"]:
-        log_security_event(
-            user_id, 
-            security_check["metadata"]["reason"],
-            security_check["metadata"].get("pattern", "")
-        )
-        logging.warning(f"[SECURITY] Blocked: {security_check['metadata']['reason']}")
-        return jsonify({
-            "reply": {
-                "intent": "security_blocked",
-                "reply": security_check["response"]
-            }
-        })
-    
-    if security_check["metadata"].get("contains_pii"):
-        log_security_event(
-            user_id,
-            "pii_detected",
-            f"Types: {', '.join(security_check['metadata']['pii_types'])}"
-        )
-    
-    sanitized_input = security_check["sanitized_input"]
-    disclaimer = security_check["disclaimer"]
-    
-    rule_reply = generate_chatty_response(sanitized_input, [])
-
-    if rule_reply:
-        logging.info("[CHAT] Rule-based response used")
-        reply_text = rule_reply.get("reply") if isinstance(rule_reply, dict) else str(rule_reply)
-        
-        if disclaimer:
-            reply_text += disclaimer
-            rule_reply["reply"] = reply_text
-        
-        execute_query(
-            "INSERT INTO chat_history (user_id, message, response) VALUES (%s, %s, %s)",
-            (user.id, user_input, reply_text)
-        )
-        
-        return jsonify({"reply": rule_reply})
-    
-    logging.info("[CHAT] No rule match, calling LLM")
-    llm_reply = call_llm(sanitized_input)
-
-    if llm_reply:
-        output_check = sanitize_output(llm_reply)
-        
-        if not output_check["safe"]:
-            log_security_event(user_id, "unsafe_llm_output", "Output sanitized")
-            final_reply = output_check["sanitized_text"]
-        else:
-            final_reply = llm_reply
-        
-        if disclaimer:
-            final_reply += disclaimer
-        
-        reply = {"intent": "llm", "reply": final_reply}
-        logging.info("[CHAT] LLM response used")
-        execute_query(
-            "INSERT INTO chat_history (user_id, message, response) VALUES (%s, %s, %s)",
-            (user.id, user_input, final_reply)
-        )
-    else:
-        reply = {
-            "intent": "fallback", 
-            "reply": "Maaf, saya belum bisa menjawab pertanyaan tersebut. Silakan hubungi staf RS untuk informasi lebih lanjut."
-        }
-        logging.warning("[CHAT] LLM failed, using fallback")
-        execute_query(
-            "INSERT INTO chat_history (user_id, message, response) VALUES (%s, %s, %s)",
-            (user.id, user_input, reply["reply"])
+@app.route('/ws/chat', websocket=True)
+def chat_socket():
+    return handle_chat_socket()
+
+@app.route('/api/chat/history', methods=['GET'])
+@login_required
+def chat_history():
+    user = get_current_user()
+    limit = request.args.get('limit', type=int) or 20
+    return jsonify(get_history_page(user.id, request.args.get('cursor'), limit))
+
+@app.route('/api/admin/chat/export', methods=['GET'])
+@admin_required
+def export_chat_history():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"success": False, "message": "Format harus ndjson atau csv"}), 400
+
+    try:
+        filters = parse_export_filters(request.args, current_tenant().id)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"chat_history.{'csv' if fmt == 'csv' else 'ndjson'}"
+    return Response(
+        stream_export(fmt, filters),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@app.route('/api/admin/bulk/<kind>/import', methods=['POST'])
+@admin_required
+def bulk_import(kind):
+    if kind not in IMPORT_SPECS:
+        return jsonify({"success": False, "message": f"Jenis harus salah satu dari: {', '.join(IMPORT_SPECS)}"}), 404
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({"success": False, "message": "File wajib diunggah (field file)"}), 400
+
+    filename = upload.filename or ''
+    fmt = request.form.get('format') or ('jsonl' if filename.endswith(('.jsonl', '.ndjson')) else 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({"success": False, "message": "Format harus csv atau jsonl"}), 400
+    try:
+        result = import_file(
+            kind, io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''), fmt,
+            owner_id=get_current_user().id, dry_run=request.form.get('dry_run') == '1',
+            tenant_id=current_tenant().id
         )
-    
-    return jsonify({"reply": reply})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if not result.get("dry_run"):
+        mark_write()
+    return jsonify({"success": True, **result})
+
+@app.route('/api/admin/bulk/<kind>/export', methods=['GET'])
+@admin_required
+def bulk_export(kind):
+    fmt = request.args.get('format', 'csv')
+    if kind not in IMPORT_SPECS or fmt not in ('csv', 'ndjson'):
+        return jsonify({"success": False, "message": "Jenis atau format tidak dikenal"}), 404
+    return Response(
+        stream_bulk_export(kind, fmt, current_tenant().id),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        headers={"Content-Disposition": f"attachment; filename={kind}.{fmt}"}
+    )
+
+@app.route('/api/admin/tenants', methods=['GET'])
+@group_admin_required
+def list_tenants():
+    return jsonify({"tenants": memory_report(), "process": process_memory()})
+
+@app.route('/api/admin/stats', methods=['GET'])
+@admin_required
+def admin_stats():
+    hours = min(max(request.args.get('hours', type=int) or 24, 1), 24 * 90)
+    return jsonify(get_stats(hours, current_tenant().id))
 
 @app.route('/api/book_appointment', methods=['POST'])
 @login_required
@@ -219,17 +299,17 @@ def book_appointment():
     if not all(k in data for k in ['patient_name', 'contact', 'doctor_id', 'date', 'time']):
         return jsonify({"status": "error", "message": "Data tidak lengkap"})
     
-    db = get_db()
-    user = get_current_user(db)
+    user = get_current_user()
     
     try:
         execute_query(
             """INSERT INTO appointments 
-               (user_id, patient_name, contact, doctor_id, appointment_date, appointment_time) 
-               VALUES (%s, %s, %s, %s, %s, %s)""",
-            (user.id, data['patient_name'], data['contact'], 
+               (tenant_id, user_id, patient_name, contact, doctor_id, appointment_date, appointment_time) 
+               VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+            (current_tenant().id, user.id, data['patient_name'], data['contact'], 
              data['doctor_id'], data['date'], data['time'])
         )
+        mark_write()
         return jsonify({"status": "success", "message": "Janji temu berhasil dibuat"})
     except Exception as e:
         logging.error(f"[BOOKING] Error: {e}")
@@ -237,12 +317,13 @@ def book_appointment():
 
 @app.route('/api/doctors', methods=['GET'])
 def get_doctors():
-    return jsonify(doctors_db['umum'] + doctors_db['psikiater'])
+    return jsonify(thaw(current_tenant().all_doctors))
 
 @app.route('/api/faq', methods=['GET'])
 def get_faq():
     topic = request.args.get('topic', '')
-    return jsonify({"reply": INFO_FAQ.get(topic, "Info tidak tersedia")})
+    return jsonify({"reply": current_tenant().faq.get(topic, "Info tidak tersedia")})
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Server development saja; untuk produksi jalankan: python serve.py
+    app.run(debug=FLASK_DEBUG, host=HOST, port=PORT)
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Serving aset hasil build_assets.py.
+
+File di ASSETS_DIST_DIR dimuat sekali ke memori (totalnya hanya puluhan KB,
+dan di serve.py ikut dibagi copy-on-write antar worker), lalu dilayani di
+/assets/<nama-ber-hash> dengan Cache-Control immutable, ETag, dan varian
+brotli/gzip sesuai Accept-Encoding. Halaman HTML diberi ETag + no-cache
+sehingga kunjungan ulang cukup dibalas 304.
+"""
+import os
+import json
+import logging
+import threading
+
+from flask import Response, abort, make_response, render_template, request, url_for
+
+from config import ASSETS_DIST_DIR
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+ENCODING_SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+
+class AssetManifest:
+    def __init__(self, dist_dir: str = ASSETS_DIST_DIR):
+        self.dist_dir = dist_dir
+        self.assets = {}
+        self.files = {}
+        self.bodies = {}
+        path = os.path.join(dist_dir, 'manifest.json')
+        if not os.path.exists(path):
+            logging.info("[ASSETS] Manifest tidak ada, aset dilayani dari /static (jalankan build_assets.py untuk produksi)")
+            return
+        with open(path) as f:
+            manifest = json.load(f)
+        self.assets = manifest["assets"]
+        self.files = manifest["files"]
+        for filename, entry in self.files.items():
+            for encoding in [None] + entry["encodings"]:
+                with open(os.path.join(dist_dir, filename + ENCODING_SUFFIX.get(encoding, '')), 'rb') as f:
+                    self.bodies[(filename, encoding)] = f.read()
+        logging.info(f"[ASSETS] {len(self.assets)} aset dimuat dari manifest ({sum(map(len, self.bodies.values()))} B)")
+
+    def url(self, name: str) -> str:
+        filename = self.assets.get(name)
+        if filename is None:
+            return url_for('static', filename=name)
+        return url_for('built_asset', filename=filename)
+
+    def response(self, filename: str) -> Response:
+        entry = self.files.get(filename)
+        if entry is None:
+            abort(404)
+
+        encoding = None
+        for candidate in entry["encodings"]:
+            if request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+        etag = entry["etag"] + (f"-{encoding}" if encoding else "")
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(self.bodies[(filename, encoding)], mimetype=entry["mimetype"])
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE
+        if entry["encodings"]:
+            response.vary.add("Accept-Encoding")
+        return response
+
+_asset_manifest_instance = None
+_asset_manifest_lock = threading.Lock()
+
+def get_asset_manifest():
+    global _asset_manifest_instance
+    if _asset_manifest_instance is None:
+        with _asset_manifest_lock:
+            if _asset_manifest_instance is None:
+                _asset_manifest_instance = AssetManifest()
+    return _asset_manifest_instance
+
+def asset_url(name: str) -> str:
+    return get_asset_manifest().url(name)
+
+def render_page(template: str, **context) -> Response:
+    """Render template dengan ETag; browser wajib revalidasi tapi dapat 304 bila tidak berubah."""
+    response = make_response(render_template(template, **context))
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.add_etag()
+    return response.make_conditional(request)
@@ -1,9 +1,18 @@
+import hmac
+import json
+import time
+import base64
 import hashlib
 import secrets
+import threading
 from datetime import datetime, timedelta
 from flask import session
 import logging
 
+from config import ADMIN_EMAILS, SESSION_MODE, SESSION_SIGNING_KEY, SESSION_TTL_DAYS, REVOCATION_SYNC_SECONDS, DEFAULT_SECRET_KEY
+from invalidation import register_cache, publish
+
+
 def hash_password(password: str) -> str:
     salt = secrets.token_hex(16)
     pwd_hash = hashlib.sha256((password + salt).encode()).hexdigest()
@@ -18,6 +27,200 @@ def verify_password(password: str, hashed: str) -> bool:
 def generate_session_token() -> str:
     return secrets.token_urlsafe(32)
 
+
+def check_session_config():
+    """Tolak start bila SESSION_MODE=signed tanpa kunci rahasia sendiri.
+
+    Klaim token (termasuk email yang menentukan hak admin) hanya dilindungi
+    HMAC; dengan kunci kosong atau kunci default siapa pun bisa memalsukannya.
+    """
+    if SESSION_MODE != 'signed':
+        return
+    if not SESSION_SIGNING_KEY or SESSION_SIGNING_KEY == DEFAULT_SECRET_KEY:
+        raise RuntimeError(
+            "SESSION_MODE=signed butuh SESSION_SIGNING_KEY (atau SECRET_KEY) yang rahasia, "
+            "bukan kosong atau 'change_this_in_production'. "
+            "Buat dengan: python -c \"import secrets; print(secrets.token_urlsafe(48))\""
+        )
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _signature(payload: str) -> str:
+    return _b64encode(hmac.new(SESSION_SIGNING_KEY.encode(), payload.encode(), hashlib.sha256).digest())
+
+def sign_session_token(user, ttl_seconds: int = SESSION_TTL_DAYS * 86400) -> str:
+    """Token stateless (SESSION_MODE=signed): klaim JSON base64url + HMAC-SHA256, tanpa tabel sessions."""
+    claims = {
+        "uid": user.id,
+        "email": user.email,
+        "name": user.name,
+        "exp": int(time.time()) + ttl_seconds,
+        "jti": secrets.token_hex(12)
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f"{payload}.{_signature(payload)}"
+
+def decode_session_token(token: str) -> dict | None:
+    """Cek tanda tangan dan masa berlaku; status revocation dicek terpisah."""
+    payload, _, signature = token.partition('.')
+    if not signature or not hmac.compare_digest(signature, _signature(payload)):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+    if claims.get('exp', 0) < time.time():
+        return None
+    return claims
+
+def verify_session_token(token: str) -> dict | None:
+    claims = decode_session_token(token)
+    if claims is None or get_revocation_list().is_revoked(claims.get('jti')):
+        return None
+    return claims
+
+
+class RevocationList:
+    """jti token yang sudah logout, disalin dari tabel revoked_tokens ke memori tiap worker.
+
+    Hanya token yang belum kedaluwarsa yang disimpan, jadi ukurannya sebanding
+    dengan jumlah logout dalam SESSION_TTL_DAYS terakhir. Logout diumumkan
+    lewat bus invalidasi sehingga worker lain biasanya melihatnya dalam
+    hitungan milidetik; sync berkala tiap REVOCATION_SYNC_SECONDS tetap jalan
+    sebagai jaring pengaman bila notifikasi hilang.
+    """
+    def __init__(self, sync_seconds: float = REVOCATION_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self.revoked = {}
+        self.watermark = None
+        self.synced = False
+        self.syncs = 0
+        self.sync_errors = 0
+        self.lock = threading.Lock()
+        self._sync_thread = None
+
+    def is_revoked(self, jti: str) -> bool:
+        if not self.synced:
+            self.start()
+        return jti in self.revoked
+
+    def start(self):
+        with self.lock:
+            if self.synced:
+                return
+            self.synced = True
+        self.sync()
+        self._sync_thread = threading.Thread(target=self._sync_loop, name="revocation-sync", daemon=True)
+        self._sync_thread.start()
+
+    def revoke(self, jti: str, expires: float):
+        with self.lock:
+            self.revoked[jti] = expires
+
+        from database import get_connection
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO revoked_tokens (jti, expires_at) VALUES (%s, %s) ON CONFLICT (jti) DO NOTHING",
+                (jti, datetime.fromtimestamp(expires))
+            )
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+    def on_invalidate(self, key):
+        """Handler bus invalidasi: key "jti:exp" dari logout di worker lain, None = sync ulang."""
+        if key is None:
+            self.sync()
+            return
+        jti, expires = key.rsplit(':', 1)
+        with self.lock:
+            self.revoked[jti] = float(expires)
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_seconds)
+            self.sync()
+
+    def sync(self):
+        from database import get_connection
+        try:
+            conn = get_connection(readonly=True)
+            try:
+                cursor = conn.cursor()
+                if self.watermark is None:
+                    cursor.execute("SELECT jti, expires_at, revoked_at FROM revoked_tokens WHERE expires_at > NOW()")
+                else:
+                    # Overlap supaya baris yang di-commit terlambat (revoked_at = awal transaksi) tetap terbaca.
+                    cursor.execute(
+                        "SELECT jti, expires_at, revoked_at FROM revoked_tokens WHERE revoked_at >= %s",
+                        (self.watermark - timedelta(seconds=max(60, self.sync_seconds * 2)),)
+                    )
+                rows = cursor.fetchall()
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            self.sync_errors += 1
+            logging.error(f"[AUTH] Revocation sync failed: {e}")
+            return
+
+        now = time.time()
+        with self.lock:
+            for row in rows:
+                self.revoked[row['jti']] = row['expires_at'].timestamp()
+                if self.watermark is None or row['revoked_at'] > self.watermark:
+                    self.watermark = row['revoked_at']
+            if self.watermark is None:
+                self.watermark = datetime.now()
+            self.revoked = {jti: exp for jti, exp in self.revoked.items() if exp > now}
+            purge = self.syncs % 720 == 0
+            self.syncs += 1
+
+        # Purge menulis ke primary; gagal di sini tidak membatalkan revocation yang sudah diterapkan.
+        if purge:
+            try:
+                self.purge_expired()
+            except Exception as e:
+                logging.warning(f"[AUTH] Purge revoked_tokens gagal: {e}")
+
+    def purge_expired(self):
+        from database import get_connection
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM revoked_tokens WHERE expires_at < NOW()")
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "revoked": len(self.revoked),
+                "syncs": self.syncs,
+                "sync_errors": self.sync_errors,
+                "watermark": self.watermark.isoformat() if self.watermark else None
+            }
+
+_revocation_list_instance = None
+
+def get_revocation_list():
+    global _revocation_list_instance
+    if _revocation_list_instance is None:
+        _revocation_list_instance = RevocationList()
+        register_cache('revoked_tokens', _revocation_list_instance.on_invalidate)
+    return _revocation_list_instance
+
+
 class User:
     def __init__(self, user_id, email, name, created_at=None):
         self.id = user_id
@@ -99,10 +302,19 @@ def authenticate_user(db, email: str, password: str) -> dict:
     finally:
         cursor.close()
 
-def create_session(db, user_id: int) -> str:
+def create_session(db, user: User) -> str:
+    user_id = user.id
+    if SESSION_MODE == 'signed':
+        session_token = sign_session_token(user)
+        session['session_token'] = session_token
+        session['user_id'] = user_id
+        session.permanent = True
+        logging.info(f"[AUTH] Signed session created for user{user_id}")
+        return session_token
+
     cursor = db.cursor()
     session_token = generate_session_token()
-    expires_at = datetime.now() + timedelta(days=7)
+    expires_at = datetime.now() + timedelta(days=SESSION_TTL_DAYS)
 
     try:
         cursor.execute(
@@ -110,6 +322,8 @@ def create_session(db, user_id: int) -> str:
             (user_id, session_token, expires_at)
         )
         db.commit()
+        from database import mark_write
+        mark_write()
 
         session['session_token'] = session_token
         session['user_id'] = user_id
@@ -125,12 +339,21 @@ def create_session(db, user_id: int) -> str:
     finally:
         cursor.close()
 
-def get_current_user(db) -> User:
+def get_current_user(db=None) -> User:
     session_token = session.get('session_token')
 
     if not session_token:
         return None
-    
+
+    if SESSION_MODE == 'signed':
+        claims = verify_session_token(session_token)
+        if not claims:
+            return None
+        return User(user_id=claims['uid'], email=claims['email'], name=claims['name'])
+
+    if db is None:
+        from database import get_read_db
+        db = get_read_db()
     cursor = db.cursor()
 
     try:
@@ -158,10 +381,23 @@ def get_current_user(db) -> User:
     finally:
         cursor.close()
 
-def logout_user(db):
+def logout_user(db=None):
     session_token = session.get('session_token')
 
-    if session_token:
+    if session_token and SESSION_MODE == 'signed':
+        claims = decode_session_token(session_token)
+        if claims:
+            try:
+                get_revocation_list().revoke(claims['jti'], claims['exp'])
+                publish('revoked_tokens', f"{claims['jti']}:{claims['exp']}")
+            except Exception as e:
+                logging.error(f"[AUTH] Revoke token error: {e}")
+        session.clear()
+        logging.info(f"[AUTH] User logged out")
+    elif session_token:
+        if db is None:
+            from database import get_db
+            db = get_db()
         cursor = db.cursor()
         try:
             cursor.execute(
@@ -169,6 +405,8 @@ def logout_user(db):
                 (session_token,)
             )
             db.commit()
+            from database import mark_write
+            mark_write()
         except:
             pass
         finally:
@@ -183,13 +421,50 @@ def login_required(f):
 
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        from database import get_db
-        db = get_db()
-        user = get_current_user(db)
+        user = get_current_user()
 
         if not user:
             return redirect(url_for('login'))
         
         return f(*args, **kwargs)
     
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def is_admin(user, tenant=None) -> bool:
+    """Admin tenant (default: tenant request ini); lihat `admins` di tenants.py."""
+    if user is None:
+        return False
+    if tenant is None:
+        from tenants import current_tenant
+        tenant = current_tenant()
+    return user.email.lower() in tenant.admins
+
+def is_group_admin(user) -> bool:
+    """Admin grup (ADMIN_EMAILS): pengaturan yang berlaku untuk seluruh proses, bukan data satu RS."""
+    return user is not None and user.email.lower() in ADMIN_EMAILS
+
+def _require(check):
+    from functools import wraps
+    from flask import jsonify
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user = get_current_user()
+
+            if not check(user):
+                return jsonify({"success": False, "message": "Akses admin diperlukan"}), 403
+
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
+
+def admin_required(f):
+    """Endpoint data tenant (export chat, statistik, import massal): admin tenant request ini."""
+    return _require(is_admin)(f)
+
+def group_admin_required(f):
+    """Endpoint yang memengaruhi semua tenant (backend LLM, cache, blok abuse, profiling)."""
+    return _require(is_group_admin)(f)
\ No newline at end of file
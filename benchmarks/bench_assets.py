@@ -0,0 +1,97 @@
+"""
+Benchmark aset halaman: byte yang ditransfer untuk kunjungan pertama dan
+kunjungan ulang ke /, /login dan /signup, dengan aset sumber (/static,
+tanpa build) vs hasil build_assets.py (/assets, immutable + brotli/gzip).
+
+Browser disimulasikan sederhana: respons dengan Cache-Control immutable
+tidak diminta lagi, sisanya direvalidasi dengan If-None-Match /
+If-Modified-Since. Aset CDN eksternal (tailwind, lucide, font) tidak
+dihitung. Tiap mode jalan di proses terpisah; SESSION_MODE=signed supaya
+tidak butuh Postgres.
+
+Jalankan dari root repo (build dulu untuk mode built):
+    python build_assets.py
+    python benchmarks/bench_assets.py
+"""
+import os
+import sys
+import json
+import secrets
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import re, json, logging
+logging.disable(logging.CRITICAL)
+import app as module, auth
+from auth import User, sign_session_token
+
+app = module.app
+app._db_initialized = True
+auth.get_revocation_list().synced = True
+guest = app.test_client()
+member = app.test_client()
+with member.session_transaction() as sess:
+    sess["session_token"] = sign_session_token(User(1, "bench@example.com", "Bench"))
+cache = {}
+
+def fetch(client, url):
+    cached = cache.get(url)
+    if cached and "immutable" in cached["cache_control"]:
+        return 0, 0
+    headers = {"Accept-Encoding": "br, gzip"}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
+    response = client.get(url, headers=headers)
+    body = response.get_data()
+    if response.status_code == 200:
+        cache[url] = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                      "cache_control": response.headers.get("Cache-Control", ""), "body": body}
+    return len(body), 1
+
+def visit(client, page):
+    transferred, requests = fetch(client, page)
+    html = cache[page]["body"].decode()
+    for url in re.findall(r'(?:src|href|data-avatar-url)="(/(?:static|assets)/[^"]+)"', html):
+        size, count = fetch(client, url)
+        transferred += size
+        requests += count
+    return transferred, requests
+
+result = {}
+# Aset bersama (logo) sudah ada di cache saat halaman berikutnya dibuka, seperti di browser.
+for page, client in (("/login", guest), ("/signup", guest), ("/", member)):
+    first = visit(client, page)
+    repeat = visit(client, page)
+    result[page] = {"first": first, "repeat": repeat}
+print(json.dumps(result))
+"""
+
+
+def run(dist_dir: str) -> dict:
+    env = dict(os.environ, SESSION_MODE='signed', SESSION_SIGNING_KEY=secrets.token_urlsafe(32),
+               INVALIDATION_BACKEND='none', ASSETS_DIST_DIR=dist_dir)
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    modes = {"source": os.path.join(ROOT, "static", "dist-does-not-exist")}
+    dist_dir = os.getenv('ASSETS_DIST_DIR', os.path.join(ROOT, 'static', 'dist'))
+    if os.path.exists(os.path.join(dist_dir, 'manifest.json')):
+        modes["built"] = dist_dir
+    else:
+        print("manifest.json tidak ditemukan, jalankan `python build_assets.py` untuk membandingkan mode built\n")
+
+    print(f"{'mode':<8} {'halaman':<8} {'kunjungan pertama':>22} {'kunjungan ulang':>22}")
+    for mode, path in modes.items():
+        for page, visits in run(path).items():
+            (first_bytes, first_requests), (repeat_bytes, repeat_requests) = visits["first"], visits["repeat"]
+            print(f"{mode:<8} {page:<8} {first_bytes:>10} B {first_requests:>2} request {repeat_bytes:>10} B {repeat_requests:>2} request")
+
+
+if __name__ == '__main__':
+    main()
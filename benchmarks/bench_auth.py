@@ -0,0 +1,85 @@
+"""
+Benchmark request terautentikasi: SESSION_MODE=db (query sessions JOIN users
+per request) vs SESSION_MODE=signed (token HMAC, dicek di memori). Tiap mode
+dijalankan di proses terpisah karena SESSION_MODE dibaca saat import.
+
+Jalankan dari root repo (butuh Postgres untuk mode db dan untuk membuat user):
+    python benchmarks/bench_auth.py
+    python benchmarks/bench_auth.py --skip-db     # hanya mode signed, tanpa database
+"""
+import os
+import sys
+import json
+import secrets
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_SIGNING_KEY = secrets.token_urlsafe(32)
+
+CHILD = """
+import json, time, uuid
+import app as module
+from auth import User, create_user, create_session, get_current_user
+
+app = module.app
+skip_db = {skip_db}
+if skip_db:
+    app._db_initialized = True
+    user = User(1, "bench@example.com", "Bench")
+else:
+    from database import get_db, init_db
+    init_db(app)
+    app._db_initialized = True
+    with app.app_context():
+        user = create_user(get_db(), f"bench-{{uuid.uuid4().hex[:8]}}@example.com", "bench-password", "Bench")["user"]
+
+client = app.test_client()
+with app.test_request_context():
+    token = create_session(None if skip_db else get_db(), user)
+with client.session_transaction() as sess:
+    sess["session_token"] = token
+    sess["user_id"] = user.id
+
+assert client.get("/api/auth/me").get_json()["success"]
+started = time.perf_counter()
+for _ in range({requests}):
+    client.get("/api/auth/me")
+elapsed = time.perf_counter() - started
+
+with app.test_request_context():
+    from flask import session
+    session["session_token"] = token
+    lookup_started = time.perf_counter()
+    for _ in range({requests}):
+        get_current_user()
+    lookup_elapsed = time.perf_counter() - lookup_started
+
+print(json.dumps({{"rps": {requests} / elapsed, "lookup_us": lookup_elapsed / {requests} * 1e6}}))
+"""
+
+
+def run(mode: str, requests: int, skip_db: bool) -> dict:
+    env = dict(os.environ, SESSION_MODE=mode, SESSION_SIGNING_KEY=BENCH_SIGNING_KEY)
+    code = CHILD.format(skip_db=skip_db, requests=requests)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"Mode {mode} gagal:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--skip-db', action='store_true')
+    args = parser.parse_args()
+
+    modes = ['signed'] if args.skip_db else ['db', 'signed']
+    print(f"{'mode':<8} {'req/s (/api/auth/me)':>21} {'get_current_user':>17}")
+    for mode in modes:
+        result = run(mode, args.requests, args.skip_db)
+        print(f"{mode:<8} {result['rps']:>21.0f} {result['lookup_us']:>14.1f} us")
+
+
+if __name__ == '__main__':
+    main()
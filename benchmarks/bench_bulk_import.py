@@ -0,0 +1,121 @@
+"""
+Benchmark import janji temu: bulk_io (COPY ke staging + validasi set-based +
+satu upsert) vs jalur baris-per-baris seperti /api/book_appointment (satu
+INSERT + commit per baris).
+
+File CSV berisi N baris (default 1 juta) dibuat di direktori temp; sekitar
+1% baris sengaja tidak valid supaya jalur reject ikut terukur. Jalur
+baris-per-baris dijalankan untuk sebagian kecil baris (--row-by-row) lalu
+diekstrapolasi ke N, kecuali --row-by-row diisi sama dengan --rows.
+Import kedua atas file yang sama mengukur upsert (semua baris jadi update).
+
+Butuh PostgreSQL sesuai DB_* di .env (pakai database terpisah untuk benchmark!).
+Jalankan dari root repo: python benchmarks/bench_bulk_import.py --rows 1000000
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_TENANT
+from data import doctors_db
+from database import get_connection, init_db
+from bulk_io import import_file
+
+
+def write_csv(path: str, rows: int, contacts: list):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["external_id", "patient_name", "contact", "doctor_id", "appointment_date", "appointment_time"])
+        for i in range(rows):
+            date = f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+            time_ = f"{8 + i % 9:02d}:{(i * 15) % 60:02d}"
+            if i % 100 == 99:
+                date = "besok"
+            writer.writerow([f"bench-{i}", f"Pasien {i}", f"0812-{i:08d}", contacts[i % len(contacts)], date, time_])
+
+
+def prepare() -> tuple:
+    from app import app
+    init_db(app)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """INSERT INTO users (email, password_hash, name) VALUES ('bench@example.com', 'x', 'Bench')
+           ON CONFLICT (email) DO UPDATE SET name = EXCLUDED.name RETURNING id"""
+    )
+    owner_id = cursor.fetchone()['id']
+    cursor.execute("SELECT kontak FROM doctors WHERE tenant_id = %s", (DEFAULT_TENANT,))
+    contacts = [row['kontak'] for row in cursor.fetchall()]
+    contacts = contacts or [doctor["kontak"] for doctor in doctors_db["umum"] + doctors_db["psikiater"]]
+    cursor.execute("DELETE FROM appointments WHERE external_id LIKE 'bench-%'")
+    conn.commit()
+    conn.close()
+    return owner_id, contacts
+
+
+def row_by_row(path: str, rows: int, owner_id: int) -> float:
+    conn = get_connection()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for i, row in enumerate(reader):
+            if i >= rows:
+                break
+            cursor.execute(
+                """INSERT INTO appointments
+                   (external_id, user_id, patient_name, contact, doctor_id, appointment_date, appointment_time)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+                (f"bench-rbr-{i}", owner_id, row["patient_name"], row["contact"].replace('-', ''),
+                 row["doctor_id"], row["appointment_date"], row["appointment_time"])
+            )
+            conn.commit()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--row-by-row', type=int, default=20_000, help="jumlah baris untuk jalur baris-per-baris")
+    parser.add_argument('--keep', action='store_true', help="jangan hapus baris benchmark di akhir")
+    args = parser.parse_args()
+
+    owner_id, contacts = prepare()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'appointments.csv')
+        started = time.perf_counter()
+        write_csv(path, args.rows, contacts)
+        print(f"CSV {args.rows} baris ({os.path.getsize(path) / 1e6:.1f} MB) dibuat dalam {time.perf_counter() - started:.1f} s\n")
+
+        results = []
+        for label in ("bulk import", "bulk re-import (upsert)"):
+            with open(path, newline='', encoding='utf-8') as f:
+                result = import_file('appointments', f, 'csv', owner_id)
+            results.append((label, result))
+            print(f"{label:<26} {result['seconds']:>8.1f} s  {args.rows / result['seconds']:>10,.0f} baris/s  "
+                  f"{result['inserted']} baru, {result['updated']} update, {result['rejected']} ditolak")
+
+        sample = min(args.row_by_row, args.rows)
+        elapsed = row_by_row(path, sample, owner_id)
+        rate = sample / elapsed
+        note = "" if sample == args.rows else f" (diukur {sample} baris, ekstrapolasi)"
+        print(f"{'baris-per-baris':<26} {args.rows / rate:>8.1f} s  {rate:>10,.0f} baris/s{note}")
+        print(f"\nBulk import {args.rows / rate / results[0][1]['seconds']:.0f}x lebih cepat")
+
+    if not args.keep:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM appointments WHERE external_id LIKE 'bench-%'")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
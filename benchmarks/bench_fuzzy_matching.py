@@ -0,0 +1,95 @@
+"""
+Benchmark normalisasi slang + koreksi typo di rule engine: waktu build
+indeks, latensi per kata, dan kenaikan hit rate rule pada korpus typo.
+
+Jalankan dari root repo: python benchmarks/bench_fuzzy_matching.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+import rules
+from text_normalizer import FuzzyMatcher
+
+CLEAN_QUERIES = [
+    "dimana toilet", "jadwal dokter anak", "igd buka jam berapa", "musholla dimana",
+    "apotek ada di lantai berapa", "laboratorium dimana", "registrasi pasien baru dimana",
+    "terima kasih kiko", "saya mau buat janji", "lokasi rumah sakit", "halo kiko",
+    "dokter psikiater siapa saja", "kasir dimana", "radiologi lantai berapa",
+]
+
+SLANG_QUERIES = [
+    "toilett dmn ya", "jdwal dokterr anak", "gmn cara bkin jnji", "mksh kiko",
+    "musolla dmn", "laboratorim lt brp", "registrsi dmn", "dok psikiaterr ada?",
+    "kamar kecil dmn", "apotik dmn ya", "hallo kiko", "kasirr dmn", "alamatnya dmn",
+]
+
+
+def misspell(text, rng):
+    words = text.split()
+    i = rng.randrange(len(words))
+    word = list(words[i])
+    if len(word) > 4:
+        j = rng.randrange(1, len(word))
+        op = rng.random()
+        if op < 0.4:
+            word.insert(j, word[j - 1])
+        elif op < 0.7:
+            del word[j]
+        else:
+            word[j - 1], word[j] = word[j], word[j - 1]
+    words[i] = "".join(word)
+    return " ".join(words)
+
+
+def hit_rate(app, queries, fuzzy):
+    rules.RULE_FUZZY_MATCHING = fuzzy
+    hits = 0
+    for query in queries:
+        with app.test_request_context():
+            if rules.generate_chatty_response(query, []):
+                hits += 1
+    return hits / len(queries)
+
+
+def main():
+    app = Flask(__name__)
+    app.secret_key = "bench"
+    rng = random.Random(7)
+    corpus = [misspell(q, rng) for q in CLEAN_QUERIES for _ in range(20)] + SLANG_QUERIES
+
+    # Matcher tenant berlapis (keyword rule, fasilitas, roster); diukur sebagai satu indeks utuh.
+    vocabulary = set().union(*(layer.vocabulary for layer in rules.get_fuzzy_matcher().layers))
+    builds = []
+    for _ in range(5):
+        started = time.perf_counter()
+        matcher = FuzzyMatcher(vocabulary)
+        builds.append(time.perf_counter() - started)
+
+    tokens = [t for q in corpus for t in q.split()]
+    cold = FuzzyMatcher(vocabulary)
+    started = time.perf_counter()
+    for token in tokens:
+        cold.correct(token)
+    cold_per_token = (time.perf_counter() - started) / len(tokens)
+    started = time.perf_counter()
+    for _ in range(20):
+        for token in tokens:
+            cold.correct(token)
+    warm_per_token = (time.perf_counter() - started) / (20 * len(tokens))
+
+    print(f"Vocabulary         : {len(matcher.vocabulary)} words, {len(matcher.deletes)} deletes")
+    print(f"Index build        : {min(builds) * 1000:.2f} ms")
+    print(f"Per token (cold)   : {cold_per_token * 1e6:.1f} us")
+    print(f"Per token (cached) : {warm_per_token * 1e6:.2f} us")
+    print(f"Corpus             : {len(corpus)} misspelled/slang queries")
+    print(f"Rule hit rate exact: {hit_rate(app, corpus, False):.1%}")
+    print(f"Rule hit rate fuzzy: {hit_rate(app, corpus, True):.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark budget generation adaptif: bandingkan num_predict tetap (300, tanpa
+batas kalimat) dengan num_predict per intent + early stop di kalimat ke-8.
+Mengukur token completion dan detik yang dihemat per request.
+
+Jalankan dari root repo:
+    python benchmarks/bench_generation_budget.py                 # Ollama di OLLAMA_BASE_URL
+    python benchmarks/bench_generation_budget.py --simulate      # server NDJSON tiruan
+
+Mode --simulate memakai server lokal yang mengalirkan kalimat sampai
+num_predict habis (TOKEN_DELAY detik per token), jadi angkanya hanya
+menggambarkan mekanisme pemotongan, bukan kecepatan model sebenarnya.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CORPUS = [
+    ("bagaimana cara mengurangi demam pada anak", None),
+    ("apa itu diabetes dan bagaimana mencegahnya", None),
+    ("saya sering susah tidur dan cemas, harus bagaimana", None),
+    ("apa bedanya dokter umum dan dokter spesialis penyakit dalam", "doctor_info"),
+    ("apakah saya perlu puasa sebelum cek darah di lab", "faq_nav:lab"),
+    ("bisakah keluarga menunggu pasien di IGD semalaman", "faq_nav:igd"),
+    ("kalau mau kontrol ulang harus daftar lagi atau tidak", "book_appointment"),
+    ("makasih ya kiko sudah dibantu", "smalltalk:thanks"),
+    ("kamu itu robot atau manusia sih", "bot_identity_name"),
+    ("apakah ada tempat parkir untuk ambulans pribadi", "location"),
+]
+
+TOKEN_DELAY = 0.01
+SENTENCE = ["Pasien ", "sebaiknya ", "berkonsultasi ", "dengan ", "dokter ", "untuk ", "pemeriksaan ", "lebih ", "lanjut", ". "]
+
+
+def start_simulator(port: int):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'{"models": []}')
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            limit = body["options"]["num_predict"]
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            sent = 0
+            try:
+                while sent < limit:
+                    token = SENTENCE[sent % len(SENTENCE)]
+                    self.wfile.write((json.dumps({"message": {"content": token}, "done": False}) + "\n").encode())
+                    self.wfile.flush()
+                    sent += 1
+                    time.sleep(TOKEN_DELAY)
+                self.wfile.write((json.dumps({
+                    "message": {"content": ""}, "done": True, "prompt_eval_count": 300, "eval_count": sent
+                }) + "\n").encode())
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}"
+
+
+def run(llm, adaptive: bool) -> list:
+    llm.LLM_MAX_SENTENCES = 8 if adaptive else 0
+    results = []
+    for question, intent in CORPUS:
+        payload = llm._build_payload(question, intent=intent)
+        if not adaptive:
+            payload["options"]["num_predict"] = 300
+        started = time.perf_counter()
+        result = llm._generate(payload)
+        elapsed = time.perf_counter() - started
+        if result is None:
+            raise SystemExit(f"LLM tidak menjawab: {question}")
+        results.append((question, result["completion_tokens"], elapsed, payload["options"]["num_predict"], result["stopped_early"]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--simulate', action='store_true', help="Pakai server Ollama tiruan")
+    parser.add_argument('--port', type=int, default=18434)
+    args = parser.parse_args()
+
+    if args.simulate:
+        os.environ['OLLAMA_BASE_URLS'] = start_simulator(args.port)
+    import llm
+
+    baseline = run(llm, adaptive=False)
+    adaptive = run(llm, adaptive=True)
+
+    print(f"{'question':<58} {'budget':>6} {'tok base':>8} {'tok new':>7} {'s base':>7} {'s new':>6}")
+    for (question, base_tokens, base_s, _, _), (_, new_tokens, new_s, budget, stopped) in zip(baseline, adaptive):
+        marker = "*" if stopped else " "
+        print(f"{question[:58]:<58} {budget:>6} {base_tokens:>8} {new_tokens:>6}{marker} {base_s:>7.2f} {new_s:>6.2f}")
+
+    n = len(CORPUS)
+    saved_tokens = sum(b[1] for b in baseline) - sum(a[1] for a in adaptive)
+    saved_seconds = sum(b[2] for b in baseline) - sum(a[2] for a in adaptive)
+    print()
+    print(f"Early stops        : {sum(1 for a in adaptive if a[4])}/{n} (*)")
+    print(f"Tokens saved / req : {saved_tokens / n:.1f}")
+    print(f"Seconds saved / req: {saved_seconds / n:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark export chat_history lewat named cursor: isi tabel sampai N baris
+(default 10 juta) lalu stream seluruhnya sebagai NDJSON/CSV sambil mencatat
+RSS proses. RSS harus tetap datar, tidak tumbuh mengikuti jumlah baris.
+
+Butuh PostgreSQL sesuai DB_* di .env (pakai database terpisah untuk benchmark!).
+Jalankan dari root repo: python benchmarks/bench_history_export.py --rows 10000000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection
+from history import stream_export
+
+
+def rss_mb() -> float:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def seed(rows: int):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT count(*) AS n FROM chat_history")
+    existing = cursor.fetchone()['n']
+    if existing >= rows:
+        print(f"chat_history already has {existing} rows")
+        conn.close()
+        return
+
+    cursor.execute(
+        """INSERT INTO users (email, password_hash, name) VALUES ('bench@example.com', 'x', 'Bench')
+           ON CONFLICT (email) DO UPDATE SET name = EXCLUDED.name RETURNING id"""
+    )
+    user_id = cursor.fetchone()['id']
+    missing = rows - existing
+    print(f"Seeding {missing} rows...")
+    started = time.time()
+    for offset in range(0, missing, 1_000_000):
+        count = min(1_000_000, missing - offset)
+        cursor.execute(
+            """INSERT INTO chat_history (user_id, message, response, timestamp)
+               SELECT %s, 'jadwal dokter anak hari ini ' || g, 'Dr. Maya Hariyanto praktik Selasa-Kamis 10:00-17:00 #' || g,
+                      NOW() - (g || ' seconds')::interval
+               FROM generate_series(1, %s) AS g""",
+            (user_id, count)
+        )
+        conn.commit()
+    print(f"Seeded in {time.time() - started:.1f}s")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    args = parser.parse_args()
+
+    seed(args.rows)
+
+    baseline = rss_mb()
+    peak = baseline
+    total_bytes = 0
+    started = time.time()
+    for i, chunk in enumerate(stream_export(args.format)):
+        total_bytes += len(chunk)
+        if i % 200 == 0:
+            peak = max(peak, rss_mb())
+            print(f"  {total_bytes / 1e6:8.1f} MB exported, RSS {rss_mb():.1f} MB")
+    elapsed = time.time() - started
+    peak = max(peak, rss_mb())
+
+    print(f"Exported {total_bytes / 1e6:.1f} MB in {elapsed:.1f}s ({total_bytes / 1e6 / elapsed:.1f} MB/s)")
+    print(f"RSS baseline {baseline:.1f} MB, peak {peak:.1f} MB (+{peak - baseline:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark routing tier model: jalankan korpus yang sama dua kali, sekali
+semua ke model besar dan sekali lewat ModelRouter, lalu bandingkan latensi
+p50/p95. Pertanyaan dengan topik sensitif ditandai supaya jawabannya bisa
+dicek manual (harus tetap dijawab model besar).
+
+Jalankan dari root repo (butuh Ollama dengan kedua model sudah di-pull):
+    OLLAMA_SMALL_MODEL=qwen2.5:1.5b python benchmarks/bench_model_routing.py
+    python benchmarks/bench_model_routing.py --dry-run    # hanya tampilkan keputusan routing
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm
+from security import moderate_content
+
+CORPUS = [
+    ("halo kiko, apa kabar?", "smalltalk:greeting"),
+    ("hello, do you speak english?", None),
+    ("makasih banyak ya", "smalltalk:thanks"),
+    ("kamu siapa sih", "bot_identity_name"),
+    ("maksudnya lantai berapa?", "faq_nav:lab"),
+    ("parkiran motor di sebelah mana", "location"),
+    ("toiletnya dekat IGD atau tidak", "facility_nav:toilet"),
+    ("bagaimana cara mengurangi demam pada anak balita yang rewel dan tidak mau makan sejak kemarin", None),
+    ("apa bedanya dokter umum dan dokter spesialis penyakit dalam, dan kapan harus ke spesialis?", "doctor_info"),
+    ("saya merasa depresi berat akhir-akhir ini, apa yang sebaiknya saya lakukan?", None),
+    ("adik saya kecanduan game dan obat tidur, bagaimana cara membantunya", None),
+    ("apakah pasien skizofrenia bisa rawat jalan di sini", None),
+]
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(router: llm.ModelRouter, routed: bool) -> list:
+    latencies = []
+    for question, intent in CORPUS:
+        category = moderate_content(question)["category"]
+        tier = router.route(question, intent, category) if routed else router.tiers["large"]
+        payload = llm._build_payload(question, intent=intent, model=tier.model)
+        started = time.perf_counter()
+        result = router.run(tier, payload)
+        latencies.append(time.perf_counter() - started)
+        if routed and category != "clean":
+            print(f"[sensitive -> {tier.name}] {question}\n  {result['content'] if result else '(tidak ada jawaban)'}\n")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    router = llm.ModelRouter(llm.OLLAMA_MODEL, llm.OLLAMA_SMALL_MODEL or "qwen2.5:1.5b")
+    print(f"{'question':<70} {'score':>5} tier")
+    for question, intent in CORPUS:
+        category = moderate_content(question)["category"]
+        score = llm.complexity_score(question, intent, category)
+        print(f"{question[:70]:<70} {score:>5} {router.route(question, intent, category).name}")
+    if args.dry_run:
+        return
+
+    print()
+    baseline = run(router, routed=False)
+    routed = run(router, routed=True)
+    print(f"All large : p50 {percentile(baseline, 0.5):.2f}s  p95 {percentile(baseline, 0.95):.2f}s")
+    print(f"Routed    : p50 {percentile(routed, 0.5):.2f}s  p95 {percentile(routed, 0.95):.2f}s")
+    for name, stats in router.get_state()["tiers"].items():
+        print(f"  tier {name:<5} {stats['model']:<16} requests={stats['requests']} p95={stats['latency_p95']}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark indeks retrieval: waktu build, latensi query, dan rasio pertanyaan
+yang lolos dari rule tetapi terjawab tanpa LLM.
+
+Jalankan dari root repo: python benchmarks/bench_retrieval.py
+"""
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from retrieval import Retriever
+from rules import generate_chatty_response
+
+CORPUS = [
+    "kapan waktu menjenguk pasien rawat inap?",
+    "jam berapa boleh jenguk keluarga",
+    "prosedur untuk rawat inap seperti apa",
+    "unit gawat darurat buka jam berapa",
+    "dimana tempat wudhu",
+    "resep obat ditebus di mana",
+    "letak radiologi lantai berapa",
+    "kasir ada di lantai berapa",
+    "alamat lengkapnya dimana",
+    "jadwal praktik Maya Hariyanto",
+    "nomor kontak Jonathan Hutapea",
+    "spesialis anak praktik hari apa",
+    "psikiatri buka jam berapa",
+    "apakah ada parkir motor",
+    "berapa biaya kamar VIP",
+    "apakah menerima BPJS",
+    "bagaimana cara mengurangi demam pada anak",
+    "apa itu diabetes",
+    "berikan resep nasi goreng",
+    "siapa presiden indonesia",
+]
+
+
+def main():
+    app = Flask(__name__)
+    app.secret_key = "bench"
+
+    build_times = []
+    for _ in range(20):
+        started = time.perf_counter()
+        retriever = Retriever()
+        build_times.append(time.perf_counter() - started)
+
+    with app.test_request_context():
+        rule_misses = [q for q in CORPUS if not generate_chatty_response(q, [])]
+
+    latencies = []
+    answered = []
+    for _ in range(200):
+        for query in rule_misses:
+            started = time.perf_counter()
+            result = retriever.answer(query)
+            latencies.append(time.perf_counter() - started)
+    for query in rule_misses:
+        if retriever.answer(query):
+            answered.append(query)
+
+    latencies.sort()
+    print(f"Passages           : {len(retriever.index.passages)}")
+    print(f"Build time (median): {statistics.median(build_times) * 1000:.2f} ms")
+    print(f"Query p50          : {latencies[len(latencies) // 2] * 1e6:.1f} us")
+    print(f"Query p99          : {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us")
+    print(f"Rule misses        : {len(rule_misses)}/{len(CORPUS)}")
+    print(f"Answered w/o LLM   : {len(answered)}/{len(rule_misses)} ({len(answered) / max(len(rule_misses), 1):.0%})")
+    for query in answered:
+        print(f"  - {query}")
+
+
+if __name__ == '__main__':
+    main()
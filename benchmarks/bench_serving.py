@@ -0,0 +1,101 @@
+"""
+Benchmark serving: jalankan dev server (python app.py) atau server produksi
+(python serve.py) sebagai subprocess, beri beban HTTP paralel, lalu laporkan
+requests/second serta RSS dan PSS total seluruh pohon proses.
+
+Butuh Postgres yang bisa diakses (init_db jalan di request pertama).
+Jalankan dari root repo:
+    python benchmarks/bench_serving.py --mode dev
+    WEB_CONCURRENCY=4 GUNICORN_THREADS=4 python benchmarks/bench_serving.py --mode serve
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from serve import process_memory
+
+COMMANDS = {
+    "dev": [sys.executable, "app.py"],
+    "serve": [sys.executable, "serve.py"],
+}
+
+
+def process_tree(pid: int) -> list:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        children = []
+    for child in children:
+        pids.extend(process_tree(child))
+    return pids
+
+
+def wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.5)
+    raise SystemExit(f"Server tidak merespons di {url}")
+
+
+def load(url: str, total: int, concurrency: int) -> tuple:
+    def worker(count):
+        session = requests.Session()
+        errors = 0
+        for _ in range(count):
+            if session.get(url, timeout=30).status_code >= 500:
+                errors += 1
+        return errors
+
+    per_worker = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        errors = sum(pool.map(worker, per_worker))
+    return total / (time.perf_counter() - started), errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=COMMANDS, required=True)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--path', default='/api/doctors')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PORT=str(args.port), FLASK_DEBUG='0')
+    server = subprocess.Popen(COMMANDS[args.mode], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{args.port}{args.path}"
+        wait_ready(url)
+        load(url, min(500, args.requests), args.concurrency)
+        rps, errors = load(url, args.requests, args.concurrency)
+
+        memory = [process_memory(pid) for pid in process_tree(server.pid)]
+        print(f"Mode          : {args.mode} ({len(memory)} proses)")
+        print(f"Requests/sec  : {rps:.0f} ({args.requests} request, {args.concurrency} koneksi, {errors} error 5xx)")
+        print(f"RSS total     : {sum(m.get('rss_kb', 0) for m in memory) / 1024:.1f} MB")
+        print(f"PSS total     : {sum(m.get('pss_kb', 0) for m in memory) / 1024:.1f} MB")
+        for m in memory:
+            print(f"  pid {m['pid']:<7} rss {m.get('rss_kb', 0) / 1024:7.1f} MB  private {m.get('private_kb', 0) / 1024:7.1f} MB  shared {m.get('shared_kb', 0) / 1024:7.1f} MB")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
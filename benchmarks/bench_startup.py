@@ -0,0 +1,95 @@
+"""
+Benchmark cold start: waktu import app dan import-to-first-request, diukur
+di proses Python baru setiap kali (seperti worker yang baru di-spawn).
+
+Jalankan dari root repo:
+    python benchmarks/bench_startup.py                  # butuh Postgres (init_db di request pertama)
+    python benchmarks/bench_startup.py --skip-db        # lewati init_db
+    python benchmarks/bench_startup.py --target-ms 300  # exit 1 bila median melewati target
+
+Breakdown per modul diambil dari `python -X importtime -c "import app"`.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_TARGET_MS = float(os.getenv('STARTUP_TARGET_MS', 300))
+HEAVY_OPTIONAL_MODULES = ['requests', 'numpy', 'psycopg2', 'flask_cors', 'simple_websocket', 'sqlite3', 'openai']
+
+CHILD = """
+import sys, json, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+if {skip_db}:
+    module.app._db_initialized = True
+status = module.app.test_client().get('/api/health').status_code
+done = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (done - started) * 1000,
+    "status": status,
+    "loaded": [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+
+def run_child(skip_db: bool) -> dict:
+    code = CHILD.format(skip_db=skip_db, heavy=HEAVY_OPTIONAL_MODULES)
+    env = dict(os.environ, INVALIDATION_BACKEND='none') if skip_db else None
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_breakdown(limit: int) -> list:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    # importtime mencetak anak sebelum induknya; subtree "app" adalah baris
+    # sejak entri top-level sebelumnya sampai baris "app" itu sendiri.
+    subtree = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        subtree.append((int(cumulative_us), int(self_us), depth, name.strip()))
+        if depth == 0:
+            if name.strip() == "app":
+                break
+            subtree = []
+    direct = [row for row in subtree if row[2] <= 1]
+    return sorted(direct, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--skip-db', action='store_true')
+    parser.add_argument('--target-ms', type=float, default=STARTUP_TARGET_MS)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [run_child(args.skip_db) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    first_ms = statistics.median(r["first_request_ms"] for r in runs)
+
+    print(f"{'module':<28} {'cumulative':>11} {'self':>9}")
+    for cumulative_us, self_us, depth, name in import_breakdown(args.top):
+        print(f"{'  ' * (depth - 1) + name:<28} {cumulative_us / 1000:>9.1f}ms {self_us / 1000:>7.1f}ms")
+    print()
+    print(f"Import app (median)          : {import_ms:.0f} ms")
+    print(f"Import -> first request      : {first_ms:.0f} ms (status {runs[-1]['status']}, target {args.target_ms:.0f} ms)")
+    print(f"Heavy optional modules loaded: {', '.join(runs[-1]['loaded']) or '-'}")
+
+    if first_ms > args.target_ms:
+        print("FAIL: melewati target startup")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Benchmark memori per tenant tambahan: satu proses yang melayani N RS vs
+satu salinan stack per RS.
+
+Tiap skenario jalan di proses Python baru: app di-import dan cache tenant
+default dibangun, lalu N tenant sintetis ditambahkan ke registry dan cache-nya
+(indeks retrieval, fuzzy matcher) dibangun serta dipakai sekali. Selisih heap
+Python (tracemalloc) dan RSS dibagi N adalah biaya per tenant tambahan;
+RSS proses sebelum tenant ditambahkan adalah biaya satu salinan stack
+(per worker) yang sebelumnya dibayar untuk tiap RS.
+
+Jenis tenant:
+    inherit  hanya nama, host dan lokasi sendiri; data lain warisan default
+    roster   + roster 30 dokter dan 10 FAQ sendiri
+    full     + petunjuk fasilitas dan system prompt sendiri
+
+Tidak butuh PostgreSQL.
+Jalankan dari root repo: python benchmarks/bench_tenants.py --tenants 50
+"""
+import os
+import sys
+import json
+import random
+import secrets
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KINDS = ("inherit", "roster", "full")
+
+CHILD = """
+import gc, sys, json, logging, tracemalloc
+sys.path.insert(0, {root!r})
+logging.disable(logging.WARNING)
+config = json.load(sys.stdin)
+import app as module
+from serve import process_memory
+from rules import generate_chatty_response, get_fuzzy_matcher
+from retrieval import get_retriever
+from tenants import get_tenant_registry, memory_report
+
+def warm(tenant):
+    get_fuzzy_matcher(tenant)
+    get_retriever(tenant).answer("jadwal dokter anak")
+    generate_chatty_response("dimana lokasi rs", [], state={{}}, dry_run=True, tenant=tenant)
+
+registry = get_tenant_registry()
+warm(registry.default)
+gc.collect()
+if {trace}:
+    tracemalloc.start()
+before = process_memory()
+for tenant_id, settings in config.items():
+    warm(registry.add(tenant_id, settings))
+gc.collect()
+after = process_memory()
+report = memory_report()
+print(json.dumps({{
+    "heap": tracemalloc.get_traced_memory()[0] if {trace} else None,
+    "rss_before_kb": before.get("rss_kb"),
+    "rss_delta_kb": after.get("rss_kb", 0) - before.get("rss_kb", 0),
+    "report_kb": sum(row["total_kb"] for row in report[1:]),
+}}))
+"""
+
+SYLLABLES = ["ra", "di", "san", "to", "wi", "ja", "ya", "nu", "ha", "ri", "ka", "mel", "ti", "pur", "no", "gus"]
+
+
+def make_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_tenant(kind: str, index: int, rng: random.Random) -> dict:
+    name = f"RS Sehat Selalu Cabang {index}"
+    settings = {
+        "name": name,
+        "hosts": [f"cabang{index}.example.id"],
+        "location_info": f"📍 <b>Lokasi Kami:</b><br>{name} berlokasi di Jl. {make_name(rng)} No. {index}.",
+    }
+    if kind in ("roster", "full"):
+        doctors = [{
+            "nama": f"Dr. {make_name(rng)} {make_name(rng)}",
+            "spesialisasi": rng.choice(["Penyakit Dalam", "Anak", "Umum", "Jantung", "Saraf"]),
+            "jadwal": "Senin-Jumat 08:00-15:00",
+            "kontak": f"0812-{index:04d}-{i:04d}",
+            "fun_fact": f"Suka {make_name(rng).lower()}",
+            "sapaan": "Halo, ada yang bisa saya bantu?",
+        } for i in range(30)]
+        settings["doctors"] = {"umum": doctors[:25], "psikiater": doctors[25:]}
+        settings["faq"] = {f"topik_{i}": f"Info {make_name(rng)} cabang {index} nomor {i}." for i in range(10)}
+    if kind == "full":
+        settings["facility_directions"] = {
+            f"fasilitas_{i}": {
+                "intent": "facility_nav",
+                "title": f"Fasilitas {make_name(rng)}",
+                "keywords": [make_name(rng).lower(), make_name(rng).lower()],
+                "reply": f"🏥 Fasilitas {i} ada di lantai {i % 4 + 1} {name}.",
+            } for i in range(6)
+        }
+        settings["system_prompt"] = f"Kamu adalah Kiko, asisten virtual {{name}} (cabang {index})."
+    return settings
+
+
+def run_child(config: dict, trace: bool) -> dict:
+    code = CHILD.format(root=ROOT, trace=trace)
+    env = dict(os.environ, INVALIDATION_BACKEND='none', SESSION_MODE='signed', SESSION_SIGNING_KEY=secrets.token_urlsafe(32),
+               TENANTS_FILE=os.path.join(ROOT, 'benchmarks', 'tidak-ada.json'))
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, input=json.dumps(config),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tenants', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    n = args.tenants
+
+    print(f"{n} tenant per skenario\n")
+    print(f"{'jenis':<8} {'heap/tenant':>12} {'RSS/tenant':>12} {'memory_report':>14}")
+    baseline_rss = None
+    for kind in KINDS:
+        rng = random.Random(args.seed)
+        config = {f"cabang{i}": make_tenant(kind, i, rng) for i in range(n)}
+        traced = run_child(config, trace=True)
+        plain = run_child(config, trace=False)
+        baseline_rss = plain["rss_before_kb"]
+        print(f"{kind:<8} {traced['heap'] / n / 1024:>9.1f} KB {plain['rss_delta_kb'] / n:>9.1f} KB "
+              f"{traced['report_kb'] / n:>11.1f} KB")
+
+    if baseline_rss:
+        print(f"\nSatu salinan stack (RSS proses 1 RS, per worker): {baseline_rss / 1024:.1f} MB")
+    print("(memory_report = angka /api/admin/tenants; RSS dibulatkan ke halaman 4 KB dan dipengaruhi allocator)")
+
+
+if __name__ == '__main__':
+    main()
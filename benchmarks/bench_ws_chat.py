@@ -0,0 +1,143 @@
+"""
+Benchmark transport chat: POST /api/chat per pesan vs satu koneksi
+WebSocket /ws/chat yang diautentikasi sekali saat handshake.
+
+Dev server (python app.py) dijalankan sebagai subprocess. Yang diukur:
+1. Latensi per pesan (p50/p95) untuk pesan yang dijawab rule engine, jadi
+   yang terlihat adalah overhead transport + auth, bukan LLM.
+2. Koneksi WebSocket serentak per proses: buka koneksi satu per satu sampai
+   --connections (atau ditolak 503), kirim satu pesan lewat tiap koneksi,
+   lalu catat RSS server per koneksi terbuka.
+
+Butuh Postgres (signup user dan chat_history). Limit 30 pesan/menit per
+user tetap berlaku, jadi pesan dibagi ke --users user. Jalankan dari root repo:
+    python benchmarks/bench_ws_chat.py
+    SESSION_MODE=signed SESSION_SIGNING_KEY=$(openssl rand -hex 32) python benchmarks/bench_ws_chat.py --messages 200 --connections 200
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+import subprocess
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from serve import process_memory
+
+
+def wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.5)
+    raise SystemExit(f"Server tidak merespons di {url}")
+
+
+def signup(base: str) -> requests.Session:
+    session = requests.Session()
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    result = session.post(f"{base}/api/auth/signup",
+                          json={"name": "Bench", "email": email, "password": "bench-password"}).json()
+    if not result.get("success"):
+        raise SystemExit(f"Signup gagal: {result.get('message')}")
+    return session
+
+
+def open_socket(base: str, session: requests.Session):
+    from simple_websocket import Client
+    cookie = "; ".join(f"{name}={value}" for name, value in session.cookies.items())
+    return Client.connect(base.replace("http", "ws", 1) + "/ws/chat", headers={"Cookie": cookie})
+
+
+def ask_socket(ws, message: str) -> dict:
+    ws.send(json.dumps({"message": message}))
+    while True:
+        frame = json.loads(ws.receive())
+        if frame["type"] in ("reply", "error"):
+            return frame
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"p50 {statistics.median(samples):6.2f} ms  p95 {p95:6.2f} ms"
+
+
+def bench_latency(base: str, sessions: list, messages: int, text: str) -> None:
+    post_ms, ws_ms = [], []
+    for i in range(messages):
+        started = time.perf_counter()
+        sessions[i % len(sessions)].post(f"{base}/api/chat", json={"message": text}).raise_for_status()
+        post_ms.append((time.perf_counter() - started) * 1000)
+
+    sockets = [open_socket(base, session) for session in sessions]
+    for i in range(messages):
+        started = time.perf_counter()
+        ask_socket(sockets[i % len(sockets)], text)
+        ws_ms.append((time.perf_counter() - started) * 1000)
+    for ws in sockets:
+        ws.close()
+
+    print(f"POST /api/chat : {percentiles(post_ms)}  ({messages} pesan)")
+    print(f"WS /ws/chat    : {percentiles(ws_ms)}  ({messages} pesan)")
+
+
+def bench_connections(base: str, session: requests.Session, target: int, text: str, server_pid: int) -> None:
+    baseline_kb = process_memory(server_pid).get("rss_kb", 0)
+    sockets, refused = [], None
+    for _ in range(target):
+        try:
+            sockets.append(open_socket(base, session))
+        except Exception as e:
+            refused = e
+            break
+
+    started = time.perf_counter()
+    for ws in sockets[:25]:
+        ask_socket(ws, text)
+    per_message_ms = (time.perf_counter() - started) * 1000 / max(1, min(25, len(sockets)))
+    rss_kb = process_memory(server_pid).get("rss_kb", 0)
+    for ws in sockets:
+        ws.close()
+
+    print(f"Koneksi serentak: {len(sockets)}/{target}" + (f" (berikutnya ditolak: {refused})" if refused else ""))
+    print(f"Latensi pesan saat {len(sockets)} koneksi terbuka: {per_message_ms:.2f} ms")
+    if sockets:
+        print(f"RSS server      : +{(rss_kb - baseline_kb) / 1024:.1f} MB ({(rss_kb - baseline_kb) / len(sockets):.0f} KB/koneksi)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--message', default='halo')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PORT=str(args.port), FLASK_DEBUG='0', WS_MAX_CONNECTIONS=str(args.connections))
+    server = subprocess.Popen([sys.executable, "app.py"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{args.port}"
+        wait_ready(f"{base}/api/health")
+        sessions = [signup(base) for _ in range(args.users)]
+        print(f"SESSION_MODE={os.getenv('SESSION_MODE', 'db')}, pesan: {args.message!r}")
+        bench_latency(base, sessions, args.messages, args.message)
+        bench_connections(base, signup(base), args.connections, args.message, server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Build aset statis untuk produksi.
+
+    python build_assets.py            # tulis ke static/dist (ASSETS_DIST_DIR)
+    python build_assets.py --clean    # sekaligus hapus file build lama yang tidak ada di manifest
+
+Sumber: CSS/JS template di static/css dan static/js, serta gambar di static/.
+Hasil tiap file diberi hash isi di namanya (chat.3f2a9c1b7d.js), jadi bisa
+di-cache browser selamanya (Cache-Control immutable); isi berubah = nama
+berubah. Untuk CSS/JS juga dibuat varian .gz dan .br (brotli, bila modul
+`brotli` terpasang) supaya server tidak perlu kompres per request. Gambar
+diperkecil ke IMAGE_MAX_SIZES dan dikonversi ke WebP (butuh Pillow; tanpa
+Pillow gambar asli hanya diberi hash).
+
+Manifest (manifest.json) memetakan nama sumber ke nama hasil build dan
+dibaca assets.py saat runtime; tanpa manifest, asset_url() jatuh ke
+/static/<sumber> seperti biasa.
+"""
+import io
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+
+from config import BASE_DIR, ASSETS_DIST_DIR
+
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+TEXT_ASSETS = ['css/chat.css', 'js/chat.js', 'js/login.js', 'js/signup.js']
+# Sisi terpanjang hasil resize: 2x ukuran tampil terbesar di template (logo h-16, avatar w-10).
+IMAGE_MAX_SIZES = {'logo.jpg': 128, 'avatar.jpeg': 96}
+MIMETYPES = {'.css': 'text/css', '.js': 'application/javascript', '.webp': 'image/webp',
+             '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png'}
+MIN_COMPRESSION_SAVING = 0.05
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text: str) -> str:
+    """Minifikasi konservatif: buang indentasi, baris kosong dan komentar satu baris.
+
+    Tidak mengubah token apa pun di dalam baris, jadi aman tanpa parser JS;
+    sisa redundansi dihabisi gzip/brotli.
+    """
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith('//')) + "\n"
+
+
+def convert_image(data: bytes, max_size: int) -> tuple:
+    try:
+        from PIL import Image
+    except ImportError:
+        logging.warning("[ASSETS] Pillow tidak terpasang, gambar tidak di-resize/konversi ke WebP")
+        return data, None
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, 'WEBP', quality=82, method=6)
+    return output.getvalue(), '.webp'
+
+
+def compress_variants(data: bytes) -> dict:
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        variants['br'] = brotli.compress(data, quality=11)
+    except ImportError:
+        logging.warning("[ASSETS] Modul brotli tidak terpasang, hanya varian gzip yang dibuat")
+    return {encoding: body for encoding, body in variants.items()
+            if len(body) <= len(data) * (1 - MIN_COMPRESSION_SAVING)}
+
+
+def build(dist_dir: str = ASSETS_DIST_DIR, clean: bool = False) -> dict:
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {"assets": {}, "files": {}}
+
+    sources = [(name, None) for name in TEXT_ASSETS] + list(IMAGE_MAX_SIZES.items())
+    for source, max_size in sources:
+        with open(os.path.join(STATIC_DIR, source), 'rb') as f:
+            original = f.read()
+        stem, ext = os.path.splitext(os.path.basename(source))
+
+        if ext == '.css':
+            data = minify_css(original.decode()).encode()
+        elif ext == '.js':
+            data = minify_js(original.decode()).encode()
+        else:
+            data, new_ext = convert_image(original, max_size)
+            ext = new_ext or ext
+
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        filename = f"{stem}.{digest}{ext}"
+        with open(os.path.join(dist_dir, filename), 'wb') as f:
+            f.write(data)
+
+        variants = compress_variants(data) if ext in ('.css', '.js') else {}
+        for encoding, body in variants.items():
+            with open(os.path.join(dist_dir, f"{filename}.{'br' if encoding == 'br' else 'gz'}"), 'wb') as f:
+                f.write(body)
+
+        manifest["assets"][source] = filename
+        manifest["files"][filename] = {
+            "etag": digest,
+            "mimetype": MIMETYPES[ext],
+            "encodings": sorted(variants, key=lambda encoding: encoding != 'br'),
+            "size": len(data),
+            "sizes": {encoding: len(body) for encoding, body in variants.items()}
+        }
+        compressed = ", ".join(f"{encoding} {len(body)} B" for encoding, body in variants.items())
+        print(f"{source:<16} {len(original):>7} B -> {filename:<28} {len(data):>7} B  {compressed}")
+
+    with open(os.path.join(dist_dir, 'manifest.json.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(dist_dir, 'manifest.json.tmp'), os.path.join(dist_dir, 'manifest.json'))
+
+    if clean:
+        keep = {'manifest.json'} | {
+            name for filename in manifest["files"] for name in (filename, f"{filename}.gz", f"{filename}.br")
+        }
+        for name in os.listdir(dist_dir):
+            path = os.path.join(dist_dir, name)
+            if name not in keep:
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+                print(f"hapus {name}")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minify, hash dan kompres aset statis")
+    parser.add_argument('--dist', default=ASSETS_DIST_DIR)
+    parser.add_argument('--clean', action='store_true', help="hapus file build lama yang tidak ada di manifest")
+    args = parser.parse_args(argv)
+    build(args.dist, args.clean)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,444 @@
+"""
+Import/export massal roster dokter dan janji temu.
+
+    python bulk_io.py import doctors roster.csv
+    python bulk_io.py import appointments janji.jsonl --owner-email admin@rs.id --rejects ditolak.csv
+    python bulk_io.py export appointments --format csv --out janji.csv
+    python bulk_io.py import doctors roster-bandung.csv --tenant bandung
+
+Import berjalan dalam satu transaksi:
+1. File (CSV ber-header atau JSON Lines) di-stream ke temp table staging
+   lewat COPY FROM STDIN; semua kolom TEXT supaya COPY tidak gagal karena
+   satu nilai jelek.
+2. Validasi set-based: satu UPDATE mengisi kolom `error` untuk baris yang
+   tidak valid, lalu satu UPDATE lagi menandai key duplikat di file (baris
+   terakhir yang dipakai).
+3. Baris yang ditolak bisa di-COPY ke file rejects; sisanya di-upsert ke
+   tabel tujuan dengan satu INSERT ... SELECT ... ON CONFLICT.
+
+Janji temu di-upsert berdasarkan `external_id` (ID dari sistem RS), jadi
+import ulang file yang sama tidak menggandakan data. Pemilik janji temu
+diambil dari kolom `user_email`, atau user yang menjalankan import bila
+kosong.
+
+Semua data milik satu tenant (tenants.py; default DEFAULT_TENANT, lewat API
+tenant request). Begitu tabel doctors berisi baris untuk sebuah tenant,
+roster itu menggantikan roster dari konfigurasi tenant untuk rule engine,
+retrieval dan /api/doctors. Import roster mem-publish invalidasi 'doctors'
+dengan key id tenant sehingga semua worker memuat ulang roster tenant itu.
+"""
+import io
+import csv
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+
+from config import EXPORT_BATCH_SIZE, DEFAULT_TENANT
+from database import get_connection
+from invalidation import get_invalidation_bus, register_cache, publish
+from tenants import get_tenant_registry
+
+STAGING_TABLE = "bulk_staging"
+REJECT_SAMPLE = 100
+JSONL_CHUNK_ROWS = 500
+
+IMPORT_SPECS = {
+    "doctors": {
+        "columns": ["kontak", "nama", "spesialisasi", "kategori", "jadwal", "fun_fact", "sapaan"],
+        "required": ["kontak", "nama", "spesialisasi", "kategori", "jadwal"],
+        "key": "kontak",
+        "checks": [
+            ("kategori harus umum atau psikiater", "btrim(kategori) NOT IN ('umum', 'psikiater')"),
+            ("kontak tidak valid", r"btrim(kontak) !~ '^\+?[0-9][0-9 ()-]{5,48}$'"),
+            ("nama terlalu panjang", "length(btrim(nama)) > 255"),
+            ("spesialisasi terlalu panjang", "length(btrim(spesialisasi)) > 255"),
+            ("jadwal terlalu panjang", "length(btrim(jadwal)) > 255"),
+        ],
+        "upsert": """
+            INSERT INTO doctors (tenant_id, kontak, nama, spesialisasi, kategori, jadwal, fun_fact, sapaan, updated_at)
+            SELECT %(tenant_id)s, btrim(kontak), btrim(nama), btrim(spesialisasi), btrim(kategori), btrim(jadwal),
+                   coalesce(fun_fact, ''), coalesce(sapaan, ''), CURRENT_TIMESTAMP
+            FROM {staging} WHERE error IS NULL
+            ON CONFLICT (tenant_id, kontak) DO UPDATE SET
+                nama = EXCLUDED.nama, spesialisasi = EXCLUDED.spesialisasi, kategori = EXCLUDED.kategori,
+                jadwal = EXCLUDED.jadwal, fun_fact = EXCLUDED.fun_fact, sapaan = EXCLUDED.sapaan,
+                updated_at = EXCLUDED.updated_at
+        """,
+        "export": """
+            SELECT kontak, nama, spesialisasi, kategori, jadwal, fun_fact, sapaan, updated_at
+            FROM doctors WHERE tenant_id = %(tenant_id)s ORDER BY kategori, nama
+        """,
+    },
+    "appointments": {
+        "columns": ["external_id", "patient_name", "contact", "doctor_id", "appointment_date", "appointment_time", "user_email"],
+        "required": ["external_id", "patient_name", "contact", "doctor_id", "appointment_date", "appointment_time"],
+        "key": "external_id",
+        "checks": [
+            ("external_id terlalu panjang", "length(btrim(external_id)) > 100"),
+            ("patient_name terlalu panjang", "length(btrim(patient_name)) > 255"),
+            ("contact tidak valid", r"btrim(contact) !~ '^\+?[0-9][0-9 -]{5,48}$'"),
+            ("appointment_date harus YYYY-MM-DD",
+             r"btrim(appointment_date) !~ '^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$'"),
+            ("appointment_time harus HH:MM", r"btrim(appointment_time) !~ '^([01]\d|2[0-3]):[0-5]\d$'"),
+            # Tenant tanpa baris di tabel doctors = roster dari konfigurasi tenant yang berlaku.
+            ("doctor_id tidak dikenal",
+             "NOT EXISTS (SELECT 1 FROM doctors d WHERE d.tenant_id = %(tenant_id)s AND d.kontak = btrim(s.doctor_id)) "
+             "AND (EXISTS (SELECT 1 FROM doctors WHERE tenant_id = %(tenant_id)s) "
+             "OR btrim(s.doctor_id) <> ALL(%(default_doctors)s::text[]))"),
+            ("user_email tidak terdaftar",
+             "nullif(btrim(user_email), '') IS NOT NULL "
+             "AND NOT EXISTS (SELECT 1 FROM users u WHERE u.email = btrim(s.user_email))"),
+            ("user_email kosong dan import tidak punya owner",
+             "nullif(btrim(user_email), '') IS NULL AND %(owner_id)s::integer IS NULL"),
+        ],
+        "upsert": """
+            INSERT INTO appointments
+                (tenant_id, external_id, user_id, patient_name, contact, doctor_id, appointment_date, appointment_time)
+            SELECT %(tenant_id)s, btrim(s.external_id), coalesce(u.id, %(owner_id)s), btrim(s.patient_name),
+                   regexp_replace(s.contact, '[\\s-]', '', 'g'), btrim(s.doctor_id),
+                   btrim(s.appointment_date), btrim(s.appointment_time)
+            FROM {staging} s LEFT JOIN users u ON u.email = btrim(s.user_email)
+            WHERE s.error IS NULL
+            ON CONFLICT (tenant_id, external_id) WHERE external_id IS NOT NULL DO UPDATE SET
+                user_id = EXCLUDED.user_id, patient_name = EXCLUDED.patient_name, contact = EXCLUDED.contact,
+                doctor_id = EXCLUDED.doctor_id, appointment_date = EXCLUDED.appointment_date,
+                appointment_time = EXCLUDED.appointment_time
+        """,
+        "export": """
+            SELECT a.external_id, a.patient_name, a.contact, a.doctor_id, a.appointment_date,
+                   a.appointment_time, u.email AS user_email, a.id, a.created_at
+            FROM appointments a JOIN users u ON u.id = a.user_id
+            WHERE a.tenant_id = %(tenant_id)s ORDER BY a.id
+        """,
+    },
+}
+# Kolom tambahan hasil export yang boleh ada di file import (diabaikan), supaya export -> import bisa bolak-balik.
+EXPORT_ONLY_COLUMNS = {"id", "created_at", "updated_at"}
+
+
+class _ChunkStream:
+    """File-like minimal (hanya read) di atas iterator string, untuk copy_expert."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0:
+            data, self.buffer = self.buffer, ""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _jsonl_chunks(stream, columns: list):
+    """Ubah JSON Lines menjadi CSV untuk COPY; baris rusak dibawa ke staging sebagai parse_error."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError
+            writer.writerow([_text(record.get(column)) for column in columns] + [None])
+        except ValueError:
+            writer.writerow([None] * len(columns) + ["baris bukan objek JSON yang valid"])
+        rows += 1
+        if rows % JSONL_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _csv_columns(stream, spec: dict) -> list:
+    header = next(csv.reader([stream.readline()]), [])
+    columns = [name.strip() for name in header]
+    unknown = [name for name in columns if name not in spec["columns"] and name not in EXPORT_ONLY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Kolom tidak dikenal: {', '.join(unknown)}")
+    missing = [name for name in spec["required"] if name not in columns]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ada: {', '.join(missing)}")
+    return columns
+
+
+def _validation_sql(spec: dict, staging: str) -> str:
+    cases = ["WHEN parse_error IS NOT NULL THEN parse_error"]
+    cases += [f"WHEN nullif(btrim({column}), '') IS NULL THEN '{column} kosong'" for column in spec["required"]]
+    cases += [f"WHEN {condition} THEN '{message}'" for message, condition in spec["checks"]]
+    return f"UPDATE {staging} s SET error = CASE {' '.join(cases)} END"
+
+
+def import_file(kind: str, stream, fmt: str = 'csv', owner_id: int | None = None,
+                dry_run: bool = False, rejects_file=None, tenant_id: str = DEFAULT_TENANT) -> dict:
+    """Import file teks (CSV ber-header / JSON Lines) ke tabel `kind`. ValueError untuk file yang tidak bisa dibaca."""
+    import psycopg2
+
+    configured = get_tenant_registry().configured.get(tenant_id)
+    if configured is None:
+        raise ValueError(f"Tenant {tenant_id} tidak dikenal")
+    spec = IMPORT_SPECS[kind]
+    started = time.perf_counter()
+    staging = STAGING_TABLE
+
+    if fmt == 'csv':
+        columns = _csv_columns(stream, spec)
+        # Kolom export-only tetap di-COPY (ke kolom buangan) supaya posisi kolom CSV cocok.
+        copy_columns = [name if name in spec["columns"] else f"ignored_{name}" for name in columns]
+        source = stream
+    else:
+        copy_columns = spec["columns"] + ["parse_error"]
+        source = _ChunkStream(_jsonl_chunks(stream, spec["columns"]))
+
+    staging_columns = spec["columns"] + ["parse_error"] + [name for name in copy_columns if name.startswith("ignored_")]
+    params = {"owner_id": owner_id, "tenant_id": tenant_id,
+              "default_doctors": [doctor["kontak"] for doctor in configured.all_doctors]}
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""CREATE TEMP TABLE {staging} (
+                    line BIGINT GENERATED ALWAYS AS IDENTITY,
+                    {', '.join(f'{name} TEXT' for name in staging_columns)},
+                    error TEXT
+                ) ON COMMIT DROP"""
+        )
+        try:
+            cursor.copy_expert(f"COPY {staging} ({', '.join(copy_columns)}) FROM STDIN WITH (FORMAT csv)", source)
+        except psycopg2.DataError as e:
+            raise ValueError(f"File tidak bisa dibaca: {e.diag.message_primary} ({e.diag.context})") from e
+        # Temp table tidak disentuh autovacuum; tanpa statistik planner salah pilih join untuk jutaan baris.
+        cursor.execute(f"ANALYZE {staging}")
+
+        cursor.execute(_validation_sql(spec, staging), params)
+        rows = cursor.rowcount
+        cursor.execute(
+            f"""UPDATE {staging} s SET error = 'duplikat {spec["key"]} di file, dipakai baris ' || d.last_line
+                FROM (SELECT line, max(line) OVER (PARTITION BY btrim({spec["key"]})) AS last_line
+                      FROM {staging} WHERE error IS NULL) d
+                WHERE s.line = d.line AND d.line < d.last_line"""
+        )
+
+        reject_columns = ", ".join(["line AS baris", "error"] + spec["columns"])
+        reject_query = f"SELECT {reject_columns} FROM {staging} WHERE error IS NOT NULL ORDER BY line"
+        cursor.execute(f"SELECT count(*) AS n FROM {staging} WHERE error IS NOT NULL")
+        rejected = cursor.fetchone()["n"]
+        cursor.execute(f"{reject_query} LIMIT {REJECT_SAMPLE}")
+        reject_sample = cursor.fetchall()
+        if rejects_file is not None and rejected:
+            cursor.copy_expert(f"COPY ({reject_query}) TO STDOUT WITH (FORMAT csv, HEADER true)", rejects_file)
+
+        inserted = updated = 0
+        if not dry_run and rows > rejected:
+            cursor.execute(
+                f"""WITH upserted AS ({spec["upsert"].format(staging=staging)} RETURNING (xmax = 0) AS inserted)
+                    SELECT count(*) FILTER (WHERE inserted) AS inserted,
+                           count(*) FILTER (WHERE NOT inserted) AS updated
+                    FROM upserted""",
+                params
+            )
+            counts = cursor.fetchone()
+            inserted, updated = counts["inserted"], counts["updated"]
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        cursor.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if kind == "doctors" and not dry_run and inserted + updated:
+        publish("doctors", tenant_id)
+
+    seconds = round(time.perf_counter() - started, 2)
+    logging.info(f"[BULK] Import {kind} ({tenant_id}): {rows} baris, {inserted} baru, {updated} diperbarui, "
+                 f"{rejected} ditolak dalam {seconds} s{' (dry run)' if dry_run else ''}")
+    return {
+        "kind": kind,
+        "tenant": tenant_id,
+        "rows": rows,
+        "inserted": inserted,
+        "updated": updated,
+        "rejected": rejected,
+        "rejects": reject_sample,
+        "dry_run": dry_run,
+        "seconds": seconds
+    }
+
+
+def stream_export(kind: str, fmt: str = 'csv', tenant_id: str = DEFAULT_TENANT, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield potongan CSV/NDJSON data satu tenant lewat named cursor; kolomnya bisa langsung di-import ulang."""
+    query = IMPORT_SPECS[kind]["export"]
+    conn = get_connection(readonly=True)
+    exported = 0
+
+    try:
+        with conn.cursor(name=f"bulk_export_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, {"tenant_id": tenant_id})
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer) if fmt == 'csv' else None
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if writer and exported == 0:
+                    writer.writerow(column.name for column in cursor.description)
+                if not rows:
+                    break
+                for row in rows:
+                    values = {key: value.isoformat() if hasattr(value, 'isoformat') else value for key, value in row.items()}
+                    if writer:
+                        writer.writerow(values.values())
+                    else:
+                        buffer.write(json.dumps(values, ensure_ascii=False))
+                        buffer.write("\n")
+                exported += len(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+            if buffer.tell():
+                yield buffer.getvalue()
+        conn.commit()
+        logging.info(f"[BULK] Export {kind} ({tenant_id}) selesai: {exported} rows ({fmt})")
+    finally:
+        conn.close()
+
+
+def load_doctor_roster(tenant_id: str | None = None) -> bool:
+    """Pasang roster dari tabel doctors ke snapshot tenant (None = semua tenant). Dibaca dari primary supaya tidak ketinggalan import."""
+    query = "SELECT tenant_id, nama, spesialisasi, kategori, jadwal, kontak, fun_fact, sapaan FROM doctors"
+    params = ()
+    if tenant_id is not None:
+        query += " WHERE tenant_id = %s"
+        params = (tenant_id,)
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query + " ORDER BY nama", params)
+        rows = cursor.fetchall()
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    if not rows:
+        return False
+
+    rosters = {}
+    for row in rows:
+        doctor = dict(row)
+        roster = rosters.setdefault(doctor.pop("tenant_id"), {"umum": [], "psikiater": []})
+        roster.setdefault(doctor.pop("kategori"), []).append(doctor)
+
+    registry = get_tenant_registry()
+    for roster_tenant, roster in rosters.items():
+        if registry.get(roster_tenant) is None:
+            logging.warning(f"[BULK] Roster untuk tenant {roster_tenant} diabaikan: tenant tidak terdaftar")
+            continue
+        registry.replace(roster_tenant, doctors=roster)
+        logging.info(f"[BULK] Roster dokter {roster_tenant} dimuat dari database: "
+                     f"{sum(len(doctors) for doctors in roster.values())} dokter")
+    return True
+
+def _reload_doctor_roster(key):
+    load_doctor_roster(key)
+
+# Harus jalan sebelum evict retriever / fuzzy matcher, supaya rebuild berikutnya memakai roster baru.
+register_cache('doctors', _reload_doctor_roster, first=True)
+
+def refresh_doctor_roster():
+    """Saat startup: muat roster semua tenant dari database lalu evict cache turunannya di proses ini."""
+    get_invalidation_bus().invalidate_local('doctors')
+
+
+def _owner_id(email: str) -> int:
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise SystemExit(f"User {email} tidak ditemukan")
+    return row["id"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import/export massal roster dokter dan janji temu")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = sub.add_parser('import')
+    import_parser.add_argument('kind', choices=sorted(IMPORT_SPECS))
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=['csv', 'jsonl'], help="default dari ekstensi file")
+    import_parser.add_argument('--owner-email', help="pemilik janji temu yang tidak punya user_email")
+    import_parser.add_argument('--rejects', help="tulis semua baris yang ditolak ke CSV ini")
+    import_parser.add_argument('--dry-run', action='store_true', help="validasi saja, rollback di akhir")
+    import_parser.add_argument('--tenant', default=DEFAULT_TENANT, help="id tenant pemilik data")
+
+    export_parser = sub.add_parser('export')
+    export_parser.add_argument('kind', choices=sorted(IMPORT_SPECS))
+    export_parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    export_parser.add_argument('--out', help="default stdout")
+    export_parser.add_argument('--tenant', default=DEFAULT_TENANT, help="id tenant pemilik data")
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        out = open(args.out, 'w', encoding='utf-8', newline='') if args.out else sys.stdout
+        try:
+            for chunk in stream_export(args.kind, args.format, args.tenant):
+                out.write(chunk)
+        finally:
+            if args.out:
+                out.close()
+        return
+
+    fmt = args.format or ('jsonl' if args.path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    owner_id = _owner_id(args.owner_email) if args.owner_email else None
+    rejects_file = open(args.rejects, 'w', encoding='utf-8', newline='') if args.rejects else None
+    try:
+        with open(args.path, encoding='utf-8-sig', newline='') as f:
+            result = import_file(args.kind, f, fmt, owner_id, args.dry_run, rejects_file, args.tenant)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        if rejects_file is not None:
+            rejects_file.close()
+
+    print(f"{result['rows']} baris: {result['inserted']} baru, {result['updated']} diperbarui, "
+          f"{result['rejected']} ditolak ({result['seconds']} s){' - dry run, tidak ada yang disimpan' if args.dry_run else ''}")
+    for reject in result["rejects"][:10]:
+        print(f"  baris {reject['baris']}: {reject['error']}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
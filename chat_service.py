@@ -0,0 +1,211 @@
+"""
+Pipeline chat (security -> rule -> classifier -> retrieval -> LLM) yang
+dipakai bersama oleh POST /api/chat dan WebSocket /ws/chat.
+
+process_message() tidak membaca request/cookie sendiri: user sudah
+diautentikasi oleh pemanggil, jadi transport WebSocket cukup melakukannya
+sekali per koneksi.
+"""
+import time
+import logging
+
+from database import execute_query
+from llm import call_llm_with_usage
+from rules import generate_chatty_response, canned_reply
+from intent_classifier import get_intent_classifier
+from retrieval import get_retriever
+from analytics import get_analytics, topic_for
+from security import check_security, sanitize_output, get_rate_limiter
+from abuse import get_abuse_tracker, get_security_log
+from tenants import current_tenant
+
+FALLBACK_REPLY = "Maaf, saya belum bisa menjawab pertanyaan tersebut. Silakan hubungi staf RS untuk informasi lebih lanjut."
+
+
+def log_security_event(user_id: str, event_type: str, details: str = ""):
+    get_security_log().record(user_id, event_type, details)
+
+def save_chat(user_id: int, message: str, reply: dict, source: str, started: float, usage: dict | None = None,
+              tenant=None):
+    usage = usage or {}
+    latency_ms = int((time.perf_counter() - started) * 1000)
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    tenant = tenant or current_tenant()
+
+    try:
+        execute_query(
+            """INSERT INTO chat_history
+               (tenant_id, user_id, message, response, intent, source, latency_ms, prompt_tokens, completion_tokens)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+            (tenant.id, user_id, message, reply["reply"], reply["intent"], source, latency_ms, prompt_tokens,
+             completion_tokens)
+        )
+    except Exception:
+        # Jawaban sudah jadi; gagal simpan riwayat tidak boleh membuat user menerima error 500.
+        logging.exception("[CHAT] Gagal menyimpan chat_history")
+    get_analytics().record(
+        reply["intent"], source, topic_for(reply["intent"], reply["reply"], tenant),
+        latency_ms, prompt_tokens, completion_tokens, tenant_id=tenant.id
+    )
+
+def abuse_reply(blocked_seconds: float) -> str:
+    minutes = max(1, round(blocked_seconds / 60))
+    return f"Akses chat kamu dibatasi sementara karena pelanggaran berulang. Coba lagi dalam {minutes} menit ya. 🙏"
+
+def _guard_stream(on_token):
+    """Teruskan token LLM selama teks sejauh ini lolos sanitize_output.
+
+    Begitu ada pola berbahaya, sisa token tidak dikirim lagi; jawaban final
+    (yang sudah disanitasi) tetap dikirim utuh oleh pemanggil dan
+    menggantikan draft yang sudah di-stream.
+    """
+    text = []
+    state = {"open": True}
+
+    def push(token):
+        if not state["open"]:
+            return
+        text.append(token)
+        if not sanitize_output("".join(text))["safe"]:
+            state["open"] = False
+            return
+        on_token(token)
+
+    return push
+
+def process_message(user, user_input: str, on_token=None, tenant=None, state=None) -> dict:
+    """Jawab satu pesan user. Mengembalikan {"reply": {...}, "quota": {...}}.
+
+    `tenant` default-nya tenant request ini; koneksi WebSocket mengirim
+    snapshot terbaru tenant-nya per pesan. `state` (konteks percakapan,
+    default flask session) dipakai rule engine dan classifier; koneksi
+    WebSocket mengirim dict miliknya sendiri karena session tidak bisa
+    disimpan lagi setelah handshake.
+    """
+    started = time.perf_counter()
+    user_id = str(user.id)
+    tenant = tenant or current_tenant()
+
+    logging.info(f"[CHAT] User {user.email}: '{user_input[:50]}...'")
+
+    rate_limiter = get_rate_limiter()
+
+    def respond(reply):
+        return {"reply": reply, "quota": rate_limiter.get_stats(user_id)}
+
+    def quota_reply(reason):
+        logging.warning(f"[CHAT] Quota exceeded for user {user_id}")
+        get_analytics().record("quota_exceeded", "blocked", "", (time.perf_counter() - started) * 1000, tenant_id=tenant.id)
+        return respond({"intent": "quota_exceeded", "reply": reason})
+
+    abuse_tracker = get_abuse_tracker()
+    blocked_seconds = abuse_tracker.blocked_for(user_id)
+    if blocked_seconds:
+        log_security_event(user_id, "abuse_blocked")
+        get_analytics().record("abuse_blocked", "blocked", "", (time.perf_counter() - started) * 1000, tenant_id=tenant.id)
+        return respond({"intent": "abuse_blocked", "reply": abuse_reply(blocked_seconds)})
+
+    security_check = check_security(user_input, user_id)
+
+    if not security_check["allowed"]:
+        reason = security_check["metadata"]["reason"]
+        log_security_event(user_id, reason, security_check["metadata"].get("pattern", ""))
+        logging.warning(f"[SECURITY] Blocked: {reason}")
+        get_analytics().record(
+            "security_blocked", "blocked", reason,
+            (time.perf_counter() - started) * 1000, tenant_id=tenant.id
+        )
+        blocked_seconds = abuse_tracker.record_violation(user_id, reason)
+        if blocked_seconds:
+            return respond({"intent": "abuse_blocked", "reply": abuse_reply(blocked_seconds)})
+        return respond({
+            "intent": "security_blocked",
+            "reply": security_check["response"]
+        })
+
+    if security_check["metadata"].get("contains_pii"):
+        log_security_event(
+            user_id,
+            "pii_detected",
+            f"Types: {', '.join(security_check['metadata']['pii_types'])}"
+        )
+
+    sanitized_input = security_check["sanitized_input"]
+    disclaimer = security_check["disclaimer"]
+
+    # Rule engine punya efek samping (INSERT booking, state session): kuota dicek sebelum dijalankan.
+    rule_quota = rate_limiter.check_rule_budget(user_id)
+    if not rule_quota["allowed"]:
+        return quota_reply(rule_quota["reason"])
+
+    rule_reply = generate_chatty_response(sanitized_input, [], state=state, tenant=tenant)
+
+    if rule_reply:
+        logging.info("[CHAT] Rule-based response used")
+        rate_limiter.charge_rule_message(user_id)
+        if disclaimer:
+            rule_reply["reply"] += disclaimer
+
+        save_chat(user.id, user_input, rule_reply, "rule", started, tenant=tenant)
+        return respond(rule_reply)
+
+    classifier = get_intent_classifier()
+    label = classifier.classify(sanitized_input) if classifier else None
+    classified_reply = canned_reply(label, sanitized_input, tenant, state) if label else None
+
+    if classified_reply:
+        logging.info(f"[CHAT] Classifier response used ({label})")
+        rate_limiter.charge_rule_message(user_id)
+        if disclaimer:
+            classified_reply["reply"] += disclaimer
+
+        save_chat(user.id, user_input, classified_reply, "classifier", started, tenant=tenant)
+        return respond(classified_reply)
+
+    retriever = get_retriever(tenant)
+    retrieval_reply = retriever.answer(sanitized_input)
+
+    if retrieval_reply:
+        logging.info("[CHAT] Retrieval response used")
+        rate_limiter.charge_rule_message(user_id)
+        if disclaimer:
+            retrieval_reply["reply"] += disclaimer
+
+        save_chat(user.id, user_input, retrieval_reply, "retrieval", started, tenant=tenant)
+        return respond(retrieval_reply)
+
+    token_quota = rate_limiter.check_token_budget(user_id)
+    if not token_quota["allowed"]:
+        return quota_reply(token_quota["reason"])
+
+    logging.info("[CHAT] No rule match, calling LLM")
+    intent_hint = classifier.predict(sanitized_input)[0] if classifier else None
+    llm_result = call_llm_with_usage(
+        sanitized_input, context=retriever.grounding(sanitized_input),
+        intent=intent_hint, category=security_check["metadata"]["category"],
+        on_token=_guard_stream(on_token) if on_token else None, tenant=tenant
+    )
+
+    if llm_result:
+        rate_limiter.charge_tokens(user_id, llm_result["prompt_tokens"] + llm_result["completion_tokens"])
+        output_check = sanitize_output(llm_result["content"])
+
+        if not output_check["safe"]:
+            log_security_event(user_id, "unsafe_llm_output", "Output sanitized")
+            final_reply = output_check["sanitized_text"]
+        else:
+            final_reply = llm_result["content"]
+
+        if disclaimer:
+            final_reply += disclaimer
+
+        reply = {"intent": "llm", "reply": final_reply}
+        logging.info("[CHAT] LLM response used")
+        save_chat(user.id, user_input, reply, llm_result["source"], started, llm_result, tenant)
+    else:
+        reply = {"intent": "fallback", "reply": FALLBACK_REPLY}
+        logging.warning("[CHAT] LLM failed, using fallback")
+        save_chat(user.id, user_input, reply, "fallback", started, tenant=tenant)
+
+    return respond(reply)
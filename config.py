@@ -0,0 +1,125 @@
+"""
+Konfigurasi aplikasi dari environment / file .env.
+
+Ini satu-satunya tempat load_dotenv() dipanggil; modul lain mengambil
+nilainya dari sini (from config import ...) alih-alih membaca os.getenv
+sendiri, sehingga .env cukup di-parse sekali per proses.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# App / server
+DEFAULT_SECRET_KEY = 'change_this_in_production'
+SECRET_KEY = os.getenv('SECRET_KEY', DEFAULT_SECRET_KEY)
+SESSION_MODE = os.getenv('SESSION_MODE', 'db')
+SESSION_SIGNING_KEY = os.getenv('SESSION_SIGNING_KEY', SECRET_KEY)
+SESSION_TTL_DAYS = int(os.getenv('SESSION_TTL_DAYS', 7))
+REVOCATION_SYNC_SECONDS = float(os.getenv('REVOCATION_SYNC_SECONDS', 5))
+FLASK_DEBUG = os.getenv('FLASK_DEBUG', '0') == '1'
+CORS_ORIGINS = [o.strip() for o in os.getenv('CORS_ORIGINS', '').split(',') if o.strip()]
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv('ADMIN_EMAILS', '').split(',') if e.strip()}
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', 5000))
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 4))
+GUNICORN_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', 150))
+GUNICORN_MAX_REQUESTS = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+ASSETS_DIST_DIR = os.getenv('ASSETS_DIST_DIR', os.path.join(BASE_DIR, 'static', 'dist'))
+# Tiap koneksi WebSocket memegang satu thread worker selama terbuka; default
+# menyisakan separuh thread untuk request HTTP biasa.
+WS_MAX_CONNECTIONS = int(os.getenv('WS_MAX_CONNECTIONS', max(1, GUNICORN_THREADS // 2)))
+WS_PING_SECONDS = float(os.getenv('WS_PING_SECONDS', 25))
+WS_IDLE_SECONDS = float(os.getenv('WS_IDLE_SECONDS', 300))
+WS_REAUTH_SECONDS = float(os.getenv('WS_REAUTH_SECONDS', 60))
+WS_MAX_MESSAGE_BYTES = int(os.getenv('WS_MAX_MESSAGE_BYTES', 8192))
+WS_MAX_PENDING = int(os.getenv('WS_MAX_PENDING', 5))
+WS_TOKEN_FLUSH_MS = float(os.getenv('WS_TOKEN_FLUSH_MS', 50))
+
+# Profiling per request (lihat profiling.py)
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_SAMPLE_RATE = int(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SAMPLE_PATHS = {p.strip() for p in os.getenv('PROFILE_SAMPLE_PATHS', '/api/chat').split(',') if p.strip()}
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 2))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 200))
+
+# Database
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'database': os.getenv('DB_NAME', 'rs_chatbot'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'port': os.getenv('DB_PORT', 5432)
+}
+# Read replica: "host:port" dipisah koma, kredensial sama dengan primary.
+DB_REPLICAS = [
+    dict(DB_CONFIG, host=entry.split(':')[0], port=entry.split(':')[1] if ':' in entry else DB_CONFIG['port'])
+    for entry in (e.strip() for e in os.getenv('DB_REPLICAS', '').split(',')) if entry
+]
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', 5))
+DB_REPLICA_CHECK_SECONDS = float(os.getenv('DB_REPLICA_CHECK_SECONDS', 5))
+DB_STICKY_SECONDS = float(os.getenv('DB_STICKY_SECONDS', DB_REPLICA_MAX_LAG_SECONDS))
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 5000))
+ANALYTICS_FLUSH_SECONDS = float(os.getenv('ANALYTICS_FLUSH_SECONDS', 30))
+ANALYTICS_MAX_PENDING = int(os.getenv('ANALYTICS_MAX_PENDING', 10000))
+RETENTION_MONTHS = {
+    'chat_history': int(os.getenv('CHAT_HISTORY_RETENTION_MONTHS', 12)),
+    'security_log': int(os.getenv('SECURITY_LOG_RETENTION_MONTHS', 6)),
+}
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+ARCHIVE_FORMAT = os.getenv('ARCHIVE_FORMAT', 'gzip')
+
+# Invalidasi cache antar worker
+INVALIDATION_BACKEND = os.getenv('INVALIDATION_BACKEND', 'postgres')
+INVALIDATION_CHANNEL = os.getenv('INVALIDATION_CHANNEL', 'cache_invalidation')
+INVALIDATION_FILE = os.getenv('INVALIDATION_FILE', os.path.join(BASE_DIR, 'invalidation.jsonl'))
+INVALIDATION_COALESCE_MS = float(os.getenv('INVALIDATION_COALESCE_MS', 50))
+INVALIDATION_MAX_KEYS_PER_BURST = int(os.getenv('INVALIDATION_MAX_KEYS_PER_BURST', 100))
+
+# LLM
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_BASE_URLS = [url.strip().rstrip("/") for url in os.getenv("OLLAMA_BASE_URLS", OLLAMA_BASE_URL).split(",") if url.strip()]
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")
+OLLAMA_SMALL_MODEL = os.getenv("OLLAMA_SMALL_MODEL", "")
+LLM_TIER_CONCURRENCY_SMALL = int(os.getenv("LLM_TIER_CONCURRENCY_SMALL", 8))
+LLM_TIER_CONCURRENCY_LARGE = int(os.getenv("LLM_TIER_CONCURRENCY_LARGE", 4))
+LLM_TIER_QUEUE_SECONDS = float(os.getenv("LLM_TIER_QUEUE_SECONDS", 60))
+LLM_ROUTING_THRESHOLD = int(os.getenv("LLM_ROUTING_THRESHOLD", 2))
+LLM_HEDGE_SECONDS = float(os.getenv("LLM_HEDGE_SECONDS", 0))
+LLM_MAX_SENTENCES = int(os.getenv("LLM_MAX_SENTENCES", 8))
+LLM_MAX_NUM_PREDICT = int(os.getenv("LLM_MAX_NUM_PREDICT", 300))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", 0.5))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", 30))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", 30))
+LLM_BREAKER_PROBE_INTERVAL = float(os.getenv("LLM_BREAKER_PROBE_INTERVAL", 5))
+
+# Rule engine, intent & retrieval
+RULE_FUZZY_MATCHING = os.getenv('RULE_FUZZY_MATCHING', 'true').lower() == 'true'
+INTENT_MODEL_PATH = os.getenv('INTENT_MODEL_PATH', os.path.join(BASE_DIR, 'intent_model.npz'))
+INTENT_CONFIDENCE = float(os.getenv('INTENT_CONFIDENCE', 0.85))
+RETRIEVAL_THRESHOLD = float(os.getenv("RETRIEVAL_THRESHOLD", 0.6))
+
+# Multi-tenant: satu proses melayani beberapa RS (lihat tenants.py)
+TENANTS_FILE = os.getenv('TENANTS_FILE', os.path.join(BASE_DIR, 'tenants.json'))
+TENANT_HEADER = os.getenv('TENANT_HEADER', 'X-Tenant')
+DEFAULT_TENANT = os.getenv('DEFAULT_TENANT', 'default')
+
+# Abuse tracking
+ABUSE_BLOCK_SCORE = float(os.getenv('ABUSE_BLOCK_SCORE', 10))
+ABUSE_HALF_LIFE_SECONDS = float(os.getenv('ABUSE_HALF_LIFE_SECONDS', 600))
+ABUSE_BLOCK_SECONDS = int(os.getenv('ABUSE_BLOCK_SECONDS', 300))
+ABUSE_MAX_BLOCK_SECONDS = int(os.getenv('ABUSE_MAX_BLOCK_SECONDS', 86400))
+SECURITY_LOG_FLUSH_SECONDS = float(os.getenv('SECURITY_LOG_FLUSH_SECONDS', 10))
+SECURITY_LOG_MAX_PENDING = int(os.getenv('SECURITY_LOG_MAX_PENDING', 10000))
+
+# Kuota
+TOKEN_BUDGET_CAPACITY = int(os.getenv('TOKEN_BUDGET_CAPACITY', 6000))
+TOKEN_BUDGET_REFILL_PER_MINUTE = float(os.getenv('TOKEN_BUDGET_REFILL_PER_MINUTE', 100))
+RULE_BUDGET_CAPACITY = int(os.getenv('RULE_BUDGET_CAPACITY', 120))
+RULE_BUDGET_REFILL_PER_MINUTE = float(os.getenv('RULE_BUDGET_REFILL_PER_MINUTE', 20))
@@ -1,34 +1,205 @@
-import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from flask import g
-from dotenv import load_dotenv
+import time
 import logging
+import threading
+from flask import g, session, has_request_context
 
-load_dotenv()
+from config import DB_CONFIG, DB_REPLICAS, DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_CHECK_SECONDS, DB_STICKY_SECONDS
 
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'database': os.getenv('DB_NAME', 'rs_chatbot'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'port': os.getenv('DB_PORT', 5432)
-}
+
+def _connect(config: dict, **kwargs):
+    # psycopg2 baru di-import saat koneksi pertama, bukan saat modul di-load.
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    return psycopg2.connect(**config, cursor_factory=RealDictCursor, **kwargs)
+
+
+class Replica:
+    def __init__(self, config: dict):
+        self.config = config
+        self.name = f"{config['host']}:{config['port']}"
+        self.healthy = False
+        self.lag = None
+        self.last_check = None
+        self.failures = 0
+
+
+class ReplicaRouter:
+    """Pilih read replica yang sehat dan lag-nya masih di bawah DB_REPLICA_MAX_LAG_SECONDS.
+
+    Replica baru dipakai setelah health check pertama; replica yang gagal
+    connect atau tertinggal terlalu jauh keluar dari rotasi sampai check
+    berikutnya menyatakannya sehat lagi.
+    """
+    LAG_QUERY = """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END AS lag
+    """
+
+    def __init__(self, configs: list, max_lag: float = DB_REPLICA_MAX_LAG_SECONDS,
+                 check_seconds: float = DB_REPLICA_CHECK_SECONDS):
+        self.replicas = [Replica(config) for config in configs]
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        self.next_index = 0
+        self.reads = {"replica": 0, "primary": 0}
+        self.lock = threading.Lock()
+        self._check_thread = None
+
+    def pick(self) -> Replica | None:
+        if not self.replicas:
+            return None
+        if self._check_thread is None:
+            with self.lock:
+                if self._check_thread is None:
+                    self._check_thread = threading.Thread(target=self._check_loop, name="db-replica-check", daemon=True)
+                    self._check_thread.start()
+        with self.lock:
+            candidates = [r for r in self.replicas if r.healthy]
+            if not candidates:
+                return None
+            replica = candidates[self.next_index % len(candidates)]
+            self.next_index += 1
+            return replica
+
+    def mark_failed(self, replica: Replica, error: Exception):
+        with self.lock:
+            replica.healthy = False
+            replica.failures += 1
+        logging.warning(f"[DB] Replica {replica.name} dikeluarkan dari rotasi: {error}")
+
+    def count_read(self, target: str):
+        with self.lock:
+            self.reads[target] += 1
+
+    def _check_loop(self):
+        while True:
+            for replica in self.replicas:
+                self.check(replica)
+            time.sleep(self.check_seconds)
+
+    def check(self, replica: Replica):
+        try:
+            conn = _connect(replica.config, connect_timeout=2)
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.LAG_QUERY)
+                lag = float(cursor.fetchone()['lag'])
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            with self.lock:
+                if replica.healthy:
+                    logging.warning(f"[DB] Replica {replica.name} tidak sehat: {e}")
+                replica.healthy = False
+                replica.failures += 1
+                replica.last_check = time.time()
+            return
+
+        with self.lock:
+            was_healthy = replica.healthy
+            replica.lag = lag
+            replica.healthy = lag <= self.max_lag
+            replica.last_check = time.time()
+        if replica.healthy and not was_healthy:
+            logging.info(f"[DB] Replica {replica.name} masuk rotasi (lag {lag:.1f}s)")
+        elif not replica.healthy and was_healthy:
+            logging.warning(f"[DB] Replica {replica.name} tertinggal {lag:.1f}s - dikeluarkan dari rotasi")
+
+    def get_state(self) -> dict:
+        with self.lock:
+            return {
+                "max_lag_seconds": self.max_lag,
+                "sticky_seconds": DB_STICKY_SECONDS,
+                "reads": dict(self.reads),
+                "replicas": [
+                    {
+                        "name": r.name,
+                        "healthy": r.healthy,
+                        "lag": round(r.lag, 3) if r.lag is not None else None,
+                        "last_check": r.last_check,
+                        "failures": r.failures
+                    }
+                    for r in self.replicas
+                ]
+            }
+
+_replica_router_instance = None
+
+def get_replica_router():
+    global _replica_router_instance
+    if _replica_router_instance is None:
+        _replica_router_instance = ReplicaRouter(DB_REPLICAS)
+    return _replica_router_instance
+
+
+def mark_write():
+    """Catat bahwa user ini baru menulis, supaya read berikutnya dibaca dari primary.
+
+    Disimpan di session (cookie) sehingga berlaku juga di worker lain. Hanya
+    dipanggil untuk tulisan user yang hasilnya langsung dibaca lagi (session,
+    janji temu, import massal), bukan log chat; tanpa replica tidak ada apa-apa
+    yang perlu dicatat, jadi cookie session tidak ikut berubah.
+    """
+    if DB_REPLICAS and has_request_context():
+        g.wrote = True
+        session['_last_write'] = time.time()
+
+def _read_from_primary() -> bool:
+    if not has_request_context():
+        return False
+    if g.get('wrote'):
+        return True
+    return time.time() - session.get('_last_write', 0) < DB_STICKY_SECONDS
+
+def get_connection(readonly: bool = False):
+    """Koneksi baru di luar flask.g (untuk named cursor / thread background)."""
+    if readonly and not _read_from_primary():
+        router = get_replica_router()
+        replica = router.pick()
+        if replica is not None:
+            try:
+                conn = _connect(replica.config, connect_timeout=2)
+                conn.set_session(readonly=True)
+                router.count_read("replica")
+                return conn
+            except Exception as e:
+                router.mark_failed(replica, e)
+        router.count_read("primary")
+    return _connect(DB_CONFIG)
 
 def get_db():
     if 'db' not in g:
         try:
-            g.db = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+            g.db = get_connection()
             logging.debug("[DB] Connected")
         except Exception as e:
             logging.error(f"[DB] Connection failed: {e}")
             raise
     return g.db
 
+def get_read_db():
+    """Koneksi read-only per request: replica bila ada, primary bila user baru saja menulis."""
+    if 'read_db' in g:
+        return g.read_db
+    if not DB_REPLICAS:
+        return get_db()
+    if _read_from_primary():
+        get_replica_router().count_read("primary")
+        return get_db()
+    g.read_db = get_connection(readonly=True)
+    return g.read_db
+
 def close_connection(exception=None):
     db = g.pop('db', None)
     if db is not None:
         db.close()
+    read_db = g.pop('read_db', None)
+    if read_db is not None and read_db is not db:
+        read_db.close()
 
 def init_db(app):
     with app.app_context():
@@ -61,6 +232,19 @@ def init_db(app):
                 CREATE INDEX IF NOT EXISTS idx_sessions_token 
                 ON sessions(session_token)
             """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS revoked_tokens (
+                    jti VARCHAR(32) PRIMARY KEY,
+                    expires_at TIMESTAMP NOT NULL,
+                    revoked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_revoked_tokens_revoked_at
+                ON revoked_tokens(revoked_at)
+            """)
             
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS appointments (
@@ -75,26 +259,130 @@ def init_db(app):
                 )
             """)
             
+            # Import massal (bulk_io) meng-upsert janji temu berdasarkan ID dari sistem RS,
+            # unik per tenant (tenants.py) karena tiap RS punya penomoran sendiri.
+            cursor.execute("""
+                ALTER TABLE appointments
+                    ADD COLUMN IF NOT EXISTS tenant_id VARCHAR(50) NOT NULL DEFAULT 'default',
+                    ADD COLUMN IF NOT EXISTS external_id VARCHAR(100)
+            """)
+
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_tenant_external_id
+                ON appointments(tenant_id, external_id) WHERE external_id IS NOT NULL
+            """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS doctors (
+                    tenant_id VARCHAR(50) NOT NULL DEFAULT 'default',
+                    kontak VARCHAR(50) NOT NULL,
+                    nama VARCHAR(255) NOT NULL,
+                    spesialisasi VARCHAR(255) NOT NULL,
+                    kategori VARCHAR(20) NOT NULL,
+                    jadwal VARCHAR(255) NOT NULL,
+                    fun_fact TEXT NOT NULL DEFAULT '',
+                    sapaan TEXT NOT NULL DEFAULT '',
+                    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (tenant_id, kontak)
+                )
+            """)
+            
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS chat_history (
-                    id SERIAL PRIMARY KEY,
+                    id SERIAL,
+                    tenant_id VARCHAR(50) NOT NULL DEFAULT 'default',
                     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
                     message TEXT NOT NULL,
                     response TEXT NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    intent VARCHAR(100),
+                    source VARCHAR(20),
+                    latency_ms INTEGER,
+                    prompt_tokens INTEGER DEFAULT 0,
+                    completion_tokens INTEGER DEFAULT 0,
+                    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (id, timestamp)
+                ) PARTITION BY RANGE (timestamp)
+            """)
+            
+            cursor.execute("""
+                ALTER TABLE chat_history
+                    ADD COLUMN IF NOT EXISTS intent VARCHAR(100),
+                    ADD COLUMN IF NOT EXISTS source VARCHAR(20),
+                    ADD COLUMN IF NOT EXISTS latency_ms INTEGER,
+                    ADD COLUMN IF NOT EXISTS prompt_tokens INTEGER DEFAULT 0,
+                    ADD COLUMN IF NOT EXISTS completion_tokens INTEGER DEFAULT 0,
+                    ADD COLUMN IF NOT EXISTS tenant_id VARCHAR(50) NOT NULL DEFAULT 'default'
+            """)
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chat_stats_hourly (
+                    tenant_id VARCHAR(50) NOT NULL DEFAULT 'default',
+                    hour TIMESTAMP NOT NULL,
+                    intent VARCHAR(100) NOT NULL,
+                    source VARCHAR(20) NOT NULL,
+                    topic VARCHAR(255) NOT NULL DEFAULT '',
+                    requests BIGINT NOT NULL DEFAULT 0,
+                    latency_ms_total BIGINT NOT NULL DEFAULT 0,
+                    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+                    completion_tokens BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (tenant_id, hour, intent, source, topic)
                 )
             """)
+
+            # Rollup versi lama belum punya tenant_id: tambahkan kolomnya dan ganti primary key.
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = 'chat_stats_hourly' "
+                "AND column_name = 'tenant_id'"
+            )
+            if cursor.fetchone() is None:
+                cursor.execute("""
+                    ALTER TABLE chat_stats_hourly
+                        ADD COLUMN tenant_id VARCHAR(50) NOT NULL DEFAULT 'default',
+                        DROP CONSTRAINT chat_stats_hourly_pkey,
+                        ADD PRIMARY KEY (tenant_id, hour, intent, source, topic)
+                """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_chat_history_user_ts
+                ON chat_history(user_id, timestamp DESC, id DESC)
+            """)
+
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_chat_history_tenant_id
+                ON chat_history(tenant_id, id)
+            """)
             
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS security_log (
-                    id SERIAL PRIMARY KEY,
+                    id SERIAL,
                     user_id VARCHAR(255),
                     event_type VARCHAR(100) NOT NULL,
                     details TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (id, timestamp)
+                ) PARTITION BY RANGE (timestamp)
+            """)
+
+            # Event identik dari user yang sama digabung per flush (abuse.SecurityEventLog).
+            cursor.execute("""
+                ALTER TABLE security_log
+                    ADD COLUMN IF NOT EXISTS count INTEGER NOT NULL DEFAULT 1,
+                    ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP
+            """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS abuse_blocks (
+                    user_id VARCHAR(255) PRIMARY KEY,
+                    blocked_until TIMESTAMP NOT NULL,
+                    strikes INTEGER NOT NULL DEFAULT 1,
+                    reason VARCHAR(100),
+                    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
                 )
             """)
             
+            from retention import ensure_partitions
+            ensure_partitions(cursor)
+            
             db.commit()
             logging.info("[DB] Tables initialized with auth support")
             
@@ -105,8 +393,8 @@ def init_db(app):
         finally:
             cursor.close()
 
-def execute_query(query, params=None, fetch=False):
-    db = get_db()
+def execute_query(query, params=None, fetch=False, readonly=False):
+    db = get_read_db() if readonly else get_db()
     cursor = db.cursor()
     
     try:
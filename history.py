@@ -0,0 +1,163 @@
+import io
+import csv
+import json
+import uuid
+import base64
+import logging
+from datetime import datetime
+
+from config import HISTORY_PAGE_SIZE, EXPORT_BATCH_SIZE
+from database import execute_query, get_connection
+from tenants import current_tenant
+
+HISTORY_MAX_PAGE_SIZE = 100
+EXPORT_COLUMNS = ['id', 'tenant_id', 'user_id', 'message', 'response', 'timestamp']
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple | None:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def get_history_page(user_id: int, cursor: str | None = None, limit: int = HISTORY_PAGE_SIZE,
+                     tenant_id: str | None = None) -> dict:
+    """Riwayat chat user di satu tenant (default: tenant request ini)."""
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    tenant_id = tenant_id or current_tenant().id
+
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return {"success": False, "message": "Cursor tidak valid"}
+        rows = execute_query(
+            """SELECT id, message, response, timestamp FROM chat_history
+               WHERE user_id = %s AND tenant_id = %s AND (timestamp, id) < (%s, %s)
+               ORDER BY timestamp DESC, id DESC LIMIT %s""",
+            (user_id, tenant_id, position[0], position[1], limit + 1),
+            fetch=True,
+            readonly=True
+        )
+    else:
+        rows = execute_query(
+            """SELECT id, message, response, timestamp FROM chat_history
+               WHERE user_id = %s AND tenant_id = %s
+               ORDER BY timestamp DESC, id DESC LIMIT %s""",
+            (user_id, tenant_id, limit + 1),
+            fetch=True,
+            readonly=True
+        )
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id']) if has_more else None
+
+    return {
+        "success": True,
+        "messages": [
+            {
+                "id": row['id'],
+                "message": row['message'],
+                "response": row['response'],
+                "timestamp": row['timestamp'].isoformat()
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor
+    }
+
+
+def parse_export_filters(args, tenant_id: str) -> dict:
+    """Validasi filter export (user_id, since, until) sebelum response dimulai; ValueError bila tidak valid.
+
+    tenant_id wajib dan tidak diambil dari parameter klien: export selalu
+    dibatasi ke tenant milik admin yang meminta.
+    """
+    filters = {'tenant_id': tenant_id}
+    if args.get('user_id'):
+        try:
+            filters['user_id'] = int(args['user_id'])
+        except ValueError:
+            raise ValueError("user_id harus angka") from None
+    for key in ('since', 'until'):
+        if args.get(key):
+            try:
+                filters[key] = datetime.fromisoformat(args[key])
+            except ValueError:
+                raise ValueError(f"{key} harus tanggal ISO 8601, mis. 2024-01-31 atau 2024-01-31T08:00") from None
+    if 'since' in filters and 'until' in filters and filters['since'] >= filters['until']:
+        raise ValueError("since harus sebelum until")
+    return filters
+
+
+def _export_query(filters: dict) -> tuple:
+    clauses = ["tenant_id = %s"]
+    params = [filters.get('tenant_id') or current_tenant().id]
+    if filters.get('user_id'):
+        clauses.append("user_id = %s")
+        params.append(filters['user_id'])
+    if filters.get('since'):
+        clauses.append("timestamp >= %s")
+        params.append(filters['since'])
+    if filters.get('until'):
+        clauses.append("timestamp < %s")
+        params.append(filters['until'])
+    return f"SELECT {', '.join(EXPORT_COLUMNS)} FROM chat_history WHERE {' AND '.join(clauses)} ORDER BY id", tuple(params)
+
+
+def stream_export(fmt: str = 'ndjson', filters: dict | None = None, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield potongan NDJSON/CSV lewat named (server-side) cursor agar memori tetap datar.
+
+    `filters` harus sudah divalidasi dengan parse_export_filters.
+    """
+    query, params = _export_query(filters or {})
+    conn = get_connection(readonly=True)
+    exported = 0
+
+    try:
+        with conn.cursor(name=f"chat_export_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer) if fmt == 'csv' else None
+            if writer:
+                writer.writerow(EXPORT_COLUMNS)
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if writer:
+                        writer.writerow([row['id'], row['tenant_id'], row['user_id'], row['message'], row['response'],
+                                         row['timestamp'].isoformat()])
+                    else:
+                        buffer.write(json.dumps({
+                            "id": row['id'],
+                            "tenant_id": row['tenant_id'],
+                            "user_id": row['user_id'],
+                            "message": row['message'],
+                            "response": row['response'],
+                            "timestamp": row['timestamp'].isoformat()
+                        }, ensure_ascii=False))
+                        buffer.write("\n")
+                exported += len(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+            if buffer.tell():
+                yield buffer.getvalue()
+        conn.commit()
+        logging.info(f"[HISTORY] Export selesai: {exported} rows ({fmt})")
+    finally:
+        conn.close()
@@ -0,0 +1,236 @@
+"""
+Klasifikasi intent ringan (char n-gram hashing + softmax regression NumPy)
+yang dilatih dari chat_history, supaya pertanyaan yang lolos dari rule tapi
+jelas-jelas intent umum tidak perlu memanggil LLM.
+
+Training:
+    python intent_classifier.py train [--jsonl data.jsonl] [--output intent_model.npz] [--limit 200000]
+
+File JSONL berisi baris {"message": ..., "response": ...} (opsional
+"tenant_id" dan "source", seperti export /api/admin/chat/export); tanpa
+--jsonl data diambil langsung dari tabel chat_history (percakapan terbaru,
+maksimal --limit baris; 0 = semua).
+
+Label tiap baris ditebak dari balasan tersimpan dengan data tenant baris itu
+(petunjuk fasilitas dan lokasi berbeda per RS). Baris yang dijawab
+classifier sendiri (source "classifier") dilewati supaya prediksi model
+tidak dipakai lagi sebagai data latih.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import zlib
+import logging
+import argparse
+
+from config import INTENT_MODEL_PATH, INTENT_CONFIDENCE, DEFAULT_TENANT
+from rules import label_for_reply
+
+# numpy di-import di dalam fungsi: tanpa file model, app tidak perlu memuatnya sama sekali.
+NONE_LABEL = 'none'
+
+
+def featurize(text: str, n_features: int, ngram_range=(2, 4)) -> tuple:
+    import numpy as np
+    text = f" {' '.join(text.lower().split())} "
+    counts = {}
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(len(text) - n + 1):
+            index = zlib.crc32(text[i:i + n].encode()) % n_features
+            counts[index] = counts.get(index, 0) + 1
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    values /= np.linalg.norm(values)
+    return indices, values
+
+
+def _to_csr(rows: list) -> tuple:
+    import numpy as np
+    lengths = np.array([len(indices) for indices, _ in rows], dtype=np.int64)
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    indices = np.concatenate([i for i, _ in rows]) if rows else np.zeros(0, dtype=np.int64)
+    values = np.concatenate([v for _, v in rows]) if rows else np.zeros(0, dtype=np.float32)
+    return indptr, indices, values
+
+
+class IntentClassifier:
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: list, n_features: int):
+        self.weights = weights
+        self.bias = bias
+        self.labels = labels
+        self.n_features = n_features
+
+    @classmethod
+    def load(cls, path: str = INTENT_MODEL_PATH):
+        import numpy as np
+        model = np.load(path, allow_pickle=False)
+        return cls(model['weights'], model['bias'], [str(l) for l in model['labels']], int(model['n_features']))
+
+    def save(self, path: str = INTENT_MODEL_PATH):
+        import numpy as np
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            labels=np.array(self.labels),
+            n_features=np.array(self.n_features)
+        )
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        import numpy as np
+        indices, values = featurize(text, self.n_features)
+        scores = self.weights[:, indices] @ values + self.bias
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text: str) -> tuple:
+        probs = self.predict_proba(text)
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def classify(self, text: str, threshold: float = INTENT_CONFIDENCE) -> str | None:
+        label, confidence = self.predict(text)
+        if label == NONE_LABEL or confidence < threshold:
+            return None
+        logging.info(f"[INTENT] Terklasifikasi sebagai {label} ({confidence:.2f})")
+        return label
+
+
+def train(texts: list, labels: list, n_features: int = 2 ** 16, epochs: int = 20,
+          batch_size: int = 256, learning_rate: float = 10.0, l2: float = 1e-5, seed: int = 0) -> IntentClassifier:
+    import numpy as np
+    label_names = sorted(set(labels))
+    label_index = {name: i for i, name in enumerate(label_names)}
+    y = np.array([label_index[l] for l in labels], dtype=np.int64)
+    rows = [featurize(t, n_features) for t in texts]
+
+    n_classes = len(label_names)
+    weights = np.zeros((n_classes, n_features), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+
+    for epoch in range(epochs):
+        order = rng.permutation(len(rows))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            indptr, indices, values = _to_csr([rows[i] for i in batch])
+            row_of = np.repeat(np.arange(len(batch)), np.diff(indptr))
+
+            contrib = weights[:, indices] * values
+            scores = np.zeros((n_classes, len(batch)), dtype=np.float32)
+            np.add.at(scores.T, row_of, contrib.T)
+            scores += bias[:, None]
+            scores -= scores.max(axis=0)
+            probs = np.exp(scores)
+            probs /= probs.sum(axis=0)
+            probs[y[batch], np.arange(len(batch))] -= 1.0
+            probs /= len(batch)
+
+            grad = np.zeros_like(weights.T)
+            np.add.at(grad, indices, (probs[:, row_of] * values).T)
+            weights -= learning_rate * (grad.T + l2 * weights)
+            bias -= learning_rate * probs.sum(axis=1)
+
+    return IntentClassifier(weights, bias, label_names, n_features)
+
+
+def _holdout(text: str, fraction: float = 0.2) -> bool:
+    return (zlib.crc32(text.encode()) % 1000) < fraction * 1000
+
+
+def load_examples(jsonl_path: str | None, limit: int = 0):
+    """Generator (message, response, tenant_id) tanpa baris jawaban classifier; maksimal `limit` (0 = semua)."""
+    if jsonl_path:
+        with open(jsonl_path, encoding='utf-8') as f:
+            count = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if row.get('source') == 'classifier':
+                    continue
+                yield row['message'], row['response'], row.get('tenant_id', DEFAULT_TENANT)
+                count += 1
+                if limit and count >= limit:
+                    return
+        return
+
+    import psycopg2
+    from config import DB_CONFIG
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor(name='intent_training') as cursor:
+            cursor.itersize = 10000
+            query = ("SELECT message, response, tenant_id FROM chat_history "
+                     "WHERE source IS DISTINCT FROM 'classifier'")
+            if limit:
+                cursor.execute(query + " ORDER BY timestamp DESC LIMIT %s", (limit,))
+            else:
+                cursor.execute(query)
+            yield from cursor
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latih klasifikasi intent dari chat_history")
+    sub = parser.add_subparsers(dest='command', required=True)
+    train_parser = sub.add_parser('train')
+    train_parser.add_argument('--jsonl', help="Baca contoh dari file JSONL, bukan dari database")
+    train_parser.add_argument('--output', default=INTENT_MODEL_PATH)
+    train_parser.add_argument('--threshold', type=float, default=INTENT_CONFIDENCE)
+    train_parser.add_argument('--limit', type=int, default=200000, help="Maksimal contoh yang dibaca (0 = semua)")
+    args = parser.parse_args(argv)
+
+    from tenants import get_tenant_registry
+    registry = get_tenant_registry()
+    train_set, test_set = [], []
+    unknown_tenants = {}
+    for message, response, tenant_id in load_examples(args.jsonl, args.limit):
+        tenant = registry.get(tenant_id)
+        if tenant is None:
+            # Balasan tenant yang sudah tidak dikonfigurasi tidak bisa dilabeli dengan benar.
+            unknown_tenants[tenant_id] = unknown_tenants.get(tenant_id, 0) + 1
+            continue
+        example = (message, label_for_reply(response, tenant) or NONE_LABEL)
+        (test_set if _holdout(message) else train_set).append(example)
+    print(f"Contoh: {len(train_set) + len(test_set)} (latih {len(train_set)}, held-out {len(test_set)})")
+    if unknown_tenants:
+        print("Dilewati (tenant tidak dikenal): " + ", ".join(f"{t}={n}" for t, n in sorted(unknown_tenants.items())))
+
+    model = train([m for m, _ in train_set], [l for _, l in train_set])
+    model.save(args.output)
+    print(f"Model disimpan ke {args.output} ({len(model.labels)} label)")
+
+    intent_examples = [(m, l) for m, l in test_set if l != NONE_LABEL]
+    llm_examples = [m for m, l in test_set if l == NONE_LABEL]
+    predictions = [(model.classify(m, args.threshold), l) for m, l in intent_examples]
+    correct = sum(1 for predicted, l in predictions if predicted == l)
+    wrong = sum(1 for predicted, l in predictions if predicted not in (None, l))
+    diverted = sum(1 for m in llm_examples if model.classify(m, args.threshold) is not None)
+    if intent_examples:
+        print(f"Recall intent held-out @ {args.threshold}: {correct}/{len(intent_examples)} ({correct / len(intent_examples):.1%}), salah intent: {wrong}")
+    if llm_examples:
+        print(f"Trafik LLM held-out yang dialihkan: {diverted}/{len(llm_examples)} ({diverted / len(llm_examples):.1%})")
+
+
+_intent_classifier_instance = None
+
+def get_intent_classifier():
+    global _intent_classifier_instance
+    if _intent_classifier_instance is None:
+        if not os.path.exists(INTENT_MODEL_PATH):
+            return None
+        _intent_classifier_instance = IntentClassifier.load(INTENT_MODEL_PATH)
+        logging.info(f"[INTENT] Model dimuat: {len(_intent_classifier_instance.labels)} label")
+    return _intent_classifier_instance
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Bus invalidasi cache antar worker/node.
+
+Cache in-process (revocation list, indeks retrieval, indeks fuzzy rule)
+didaftarkan dengan register_cache(nama, evict). Modul mana pun bisa
+memanggil publish(nama, key); semua proses yang mendengarkan bus memanggil
+evict(key) pada cache dengan nama itu (key None = kosongkan seluruh cache).
+
+Backend (INVALIDATION_BACKEND):
+    postgres  LISTEN/NOTIFY di channel INVALIDATION_CHANNEL (default)
+    file      append JSON line ke INVALIDATION_FILE, listener men-tail file
+              (untuk test / satu mesin tanpa Postgres)
+    none      hanya invalidasi lokal
+
+Notifikasi yang datang beruntun dikumpulkan selama INVALIDATION_COALESCE_MS
+lalu di-dedup per (cache, key), jadi satu burst hanya memicu satu evict per
+key. Delay propagasi (waktu publish -> diterima) dicatat untuk /api/health.
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+
+from config import (
+    DB_CONFIG, INVALIDATION_BACKEND, INVALIDATION_CHANNEL, INVALIDATION_FILE,
+    INVALIDATION_COALESCE_MS, INVALIDATION_MAX_KEYS_PER_BURST
+)
+
+
+class InvalidationBus:
+    def __init__(self, backend: str = INVALIDATION_BACKEND, coalesce_ms: float = INVALIDATION_COALESCE_MS):
+        self.backend = backend
+        self.coalesce_seconds = coalesce_ms / 1000
+        self.caches = {}
+        self._reset_process_state()
+
+    def _reset_process_state(self):
+        # Dipanggil ulang setelah fork: thread dan koneksi tidak ikut ter-fork,
+        # dan tiap worker butuh origin sendiri supaya pesannya sendiri dikenali.
+        self.pid = os.getpid()
+        self.origin = uuid.uuid4().hex[:12]
+        self.lock = threading.Lock()
+        # Counter diubah dari thread request, listener dan publish sekaligus.
+        self.stats_lock = threading.Lock()
+        self.connected = False
+        self._publish_conn = None
+        self._listen_thread = None
+        self.delays = deque(maxlen=500)
+        self.stats = {"published": 0, "publish_errors": 0, "received": 0, "own": 0,
+                      "coalesced": 0, "evictions": 0, "evict_errors": 0, "listen_errors": 0,
+                      "invalid": 0, "resyncs": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self.stats_lock:
+            self.stats[name] += n
+
+    def register_cache(self, name: str, evict, first: bool = False):
+        """first=True: panggil sebelum evict lain untuk nama ini (mis. reload sumber data sebelum cache turunannya)."""
+        handlers = self.caches.setdefault(name, [])
+        if first:
+            handlers.insert(0, evict)
+        else:
+            handlers.append(evict)
+
+    def start(self):
+        """Jalankan listener di proses ini (idempotent, aman dipanggil tiap request)."""
+        if self.pid == os.getpid() and (self._listen_thread is not None or self.backend == 'none'):
+            return
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset_process_state()
+            if self._listen_thread is not None or self.backend == 'none':
+                return
+            target = self._listen_file if self.backend == 'file' else self._listen_postgres
+            self._listen_thread = threading.Thread(target=target, name="invalidation-listen", daemon=True)
+            self._listen_thread.start()
+
+    def invalidate_local(self, cache: str, key=None):
+        """Evict di proses ini saja, tanpa mengabari proses lain."""
+        self._evict(cache, key)
+
+    def publish(self, cache: str, key=None):
+        """Evict lokal segera, lalu kabarkan ke proses lain."""
+        self._evict(cache, key)
+        if self.backend == 'none':
+            return
+        payload = json.dumps({"c": cache, "k": key, "t": time.time(), "o": self.origin})
+        try:
+            if self.backend == 'file':
+                with open(INVALIDATION_FILE, 'a') as f:
+                    f.write(payload + "\n")
+            else:
+                self._notify(payload)
+            self._count("published")
+        except Exception as e:
+            self._count("publish_errors")
+            logging.error(f"[INVALIDATION] Publish {cache}:{key} gagal: {e}")
+
+    def _notify(self, payload: str):
+        from database import _connect
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_conn is None or self._publish_conn.closed:
+                        self._publish_conn = _connect(DB_CONFIG, connect_timeout=2)
+                        self._publish_conn.autocommit = True
+                    cursor = self._publish_conn.cursor()
+                    cursor.execute("SELECT pg_notify(%s, %s)", (INVALIDATION_CHANNEL, payload))
+                    cursor.close()
+                    return
+                except Exception:
+                    self._publish_conn = None
+                    if attempt:
+                        raise
+
+    def _listen_postgres(self):
+        import select
+        from psycopg2 import sql
+        from database import _connect
+
+        backoff = 1
+        conn = None
+        reconnect = False
+        while True:
+            try:
+                conn = _connect(DB_CONFIG, connect_timeout=5)
+                conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(INVALIDATION_CHANNEL)))
+                self.connected = True
+                backoff = 1
+                logging.info(f"[INVALIDATION] Listening di channel {INVALIDATION_CHANNEL} (pid {os.getpid()})")
+                if reconnect:
+                    # Notifikasi selama terputus hilang: kosongkan semua cache supaya tidak basi selamanya.
+                    self._count("resyncs")
+                    for cache in list(self.caches):
+                        self.invalidate_local(cache)
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    batch = [n.payload for n in conn.notifies]
+                    conn.notifies.clear()
+                    if not batch:
+                        continue
+                    time.sleep(self.coalesce_seconds)
+                    conn.poll()
+                    batch += [n.payload for n in conn.notifies]
+                    conn.notifies.clear()
+                    self._apply(batch)
+            except Exception as e:
+                self.connected = False
+                reconnect = True
+                self._count("listen_errors")
+                if conn is not None:
+                    # Koneksi lama ditutup sebelum reconnect supaya tidak menumpuk di server.
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn = None
+                logging.error(f"[INVALIDATION] Listener terputus, coba lagi dalam {backoff} detik: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _listen_file(self):
+        open(INVALIDATION_FILE, 'a').close()
+        with open(INVALIDATION_FILE) as f:
+            f.seek(0, os.SEEK_END)
+            self.connected = True
+            pending = ""
+            while True:
+                time.sleep(self.coalesce_seconds or 0.05)
+                try:
+                    chunk = f.read()
+                    if not chunk:
+                        continue
+                    pending += chunk
+                    *lines, pending = pending.split("\n")
+                    if lines:
+                        self._apply(lines)
+                except Exception:
+                    # Satu pesan/handler yang rusak tidak boleh menghentikan listener worker ini.
+                    self._count("listen_errors")
+                    logging.exception("[INVALIDATION] Gagal memproses pesan dari file")
+
+    def _apply(self, payloads: list):
+        received = time.time()
+        keys = {}
+        for payload in payloads:
+            if not payload.strip():
+                continue
+            try:
+                message = json.loads(payload)
+                sent, cache, key, origin = float(message["t"]), message["c"], message["k"], message.get("o")
+                hash((cache, key))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self._count("invalid")
+                logging.warning(f"[INVALIDATION] Pesan tidak valid diabaikan: {payload[:200]!r}")
+                continue
+            self._count("received")
+            self.delays.append(received - sent)
+            if origin == self.origin:
+                self._count("own")
+                continue
+            keys.setdefault(cache, []).append(key)
+
+        for cache, cache_keys in keys.items():
+            unique = set(cache_keys)
+            # Burst besar atau "kosongkan semua": satu evict penuh lebih murah dari ratusan evict per key.
+            if None in unique or len(unique) > INVALIDATION_MAX_KEYS_PER_BURST:
+                unique = {None}
+            self._count("coalesced", len(cache_keys) - len(unique))
+            for key in unique:
+                self._evict(cache, key)
+
+    def _evict(self, cache: str, key):
+        for evict in self.caches.get(cache, ()):
+            try:
+                evict(key)
+                self._count("evictions")
+            except Exception as e:
+                self._count("evict_errors")
+                logging.error(f"[INVALIDATION] Evict {cache}:{key} gagal: {e}")
+
+    def get_stats(self) -> dict:
+        delays = sorted(self.delays)
+        with self.stats_lock:
+            stats = dict(self.stats)
+        def percentile(p):
+            return round(delays[min(len(delays) - 1, int(len(delays) * p))] * 1000, 1) if delays else None
+        return {
+            "backend": self.backend,
+            "connected": self.connected,
+            "caches": sorted(self.caches),
+            **stats,
+            "delay_ms": {"p50": percentile(0.5), "p95": percentile(0.95),
+                         "max": round(delays[-1] * 1000, 1) if delays else None}
+        }
+
+_invalidation_bus_instance = None
+
+def get_invalidation_bus():
+    global _invalidation_bus_instance
+    if _invalidation_bus_instance is None:
+        _invalidation_bus_instance = InvalidationBus()
+    return _invalidation_bus_instance
+
+def register_cache(name: str, evict, first: bool = False):
+    get_invalidation_bus().register_cache(name, evict, first)
+
+def publish(cache: str, key=None):
+    get_invalidation_bus().publish(cache, key)
@@ -0,0 +1,186 @@
+"""
+Profiling per request, opt-in.
+
+Request diprofil bila:
+- admin mengirim header `X-Profile: 1` (atau query `?profile=1`), atau
+- sampling: 1 dari tiap PROFILE_SAMPLE_RATE request ke PROFILE_SAMPLE_PATHS
+  (0 = mati).
+
+Mode default adalah sampler wall-clock: thread terpisah mengambil stack
+thread request tiap PROFILE_INTERVAL_MS lewat sys._current_frames(), jadi
+waktu menunggu psycopg2 / requests / lock ikut terlihat. Hasilnya disimpan
+sebagai collapsed stack (`a;b;c 12` per baris) di PROFILE_DIR, yang bisa
+dibuka langsung di speedscope.app atau flamegraph.pl. `X-Profile: cprofile`
+menjalankan cProfile dan menyimpan file .prof (pstats / snakeviz).
+
+Resolusi sampling dibatasi GIL: selama kode Python murni berjalan, sampler
+baru dapat giliran tiap switch interval (default 5 ms).
+
+Generation LLM berjalan di thread single-flight, jadi di profil request ia
+tampak sebagai waktu menunggu di _Flight.wait.
+
+Bila tidak ada yang memicu, overhead per request hanya satu lookup header
+dan satu pengecekan angka.
+"""
+import os
+import re
+import sys
+import time
+import logging
+import itertools
+import threading
+from datetime import datetime
+
+from flask import g, request
+
+from config import PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_SAMPLE_PATHS, PROFILE_INTERVAL_MS, PROFILE_KEEP
+
+_request_counter = itertools.count()
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        labels = {}
+        while True:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+            if self._stop.wait(self.interval):
+                break
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class RequestProfile:
+    def __init__(self, mode: str, reason: str):
+        self.mode = mode
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.profiler = None
+        self.sampler = None
+
+    def start(self):
+        if self.mode == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+            self.sampler.start()
+
+    def finish(self, status: int) -> str | None:
+        duration_ms = int((time.perf_counter() - self.started) * 1000)
+        if self.profiler is not None:
+            self.profiler.disable()
+        else:
+            self.sampler.stop()
+
+        slug = re.sub(r'[^a-z0-9]+', '-', request.path.lower()).strip('-') or 'root'
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{slug}-{status}-{duration_ms}ms-{self.reason}"
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            if self.profiler is not None:
+                name += ".prof"
+                self.profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+            else:
+                name += ".collapsed.txt"
+                with open(os.path.join(PROFILE_DIR, name), 'w') as f:
+                    f.write(self.sampler.collapsed())
+            _prune_profiles()
+        except OSError as e:
+            logging.error(f"[PROFILE] Simpan profil gagal: {e}")
+            return None
+        logging.info(f"[PROFILE] {request.method} {request.path} {duration_ms} ms -> {name}")
+        return name
+
+
+def _prune_profiles():
+    names = sorted(os.listdir(PROFILE_DIR))
+    for name in names[:max(0, len(names) - PROFILE_KEEP)]:
+        os.remove(os.path.join(PROFILE_DIR, name))
+
+def _requested_mode(environ) -> str | None:
+    flag = environ.get('HTTP_X_PROFILE')
+    if not flag and 'profile=' in environ.get('QUERY_STRING', ''):
+        flag = request.args.get('profile')
+    if not flag:
+        return None
+    from auth import get_current_user, is_group_admin
+    if not is_group_admin(get_current_user()):
+        return None
+    return 'cprofile' if flag == 'cprofile' else 'sample'
+
+def start_request_profile():
+    # Hanya baca environ mentah di sini: jalur ini dilewati semua request.
+    environ = request.environ
+    if environ.get('HTTP_UPGRADE', '').lower() == 'websocket':
+        return
+    mode = _requested_mode(environ)
+    reason = 'admin'
+    if mode is None:
+        if not PROFILE_SAMPLE_RATE or request.path not in PROFILE_SAMPLE_PATHS:
+            return
+        if next(_request_counter) % PROFILE_SAMPLE_RATE:
+            return
+        mode, reason = 'sample', 'sampled'
+    g.profile = RequestProfile(mode, reason)
+    g.profile.start()
+
+def finish_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        name = profile.finish(response.status_code)
+        if name:
+            response.headers['X-Profile-Id'] = name
+    return response
+
+def abort_request_profile(exception=None):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.finish(500)
+
+def init_profiling(app):
+    """Daftarkan hook profiling; panggil sebelum before_request lain supaya seluruh request tercakup."""
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(abort_request_profile)
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        stat = os.stat(os.path.join(PROFILE_DIR, name))
+        profiles.append({
+            "id": name,
+            "size": stat.st_size,
+            "created": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+            "format": "pstats" if name.endswith('.prof') else "collapsed"
+        })
+    return profiles
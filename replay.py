@@ -0,0 +1,213 @@
+"""
+Replay pesan tercatat lewat security check dan rule engine, di luar app.
+
+Dipakai untuk menguji perubahan JAILBREAK_PATTERNS, HARMFUL_KEYWORDS atau
+intent rule terhadap traffic nyata sebelum deploy: jalankan sekali dengan
+kode lama sebagai baseline, lalu dengan kode baru plus --baseline.
+
+    python replay.py --db --since 2026-01-01 --out lama.jsonl
+    python replay.py --db --since 2026-01-01 --out baru.jsonl --baseline lama.jsonl --diff diff.jsonl
+    python replay.py --jsonl export.ndjson --out baru.jsonl
+    python replay.py --jsonl export.ndjson --out bandung.jsonl --tenant bandung
+
+Sumber --db dibaca lewat named (server-side) cursor dari chat_history
+(replica bila ada), hanya baris milik tenant --tenant; --jsonl menerima baris {"id", "message"}, termasuk hasil
+export /api/admin/chat/export. Pesan diproses per batch di process pool
+dengan check_content (tanpa rate limit) dan generate_chatty_response
+dry-run (tanpa session, tanpa INSERT booking). Tiap pesan dinilai tanpa
+konteks percakapan, jadi jawaban lanjutan seperti "iya" tidak memicu rule
+follow-up. LLM, classifier dan retrieval tidak dijalankan. Rule dinilai
+dengan data tenant --tenant (default DEFAULT_TENANT, lihat tenants.py).
+
+Output: satu baris keputusan per pesan (urutan sama dengan input) dan, bila
+ada baseline, baris yang berubah beserta ringkasan transisinya.
+"""
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+from collections import Counter, deque
+from multiprocessing import Pool, cpu_count
+
+from config import DEFAULT_TENANT
+from database import get_connection
+from security import check_content
+from rules import generate_chatty_response
+from tenants import get_tenant_registry
+
+BATCH_SIZE = 2000
+DECISION_FIELDS = ("security", "detail", "pii", "rule")
+
+
+def _init_worker():
+    # rules mencatat tiap input (INFO) dan security tiap deteksi (WARNING); untuk
+    # ratusan ribu pesan itu hanya overhead, hasilnya sudah ada di file keputusan.
+    logging.disable(logging.WARNING)
+
+
+def replay_message(message: str, tenant=None) -> dict:
+    check = check_content(message)
+    metadata = check["metadata"]
+    decision = {
+        "security": metadata["reason"],
+        "detail": metadata.get("pattern") or metadata.get("category") or "",
+        "pii": metadata.get("pii_types", []),
+        "rule": None
+    }
+    if check["allowed"]:
+        reply = generate_chatty_response(check["sanitized_input"], [], state={}, dry_run=True, tenant=tenant)
+        decision["rule"] = reply["intent"] if reply else None
+    return decision
+
+
+def replay_batch(batch: list, tenant_id: str = DEFAULT_TENANT) -> list:
+    tenant = get_tenant_registry().get(tenant_id)
+    return [dict(id=message_id, **replay_message(message, tenant)) for message_id, message in batch]
+
+
+def read_jsonl(path: str, batch_size: int = BATCH_SIZE):
+    batch = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            batch.append((row.get("id", line_number), row.get("message") or ""))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def read_chat_history(since: str | None = None, until: str | None = None, limit: int | None = None,
+                      batch_size: int = BATCH_SIZE, tenant_id: str = DEFAULT_TENANT):
+    clauses, params = ["tenant_id = %s"], [tenant_id]
+    if since:
+        clauses.append("timestamp >= %s")
+        params.append(since)
+    if until:
+        clauses.append("timestamp < %s")
+        params.append(until)
+    query = f"SELECT id, message FROM chat_history WHERE {' AND '.join(clauses)} ORDER BY id"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    conn = get_connection(readonly=True)
+    try:
+        with conn.cursor(name=f"chat_replay_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, tuple(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [(row['id'], row['message'] or "") for row in rows]
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_baseline(path: str) -> dict:
+    baseline = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                decision = json.loads(line)
+                baseline[str(decision["id"])] = decision
+    return baseline
+
+
+def outcome(decision: dict | None) -> str:
+    if decision is None:
+        return "tidak ada"
+    if decision["security"] != "allowed":
+        return f"blok:{decision['security']}"
+    return f"rule:{decision['rule']}" if decision["rule"] else "lanjut"
+
+
+def run(batches, workers: int, out, baseline: dict | None = None, diff=None,
+        tenant_id: str = DEFAULT_TENANT) -> dict:
+    """Proses batch di pool, tulis keputusan berurutan; maksimal 2 batch antre per worker supaya memori datar."""
+    stats = {"messages": 0, "changed": 0, "transitions": Counter(), "outcomes": Counter()}
+    pending = deque()
+
+    def drain(result, batch):
+        messages = dict(batch)
+        for decision in result.get():
+            out.write(json.dumps(decision, ensure_ascii=False) + "\n")
+            stats["messages"] += 1
+            stats["outcomes"][outcome(decision)] += 1
+            if baseline is None:
+                continue
+            before = baseline.get(str(decision["id"]))
+            if before is not None and all(before.get(field) == decision[field] for field in DECISION_FIELDS):
+                continue
+            stats["changed"] += 1
+            stats["transitions"][(outcome(before), outcome(decision))] += 1
+            if diff is not None:
+                diff.write(json.dumps({
+                    "id": decision["id"], "message": messages[decision["id"]],
+                    "before": before, "after": decision
+                }, ensure_ascii=False) + "\n")
+
+    with Pool(workers, initializer=_init_worker) as pool:
+        for batch in batches:
+            pending.append((pool.apply_async(replay_batch, (batch, tenant_id)), batch))
+            if len(pending) >= workers * 2:
+                drain(*pending.popleft())
+        while pending:
+            drain(*pending.popleft())
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay pesan lewat security check + rule engine (tanpa LLM)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--jsonl', help="file JSON Lines dengan field id dan message")
+    source.add_argument('--db', action='store_true', help="baca dari chat_history")
+    parser.add_argument('--since', help="--db: timestamp >= (YYYY-MM-DD)")
+    parser.add_argument('--until', help="--db: timestamp < (YYYY-MM-DD)")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--out', required=True, help="file keputusan per pesan (JSON Lines)")
+    parser.add_argument('--baseline', help="file --out dari run sebelumnya untuk dibandingkan")
+    parser.add_argument('--diff', help="tulis pesan yang keputusannya berubah ke file ini")
+    parser.add_argument('--workers', type=int, default=cpu_count())
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--tenant', default=DEFAULT_TENANT, help="id tenant yang datanya dipakai rule engine")
+    args = parser.parse_args(argv)
+    if get_tenant_registry().get(args.tenant) is None:
+        parser.error(f"tenant {args.tenant} tidak dikenal")
+
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    if args.db:
+        batches = read_chat_history(args.since, args.until, args.limit, args.batch_size, args.tenant)
+    else:
+        batches = read_jsonl(args.jsonl, args.batch_size)
+
+    started = time.perf_counter()
+    with open(args.out, 'w', encoding='utf-8') as out:
+        diff = open(args.diff, 'w', encoding='utf-8') if args.diff and baseline is not None else None
+        try:
+            stats = run(batches, args.workers, out, baseline, diff, args.tenant)
+        finally:
+            if diff is not None:
+                diff.close()
+    elapsed = time.perf_counter() - started
+
+    total = stats["messages"]
+    print(f"{total} pesan dalam {elapsed:.1f} s ({total / max(elapsed, 1e-9) * 60:,.0f} pesan/menit, {args.workers} worker)")
+    for name, count in stats["outcomes"].most_common():
+        print(f"  {name:<32} {count:>9}")
+    if baseline is not None:
+        print(f"\n{stats['changed']} keputusan berubah dibanding baseline")
+        for (before, after), count in stats["transitions"].most_common(20):
+            print(f"  {before:<28} -> {after:<28} {count:>9}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
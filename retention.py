@@ -0,0 +1,343 @@
+"""
+Partisi bulanan dan retensi untuk chat_history dan security_log.
+
+Kedua tabel di-partisi RANGE per bulan (chat_history_y2026m01, ...), plus
+partisi DEFAULT (<tabel>_default) supaya INSERT tidak gagal bila partisi
+bulan berjalan belum dibuat; baris di DEFAULT dipindah ke partisi bulannya
+saat partisi itu dibuat. Perintah `maintain` (jalankan harian lewat cron)
+membuat partisi beberapa bulan ke depan, lalu mengarsipkan partisi yang
+melewati masa retensi ke file JSON Lines terkompresi selagi masih terpasang,
+baru kemudian men-DETACH dan men-DROP tabelnya dalam satu transaksi. Arsip
+yang gagal tidak meninggalkan apa-apa; maintain berikutnya mencoba lagi.
+
+    python retention.py maintain
+    python retention.py migrate              # ubah tabel heap lama menjadi partisi
+    python retention.py restore archive/chat_history_y2025m01.jsonl.gz
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import uuid
+import logging
+import argparse
+from datetime import date, datetime
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from config import RETENTION_MONTHS, PARTITION_MONTHS_AHEAD, ARCHIVE_DIR, ARCHIVE_FORMAT
+from database import get_connection
+
+PARTITION_PATTERN = re.compile(r'^(?P<table>[a-z_]+)_y(?P<year>\d{4})m(?P<month>\d{2})$')
+ARCHIVE_PATTERN = re.compile(r'^(?P<partition>[a-z_]+_y\d{4}m\d{2})\.jsonl\.(?:gz|zst)$')
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def table_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS found", (name,))
+    return cursor.fetchone()['found']
+
+
+def create_default_partition(cursor, table: str):
+    cursor.execute(
+        sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT").format(
+            sql.Identifier(default_partition_name(table)), sql.Identifier(table)
+        )
+    )
+
+
+def create_partition(cursor, table: str, month: date):
+    name = partition_name(table, month)
+    if table_exists(cursor, name):
+        return
+    start, end = month, add_months(month, 1)
+    default = default_partition_name(table)
+    stray = 0
+    if table_exists(cursor, default):
+        cursor.execute(
+            sql.SQL("SELECT count(*) AS n FROM {} WHERE timestamp >= %s AND timestamp < %s").format(sql.Identifier(default)),
+            (start, end)
+        )
+        stray = cursor.fetchone()['n']
+    if not stray:
+        cursor.execute(
+            sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)").format(
+                sql.Identifier(name), sql.Identifier(table)
+            ),
+            (start, end)
+        )
+        return
+
+    # Partisi baru tidak bisa dibuat selama DEFAULT memuat baris di rentangnya: pindahkan dulu.
+    cursor.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)").format(sql.Identifier(name), sql.Identifier(table)))
+    cursor.execute(
+        sql.SQL("WITH moved AS (DELETE FROM {} WHERE timestamp >= %s AND timestamp < %s RETURNING *) "
+                "INSERT INTO {} SELECT * FROM moved").format(sql.Identifier(default), sql.Identifier(name)),
+        (start, end)
+    )
+    cursor.execute(
+        sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(sql.Identifier(table), sql.Identifier(name)),
+        (start, end)
+    )
+    logging.warning(f"[RETENTION] {name}: {stray} baris dipindahkan dari {default}")
+
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = %s AND n.nspname = current_schema()",
+        (table,)
+    )
+    row = cursor.fetchone()
+    return row is not None and row['relkind'] == 'p'
+
+
+def list_partitions(cursor, table: str) -> list:
+    """(nama, bulan, terpasang) untuk partisi bulanan tabel, termasuk tabel <tabel>_yYYYYmMM
+    yang sudah ter-DETACH tapi belum di-DROP (sisa maintain versi lama yang arsipnya gagal)."""
+    cursor.execute(
+        """SELECT c.relname AS name, EXISTS (
+               SELECT 1 FROM pg_inherits i JOIN pg_class parent ON parent.oid = i.inhparent
+               WHERE i.inhrelid = c.oid AND parent.relname = %s
+           ) AS attached
+           FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+           WHERE n.nspname = current_schema() AND c.relkind = 'r' AND c.relname LIKE %s
+           ORDER BY c.relname""",
+        (table, f"{table}\\_y%")
+    )
+    partitions = []
+    for row in cursor.fetchall():
+        match = PARTITION_PATTERN.match(row['name'])
+        if match and match.group('table') == table:
+            month = date(int(match.group('year')), int(match.group('month')), 1)
+            partitions.append((row['name'], month, row['attached']))
+    return partitions
+
+
+def ensure_partitions(cursor, today: date | None = None):
+    month = (today or date.today()).replace(day=1)
+    for table in RETENTION_MONTHS:
+        if not is_partitioned(cursor, table):
+            logging.warning(f"[RETENTION] {table} belum dipartisi - jalankan: python retention.py migrate")
+            continue
+        create_default_partition(cursor, table)
+        for offset in range(0, PARTITION_MONTHS_AHEAD + 1):
+            create_partition(cursor, table, add_months(month, offset))
+
+
+def _open_archive(path: str, mode: str):
+    if path.endswith('.zst'):
+        import zstandard
+        if 'w' in mode:
+            return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=10), encoding='utf-8')
+        return zstandard.open(path, mode, encoding='utf-8')
+    return gzip.open(path, mode, encoding='utf-8')
+
+
+def archive_partition(conn, name: str) -> str:
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    extension = 'zst' if ARCHIVE_FORMAT == 'zstd' else 'gz'
+    path = os.path.join(ARCHIVE_DIR, f"{name}.jsonl.{extension}")
+    tmp_path = f"{path}.tmp"
+    rows = 0
+
+    with conn.cursor(name=f"archive_{uuid.uuid4().hex}") as cursor, _open_archive(tmp_path, 'wt') as f:
+        cursor.itersize = 10000
+        cursor.execute(sql.SQL("SELECT * FROM {} ORDER BY id").format(sql.Identifier(name)))
+        for row in cursor:
+            f.write(json.dumps(row, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v), ensure_ascii=False))
+            f.write("\n")
+            rows += 1
+
+    os.replace(tmp_path, path)
+    logging.info(f"[RETENTION] {name}: {rows} baris diarsipkan ke {path}")
+    return path
+
+
+def expire_partitions(conn, today: date | None = None) -> list:
+    month = (today or date.today()).replace(day=1)
+    archived = []
+    cursor = conn.cursor()
+    try:
+        for table, months in RETENTION_MONTHS.items():
+            cutoff = add_months(month, -months)
+            for name, partition_month, attached in list_partitions(cursor, table):
+                if add_months(partition_month, 1) > cutoff:
+                    continue
+                # Arsip dulu selagi partisi masih terpasang; bila gagal, rollback dan tabel tetap utuh.
+                try:
+                    path = archive_partition(conn, name)
+                    if attached:
+                        cursor.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(table), sql.Identifier(name)))
+                    cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    logging.exception(f"[RETENTION] {name}: arsip gagal, partisi dibiarkan untuk maintain berikutnya")
+                    continue
+                archived.append(path)
+    finally:
+        cursor.close()
+    return archived
+
+
+def maintain():
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        ensure_partitions(cursor)
+        conn.commit()
+        cursor.close()
+        archived = expire_partitions(conn)
+        print(f"Partisi siap; {len(archived)} partisi diarsipkan")
+        for path in archived:
+            print(f"  {path}")
+    finally:
+        conn.close()
+
+
+def restore(path: str):
+    match = ARCHIVE_PATTERN.match(os.path.basename(path))
+    partition = PARTITION_PATTERN.match(match.group('partition')) if match else None
+    if not partition:
+        raise SystemExit(f"Nama file arsip tidak dikenali: {path}")
+    table = partition.group('table')
+    month = date(int(partition.group('year')), int(partition.group('month')), 1)
+    name = partition_name(table, month)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)").format(sql.Identifier(name), sql.Identifier(table)))
+        columns = None
+        batch = []
+        restored = 0
+        with _open_archive(path, 'rt') as f:
+            for line in f:
+                row = json.loads(line)
+                columns = columns or list(row.keys())
+                batch.append([row[c] for c in columns])
+                if len(batch) >= 5000:
+                    restored += _insert_batch(cursor, name, columns, batch)
+                    batch = []
+        if batch:
+            restored += _insert_batch(cursor, name, columns, batch)
+        cursor.execute(
+            sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(sql.Identifier(table), sql.Identifier(name)),
+            (month, add_months(month, 1))
+        )
+        conn.commit()
+        print(f"{restored} baris dipulihkan ke {name}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _insert_batch(cursor, name: str, columns: list, batch: list) -> int:
+    execute_values(
+        cursor,
+        sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+            sql.Identifier(name), sql.SQL(', ').join(map(sql.Identifier, columns))
+        ).as_string(cursor),
+        batch
+    )
+    return len(batch)
+
+
+def migrate():
+    """Ubah chat_history/security_log versi lama (heap) menjadi tabel berpartisi."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for table in RETENTION_MONTHS:
+            if is_partitioned(cursor, table):
+                print(f"{table}: sudah berpartisi")
+                continue
+
+            legacy = f"{table}_legacy"
+            cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(table), sql.Identifier(legacy)))
+            cursor.execute(
+                sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(
+                    sql.Identifier(legacy), sql.Identifier(f"{table}_pkey"), sql.Identifier(f"{legacy}_pkey")
+                )
+            )
+            cursor.execute(
+                sql.SQL(
+                    "CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS, PRIMARY KEY (id, timestamp)) PARTITION BY RANGE (timestamp)"
+                ).format(sql.Identifier(table), sql.Identifier(legacy))
+            )
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id') AS seq", (legacy,))
+            sequence = cursor.fetchone()['seq']
+            if sequence:
+                cursor.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY {}.id").format(sql.SQL(sequence), sql.Identifier(table)))
+            if table == 'chat_history':
+                cursor.execute("ALTER INDEX IF EXISTS idx_chat_history_user_ts RENAME TO idx_chat_history_legacy_user_ts")
+                cursor.execute(
+                    "ALTER TABLE chat_history ADD FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE"
+                )
+                cursor.execute(
+                    "CREATE INDEX idx_chat_history_user_ts ON chat_history(user_id, timestamp DESC, id DESC)"
+                )
+                cursor.execute("ALTER INDEX IF EXISTS idx_chat_history_tenant_id RENAME TO idx_chat_history_legacy_tenant_id")
+                cursor.execute("CREATE INDEX idx_chat_history_tenant_id ON chat_history(tenant_id, id)")
+
+            cursor.execute(sql.SQL("SELECT min(timestamp) AS first FROM {}").format(sql.Identifier(legacy)))
+            first = cursor.fetchone()['first'] or datetime.now()
+            month = first.date().replace(day=1)
+            last = add_months(date.today().replace(day=1), PARTITION_MONTHS_AHEAD)
+            create_default_partition(cursor, table)
+            while month <= last:
+                create_partition(cursor, table, month)
+                month = add_months(month, 1)
+
+            cursor.execute(
+                sql.SQL("INSERT INTO {} SELECT * FROM {} WHERE timestamp IS NOT NULL").format(sql.Identifier(table), sql.Identifier(legacy))
+            )
+            moved = cursor.rowcount
+            conn.commit()
+            print(f"{table}: {moved} baris dipindahkan, tabel lama disimpan sebagai {legacy}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Partisi & retensi chat_history/security_log")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('maintain')
+    sub.add_parser('migrate')
+    restore_parser = sub.add_parser('restore')
+    restore_parser.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'maintain':
+        maintain()
+    elif args.command == 'migrate':
+        migrate()
+    elif args.command == 'restore':
+        restore(args.path)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
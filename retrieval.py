@@ -0,0 +1,159 @@
+import re
+import math
+import time
+import logging
+from collections import Counter, defaultdict
+
+from config import RETRIEVAL_THRESHOLD
+from invalidation import register_cache
+from tenants import TenantCache, current_tenant
+
+
+STOPWORDS = {
+    "yang", "di", "ke", "dari", "dan", "atau", "untuk", "dengan", "pada", "ini", "itu",
+    "apa", "apakah", "ada", "saya", "aku", "kamu", "anda", "mau", "ingin", "bisa", "boleh",
+    "tolong", "mohon", "dong", "ya", "kah", "nya", "sih", "deh", "kak", "min", "gimana",
+    "bagaimana", "berapa", "kapan", "mana", "dimana", "kemana", "the", "is", "a", "an",
+    "rs", "rumah", "sakit"
+}
+
+PARTICLE_SUFFIXES = ("lah", "kah", "tah", "pun", "nya", "ku", "mu")
+DERIVATION_SUFFIXES = ("kan", "an")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def stem(token: str) -> str:
+    for suffix in PARTICLE_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            token = token[:-len(suffix)]
+            break
+    for suffix in DERIVATION_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 5:
+            token = token[:-len(suffix)]
+            break
+    return token
+
+
+def tokenize(text: str) -> list:
+    text = TAG_PATTERN.sub(" ", text.lower())
+    return [stem(t) for t in TOKEN_PATTERN.findall(text) if t not in STOPWORDS]
+
+
+class Passage:
+    def __init__(self, passage_id: str, intent: str, title: str, text: str, reply: str):
+        self.id = passage_id
+        self.intent = intent
+        self.title = title
+        self.text = text
+        self.reply = reply
+
+
+def build_knowledge_base(tenant) -> list:
+    passages = []
+
+    for topic, answer in tenant.faq.items():
+        title = topic.replace("_", " ")
+        passages.append(Passage(f"faq:{topic}", "faq_nav", title, f"{title} {answer}", f"ℹ️ {answer}"))
+
+    for topic, facility in tenant.facility_directions.items():
+        text = " ".join([facility["title"], " ".join(facility["keywords"]), facility["reply"]])
+        passages.append(Passage(f"facility:{topic}", facility["intent"], facility["title"], text, facility["reply"]))
+
+    for doctor in tenant.all_doctors:
+        title = f"{doctor['nama']} - {doctor['spesialisasi']}"
+        text = (
+            f"dokter {doctor['nama']} spesialis {doctor['spesialisasi']} "
+            f"jadwal praktik {doctor['jadwal']} kontak {doctor['kontak']}"
+        )
+        reply = (
+            f"👨‍⚕️ <b>{doctor['nama']}</b><br>"
+            f"Spesialis: {doctor['spesialisasi']}<br>"
+            f"Jadwal: {doctor['jadwal']}<br>"
+            f"Kontak: {doctor['kontak']}"
+        )
+        passages.append(Passage(f"doctor:{doctor['nama']}", "doctor_info", title, text, reply))
+
+    passages.append(Passage("location", "location", f"Lokasi {tenant.name}",
+                            f"lokasi alamat jalan {tenant.location_info}", tenant.location_info))
+    return passages
+
+
+class BM25Index:
+    def __init__(self, passages: list, k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+
+        for doc_id, passage in enumerate(passages):
+            terms = Counter(tokenize(passage.text))
+            self.doc_lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings[term].append((doc_id, tf))
+
+        total = len(passages)
+        self.avg_length = (sum(self.doc_lengths) / total) if total else 0.0
+        self.idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        self.max_idf = max(self.idf.values()) if self.idf else 0.0
+
+    def search(self, query: str, k: int = 3) -> list:
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores = defaultdict(float)
+        for term in set(terms):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        ideal = sum(self.idf.get(term, self.max_idf) for term in set(terms))
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(min(score / ideal, 1.0), self.passages[doc_id]) for doc_id, score in ranked]
+
+
+class Retriever:
+    def __init__(self, tenant, threshold: float = RETRIEVAL_THRESHOLD):
+        self.threshold = threshold
+        started = time.perf_counter()
+        self.index = BM25Index(build_knowledge_base(tenant))
+        self.build_seconds = time.perf_counter() - started
+        logging.info(
+            f"[RETRIEVAL] Index {tenant.id} built: {len(self.index.passages)} passages, "
+            f"{len(self.index.postings)} terms in {self.build_seconds * 1000:.1f} ms"
+        )
+
+    def answer(self, query: str) -> dict | None:
+        results = self.index.search(query, k=1)
+        if not results:
+            return None
+        confidence, passage = results[0]
+        if confidence < self.threshold:
+            return None
+        logging.info(f"[RETRIEVAL] Direct answer {passage.id} (confidence {confidence:.2f})")
+        return {"intent": passage.intent, "reply": passage.reply}
+
+    def grounding(self, query: str, k: int = 3) -> str:
+        results = self.index.search(query, k=k)
+        return "\n".join(f"- {TAG_PATTERN.sub(' ', p.reply)}" for _, p in results)
+
+_retrievers = TenantCache("retriever", Retriever)
+
+def get_retriever(tenant=None):
+    return _retrievers.get(tenant or current_tenant())
+
+def _evict_retriever(key):
+    # Indeks memuat roster dokter & FAQ tenant; dibangun ulang saat dipakai berikutnya.
+    _retrievers.evict(key)
+
+register_cache('doctors', _evict_retriever)
+register_cache('faq', _evict_retriever)
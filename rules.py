@@ -1,20 +1,80 @@
+import os
 import re
 import random
 import logging
-import sqlite3
-from flask import session, g
-import os
-from data import doctors_db, INFO_FAQ, PERSONALITY
+from contextlib import closing
+from flask import session
+from config import RULE_FUZZY_MATCHING
+from invalidation import register_cache
+from data import PERSONALITY
+from tenants import TenantCache, current_tenant
+from text_normalizer import FuzzyMatcher
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE = os.path.join(BASE_DIR, 'hospital_chatbot.db')
 
-def get_db():
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row 
-    return db
+PSYCHIATRY_KEYWORDS = ['psikiat', 'jiwa', 'mental']
+PEDIATRIC_KEYWORDS = ['anak', 'pediatri']
+INTERNAL_MEDICINE_KEYWORDS = ['dalam', 'penyakit dalam', 'jantung']
+DOCTOR_GENERAL_KEYWORDS = ['dokter', 'jadwal', 'tersedia', 'ada', 'siapa', 'list', 'daftar', 'semua', 'lihat']
+DOCTOR_KEYWORDS = ['dokter', 'dr', 'jadwal dokter', 'spesialis']
+BOOKING_KEYWORDS = ['buat janji', 'booking', 'daftar', 'appointment']
+THANKS_KEYWORDS = ['makasih', 'terima kasih', 'thanks']
+FAREWELL_KEYWORDS = ['bye', 'dadah', 'sampai jumpa']
+LOCATION_KEYWORDS = ['dimana lokasi', 'dimana tempat', 'nama jalan', 'jalan', 'lokasi']
+GREETING_KEYWORDS = ['hi', 'halo', 'hai', 'assalamualaikum', 'selamat']
+
+def _keyword_vocabulary(keyword_lists) -> frozenset:
+    return frozenset(word for keywords in keyword_lists for phrase in keywords for word in re.findall(r'[a-z0-9]+', phrase))
+
+_base_fuzzy_matcher_instance = None
+
+def _get_base_fuzzy_matcher():
+    # Keyword rule sama untuk semua tenant; indeks deletes-nya (bagian terbesar matcher) dibangun sekali.
+    global _base_fuzzy_matcher_instance
+    if _base_fuzzy_matcher_instance is None:
+        keyword_lists = [
+            PSYCHIATRY_KEYWORDS, PEDIATRIC_KEYWORDS, INTERNAL_MEDICINE_KEYWORDS, DOCTOR_GENERAL_KEYWORDS,
+            DOCTOR_KEYWORDS, BOOKING_KEYWORDS, THANKS_KEYWORDS, FAREWELL_KEYWORDS, LOCATION_KEYWORDS,
+            GREETING_KEYWORDS, ['psikiater', 'psikiatri']
+        ]
+        _base_fuzzy_matcher_instance = FuzzyMatcher(_keyword_vocabulary(keyword_lists))
+    return _base_fuzzy_matcher_instance
+
+# Lapisan matcher dibagi antar tenant dengan vocabulary sama: fasilitas (biasanya warisan
+# tenant default) lalu roster dokter, di atas lapisan keyword rule.
+_fuzzy_matchers_by_vocabulary = {}
+
+def _layered_fuzzy_matcher(vocabulary: frozenset, base):
+    key = (vocabulary, id(base))
+    matcher = _fuzzy_matchers_by_vocabulary.get(key)
+    if matcher is None:
+        matcher = _fuzzy_matchers_by_vocabulary[key] = FuzzyMatcher(vocabulary, base=base)
+    return matcher
+
+def _build_fuzzy_matcher(tenant):
+    facilities = _keyword_vocabulary(facility["keywords"] for facility in tenant.facility_directions.values())
+    doctors = _keyword_vocabulary([doctor['nama'].lower()] for doctor in tenant.all_doctors)
+    return _layered_fuzzy_matcher(doctors, _layered_fuzzy_matcher(facilities, _get_base_fuzzy_matcher()))
+
+_fuzzy_matchers = TenantCache("fuzzy_matcher", _build_fuzzy_matcher)
+
+def get_fuzzy_matcher(tenant=None):
+    return _fuzzy_matchers.get(tenant or current_tenant())
+
+def _evict_fuzzy_matcher(key):
+    _fuzzy_matchers.evict(key)
+    live = {id(layer) for matcher in _fuzzy_matchers.values() for layer in matcher.layers}
+    for layer_key, matcher in list(_fuzzy_matchers_by_vocabulary.items()):
+        if id(matcher) not in live:
+            _fuzzy_matchers_by_vocabulary.pop(layer_key, None)
+
+register_cache('doctors', _evict_fuzzy_matcher)
+
+def normalize_input(text, tenant=None):
+    if not RULE_FUZZY_MATCHING:
+        return text.lower()
+    return get_fuzzy_matcher(tenant).normalize(text)
 
 def analyze_mood(text):
     text = text.lower()
@@ -32,27 +92,27 @@ def analyze_mood(text):
 def get_random_emoji(mood):
     return random.choice(PERSONALITY["moods"].get(mood, ["🙂"]))
 
-def handle_doctor_query(query):
+def handle_doctor_query(query, tenant=None):
     logging.info(f"[DOCTOR QUERY] Processing: {query}")
+    doctors = (tenant or current_tenant()).doctors
     query_lower = query.lower()
     found_doctors = []
     
-    if 'psikiat' in query_lower or 'jiwa' in query_lower or 'mental' in query_lower:
-        found_doctors = doctors_db['psikiater']
-    elif 'anak' in query_lower or 'pediatri' in query_lower:
-        found_doctors = [d for d in doctors_db['umum'] if 'Anak' in d['spesialisasi']]
-    elif 'dalam' in query_lower or 'penyakit dalam' in query_lower or 'jantung' in query_lower:
-        found_doctors = [d for d in doctors_db['umum'] if 'Penyakit Dalam' in d['spesialisasi']]
+    if any(word in query_lower for word in PSYCHIATRY_KEYWORDS):
+        found_doctors = doctors['psikiater']
+    elif any(word in query_lower for word in PEDIATRIC_KEYWORDS):
+        found_doctors = [d for d in doctors['umum'] if 'Anak' in d['spesialisasi']]
+    elif any(word in query_lower for word in INTERNAL_MEDICINE_KEYWORDS):
+        found_doctors = [d for d in doctors['umum'] if 'Penyakit Dalam' in d['spesialisasi']]
     
-    for doctor in doctors_db['umum'] + doctors_db['psikiater']:
+    for doctor in doctors['umum'] + doctors['psikiater']:
         if doctor['nama'].lower() in query_lower:
             found_doctors = [doctor]
             break
     
     if not found_doctors:
-        general_keywords = ['dokter', 'jadwal', 'tersedia', 'ada', 'siapa', 'list', 'daftar', 'semua', 'lihat']
-        if any(keyword in query_lower for keyword in general_keywords):
-            found_doctors = doctors_db['umum'] + doctors_db['psikiater']
+        if any(keyword in query_lower for keyword in DOCTOR_GENERAL_KEYWORDS):
+            found_doctors = doctors['umum'] + doctors['psikiater']
     
     if not found_doctors:
         return None
@@ -72,60 +132,39 @@ def handle_doctor_query(query):
     
     return "<br><br>".join(responses)
 
-def generate_chatty_response(user_input, history):
+def generate_chatty_response(user_input, history, state=None, dry_run=False, tenant=None):
+    """Balasan rule untuk input user, atau None bila tidak ada rule yang cocok.
+
+    `state` menyimpan konteks percakapan (last_intent); default-nya
+    flask session. Dengan `dry_run=True` booking tidak ditulis ke database,
+    sehingga fungsi ini bisa dijalankan di luar request (lihat replay.py).
+    `tenant` default-nya tenant request ini (lihat tenants.py).
+    """
     logging.info(f"[CHATTY] Analyzing input: {user_input}")
+    if state is None:
+        state = session
+    if tenant is None:
+        tenant = current_tenant()
     mood = analyze_mood(user_input)
     emoji = get_random_emoji(mood)
-    lower_input = user_input.lower()
+    lower_input = normalize_input(user_input, tenant)
     
-    last_intent = session.get('last_intent')
+    last_intent = state.get('last_intent')
     if last_intent:
         if lower_input in ['iya', 'ya', 'yes', 'yep', 'y', 'yoi', 'oke', 'ok', 'boleh']:
             if last_intent == 'counseling':
-                session.pop('last_intent', None)
+                state.pop('last_intent', None)
                 return {"intent": "counseling_confirmed", "reply": "💙 Baik, terima kasih atas kepercayaan Anda. Silakan ceritakan apa yang sedang Anda rasakan saat ini."}
             elif last_intent == 'book_appointment':
-                session.pop('last_intent', None)
+                state.pop('last_intent', None)
                 return {"intent": "book_appointment", "reply": "👍 Baik. Untuk proses pendaftaran, mohon kirimkan data berikut:<br>1. Nama lengkap<br>2. Nomor kontak<br>3. Dokter tujuan<br>4. Rencana tanggal & waktu kunjungan"}
         elif lower_input in ['tidak', 'kagak', 'no', 'ga', 'g', 'nono', 'gak', 'engga']:
-            session.pop('last_intent', None)
+            state.pop('last_intent', None)
             return {"intent": "smalltalk", "reply": "😊 Baik, tidak masalah. Apakah ada informasi lain yang bisa saya bantu?"}
     
-    if any(word in lower_input for word in ['igd', 'ugd', 'gawat darurat', 'emergency']):
-        return {
-            "intent": "faq_nav", 
-            "reply": f"🚨 <b>Layanan Gawat Darurat (IGD/UGD):</b><br>Unit Gawat Darurat kami berlokasi di <b>Lantai 1 Sayap Kiri</b> gedung utama. Akses terbuka 24 jam. Anda dapat langsung menuju pintu masuk khusus ambulance untuk penanganan cepat."
-        }
-    
-    if any(word in lower_input for word in ['toilet', 'wc', 'kamar mandi', 'restroom']):
-        return {
-            "intent": "facility_nav",
-            "reply": f"🚻 <b>Fasilitas Toilet:</b><br>Toilet tersedia di setiap lantai, tepat di sebelah area lift dan dekat tangga darurat. Tersedia juga toilet khusus difabel di area Lobby Utama."
-        }
-    
-    if any(word in lower_input for word in ['musholla', 'sholat', 'masjid', 'ibadah']):
-        return {
-            "intent": "facility_nav",
-            "reply": f"🕌 <b>Fasilitas Ibadah:</b><br>Musholla utama terletak di <b>Lantai Basement 1</b> dan <b>Lantai 3 Sayap Kanan</b>. Area ini dilengkapi dengan tempat wudhu yang memadai."
-        }
-
-    if any(word in lower_input for word in ['apotek', 'farmasi', 'ambil obat']):
-        return {
-            "intent": "facility_nav",
-            "reply": f"💊 <b>Instalasi Farmasi/Apotek:</b><br>Berlokasi di <b>Lantai 1</b>, searah dengan pintu keluar utama. Silakan serahkan resep Anda di loket yang tersedia."
-        }
-    
-    if any(word in lower_input for word in ['lab', 'laboratorium', 'cek darah', 'rontgen', 'radiologi']):
-        return {
-            "intent": "facility_nav",
-            "reply": f"🔬 <b>Layanan Penunjang Medis:</b><br>Laboratorium dan Radiologi terletak di <b>Lantai 2</b>. Silakan gunakan lift utama dan ikuti petunjuk arah berwarna biru."
-        }
-
-    if any(word in lower_input for word in ['pendaftaran', 'registrasi', 'kasir', 'admin', 'bayar']):
-        return {
-            "intent": "facility_nav",
-            "reply": f"💳 <b>Layanan Administrasi:</b><br>Loket Pendaftaran dan Kasir berada di <b>Lobby Utama Lantai 1</b>. Mohon siapkan kartu identitas atau kartu asuransi Anda."
-        }
+    for facility in tenant.facility_directions.values():
+        if any(word in lower_input for word in facility["keywords"]):
+            return {"intent": facility["intent"], "reply": facility["reply"]}
 
     booking_pattern = r'(.+?),\s*(\d[\d\-\s]+),\s*[Dd]r\.?\s*(.+?),\s*(?:tanggal\s+)?(.+)'
     booking_match = re.match(booking_pattern, user_input)
@@ -136,21 +175,23 @@ def generate_chatty_response(user_input, history):
         doctor_name = booking_match.group(3).strip()
         date_time = booking_match.group(4).strip()
         
-        all_doctors = doctors_db['umum'] + doctors_db['psikiater']
-        doctor = next((d for d in all_doctors if doctor_name.lower() in d['nama'].lower() or d['nama'].lower() in doctor_name.lower()), None)
+        doctor = next((d for d in tenant.all_doctors if doctor_name.lower() in d['nama'].lower() or d['nama'].lower() in doctor_name.lower()), None)
         
         if doctor:
             try:
-                db = get_db()
                 parts = date_time.lower().split('jam') if 'jam' in date_time.lower() else [date_time, '00:00']
                 appt_date = parts[0].strip()
                 appt_time = parts[1].strip() if len(parts) > 1 else '00:00'
                 
-                db.execute(
-                    "INSERT INTO appointments (patient_name, contact, doctor_id, appointment_date, appointment_time) VALUES (?, ?, ?, ?, ?)",
-                    (name, contact, doctor['kontak'], appt_date, appt_time)
-                )
-                db.commit()
+                if not dry_run:
+                    # sqlite3 hanya dimuat saat ada booking, bukan saat startup.
+                    import sqlite3
+                    with closing(sqlite3.connect(DATABASE)) as db:
+                        db.execute(
+                            "INSERT INTO appointments (patient_name, contact, doctor_id, appointment_date, appointment_time) VALUES (?, ?, ?, ?, ?)",
+                            (name, contact, doctor['kontak'], appt_date, appt_time)
+                        )
+                        db.commit()
                 
                 return {
                     "intent": "booking_confirmed",
@@ -161,34 +202,88 @@ def generate_chatty_response(user_input, history):
                         f"Mohon hadir 15 menit sebelum jadwal. Terima kasih."
                     )
                 }
-            except:
+            except Exception as e:
+                logging.error(f"[BOOKING] Error: {e}")
                 return {"intent": "booking_error", "reply": "❌ Mohon maaf, terjadi kendala teknis saat menyimpan data pendaftaran."}
         else:
             return {"intent": "booking_error", "reply": f"❌ Mohon maaf, dokter dengan nama '{doctor_name}' tidak ditemukan dalam database kami."}
     
     # Smalltalk & Identity (Dibuat lebih formal)
-    if any(word in lower_input for word in ['makasih', 'terima kasih', 'thanks']):
+    if any(word in lower_input for word in THANKS_KEYWORDS):
         return {"intent": "smalltalk", "reply": f"{emoji} Terima kasih kembali. Senang dapat membantu Anda."}
     
-    if any(word in lower_input for word in ['bye', 'dadah', 'sampai jumpa']):
+    if any(word in lower_input for word in FAREWELL_KEYWORDS):
         return {"intent": "smalltalk", "reply": "Terima kasih telah menghubungi kami. Semoga sehat selalu."}
     
-    if any(keyword in lower_input for keyword in ['dokter', 'dr', 'jadwal dokter', 'spesialis']):
-        doctor_info = handle_doctor_query(lower_input)
+    if any(keyword in lower_input for keyword in DOCTOR_KEYWORDS):
+        doctor_info = handle_doctor_query(lower_input, tenant)
         if doctor_info: return {"intent": "doctor_info", "reply": doctor_info}
     
-    if any(word in lower_input for word in ['buat janji', 'booking', 'daftar', 'appointment']):
-        session['last_intent'] = 'book_appointment'
+    if any(word in lower_input for word in BOOKING_KEYWORDS):
+        state['last_intent'] = 'book_appointment'
         return {"intent": "book_appointment", "reply": f"{emoji} Untuk pendaftaran mandiri, silakan gunakan format berikut:<br><b>Nama, Nomor HP, Dr. [Nama Dokter], tanggal [tanggal] jam [waktu]</b>"}
     
     if "nama kamu" in lower_input:
-        return {"intent": "bot_identity_name", "reply": f"{emoji} Saya Kiko, asisten virtual resmi dari RS Sehat Selalu."}
+        return {"intent": "bot_identity_name", "reply": f"{emoji} Saya Kiko, asisten virtual resmi dari {tenant.name}."}
     
-    if any(word in lower_input for word in ['dimana lokasi', 'dimana tempat', 'nama jalan', 'jalan', 'lokasi']):
-        return {"intent": "location", "reply": f"📍 <b>Lokasi Kami:</b><br>RS Sehat Selalu berlokasi di Jl. Manggis No. 89, Gambir, Jakarta Pusat. Kami tersedia di Google Maps untuk navigasi lebih mudah."}
+    if any(word in lower_input for word in LOCATION_KEYWORDS):
+        return {"intent": "location", "reply": tenant.location_info}
+
+    if any(word in lower_input for word in GREETING_KEYWORDS):
+        return {"intent": "smalltalk", "reply": f"{emoji} Selamat datang di layanan asisten virtual {tenant.name}. Ada yang bisa saya bantu?"}
+
+    return None
+        
+def canned_reply(label, user_input, tenant=None, state=None):
+    """Balasan rule untuk label intent hasil klasifikasi (lihat intent_classifier).
 
-    if any(word in lower_input for word in ['hi', 'halo', 'hai', 'assalamualaikum', 'selamat']):
-        return {"intent": "smalltalk", "reply": f"{emoji} Selamat datang di layanan asisten virtual RS Sehat Selalu. Ada yang bisa saya bantu?"}
+    `state` sama seperti di generate_chatty_response (default flask session).
+    """
+    tenant = tenant or current_tenant()
+    if state is None:
+        state = session
+    emoji = get_random_emoji(analyze_mood(user_input))
+    intent, _, topic = label.partition(':')
+
+    if intent in ('faq_nav', 'facility_nav') and topic in tenant.facility_directions:
+        facility = tenant.facility_directions[topic]
+        return {"intent": facility["intent"], "reply": facility["reply"]}
+    if intent == 'doctor_info':
+        doctor_info = handle_doctor_query(user_input, tenant) or handle_doctor_query('daftar dokter', tenant)
+        return {"intent": "doctor_info", "reply": doctor_info}
+    if intent == 'book_appointment':
+        state['last_intent'] = 'book_appointment'
+        return {"intent": "book_appointment", "reply": f"{emoji} Untuk pendaftaran mandiri, silakan gunakan format berikut:<br><b>Nama, Nomor HP, Dr. [Nama Dokter], tanggal [tanggal] jam [waktu]</b>"}
+    if intent == 'bot_identity_name':
+        return {"intent": "bot_identity_name", "reply": f"{emoji} Saya Kiko, asisten virtual resmi dari {tenant.name}."}
+    if intent == 'location':
+        return {"intent": "location", "reply": tenant.location_info}
+    if label == 'smalltalk:thanks':
+        return {"intent": "smalltalk", "reply": f"{emoji} Terima kasih kembali. Senang dapat membantu Anda."}
+    if label == 'smalltalk:bye':
+        return {"intent": "smalltalk", "reply": "Terima kasih telah menghubungi kami. Semoga sehat selalu."}
+    if label == 'smalltalk:greeting':
+        return {"intent": "smalltalk", "reply": f"{emoji} Selamat datang di layanan asisten virtual {tenant.name}. Ada yang bisa saya bantu?"}
+    return None
 
+def label_for_reply(reply_text, tenant=None):
+    """Kebalikan canned_reply: tebak label intent dari teks balasan yang tersimpan di chat_history."""
+    tenant = tenant or current_tenant()
+    for topic, facility in tenant.facility_directions.items():
+        if reply_text.startswith(facility["reply"]):
+            return f"{facility['intent']}:{topic}"
+    if reply_text.startswith(tenant.location_info):
+        return 'location'
+    if 'Spesialis:' in reply_text and 'Jadwal:' in reply_text:
+        return 'doctor_info'
+    if 'Untuk pendaftaran mandiri' in reply_text:
+        return 'book_appointment'
+    if 'Saya Kiko, asisten virtual resmi' in reply_text:
+        return 'bot_identity_name'
+    if 'Terima kasih kembali. Senang dapat membantu' in reply_text:
+        return 'smalltalk:thanks'
+    if reply_text.startswith('Terima kasih telah menghubungi kami'):
+        return 'smalltalk:bye'
+    if 'Selamat datang di layanan asisten virtual' in reply_text:
+        return 'smalltalk:greeting'
     return None
-        
\ No newline at end of file
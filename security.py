@@ -1,15 +1,47 @@
 import re
+import time
 import logging
+import threading
 from datetime import datetime, timedelta
 from collections import defaultdict
 import hashlib
 
+from config import (
+    TOKEN_BUDGET_CAPACITY, TOKEN_BUDGET_REFILL_PER_MINUTE,
+    RULE_BUDGET_CAPACITY, RULE_BUDGET_REFILL_PER_MINUTE
+)
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_minute: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_minute / 60
+        self.levels = {}
+        self.lock = threading.Lock()
+
+    def _level(self, user_id: str, now: float) -> float:
+        tokens, updated = self.levels.get(user_id, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+
+    def remaining(self, user_id: str) -> float:
+        with self.lock:
+            return self._level(user_id, time.monotonic())
+
+    def charge(self, user_id: str, amount: float) -> float:
+        with self.lock:
+            now = time.monotonic()
+            tokens = self._level(user_id, now) - amount
+            self.levels[user_id] = (tokens, now)
+            return tokens
+
 
 class RateLimiter:
     def __init__(self):
         self.requests = defaultdict(list)
         self.daily_requests = defaultdict(int)
         self.last_reset = {}
+        self.token_budget = TokenBucket(TOKEN_BUDGET_CAPACITY, TOKEN_BUDGET_REFILL_PER_MINUTE)
+        self.rule_budget = TokenBucket(RULE_BUDGET_CAPACITY, RULE_BUDGET_REFILL_PER_MINUTE)
     
     def check_rate_limit(self, user_id: str) -> dict:
         now = datetime.now()
@@ -38,13 +70,40 @@ class RateLimiter:
         self.daily_requests[user_id] += 1
         
         return {"allowed": True, "reason": ""}
+
+    def check_token_budget(self, user_id: str) -> dict:
+        if self.token_budget.remaining(user_id) < 1:
+            return {
+                "allowed": False,
+                "reason": "Kuota pertanyaan panjang kamu sedang habis. Coba lagi beberapa menit lagi ya, atau tanya jadwal dokter/fasilitas RS yang bisa langsung aku jawab! ⏳"
+            }
+        return {"allowed": True, "reason": ""}
+
+    def charge_tokens(self, user_id: str, tokens: int) -> float:
+        return self.token_budget.charge(user_id, tokens)
+
+    def check_rule_budget(self, user_id: str) -> dict:
+        """Cek kuota jawaban rule/classifier/retrieval tanpa memotongnya."""
+        if self.rule_budget.remaining(user_id) < 1:
+            return {
+                "allowed": False,
+                "reason": "Kamu mengirim pesan terlalu banyak. Istirahat sebentar ya! 😊"
+            }
+        return {"allowed": True, "reason": ""}
+
+    def charge_rule_message(self, user_id: str) -> float:
+        return self.rule_budget.charge(user_id, 1)
     
     def get_stats(self, user_id: str) -> dict:
         return {
             "daily_count": self.daily_requests.get(user_id, 0),
             "daily_limit": 500,
             "minute_count": len([ts for ts in self.requests.get(user_id, []) if ts > datetime.now() - timedelta(minutes=1)]),
-            "minute_limit": 30
+            "minute_limit": 30,
+            "token_budget_remaining": max(0, int(self.token_budget.remaining(user_id))),
+            "token_budget_capacity": TOKEN_BUDGET_CAPACITY,
+            "rule_budget_remaining": max(0, int(self.rule_budget.remaining(user_id))),
+            "rule_budget_capacity": RULE_BUDGET_CAPACITY
         }
 _rate_limiter_instance = None
 
@@ -81,16 +140,17 @@ JAILBREAK_PATTERNS = [
     r'lupakan\s+(instruksi|perintah|aturan)\s+(sebelumnya|semua)',
     r'tampilkan\s+(prompt|instruksi|aturan)\s+sistem',
 ]
+JAILBREAK_REGEXES = [re.compile(pattern) for pattern in JAILBREAK_PATTERNS]
 
 def detect_prompt_injection(text: str) -> dict:
     text_lower = text.lower()
     
-    for pattern in JAILBREAK_PATTERNS:
-        if re.search(pattern, text_lower):
-            logging.warning(f"[SECURITY] Prompt injection detected: {pattern}")
+    for regex in JAILBREAK_REGEXES:
+        if regex.search(text_lower):
+            logging.warning(f"[SECURITY] Prompt injection detected: {regex.pattern}")
             return {
                 "detected": True,
-                "pattern": pattern,
+                "pattern": regex.pattern,
                 "severity": "high",
                 "response": "Hmm, kayaknya kamu coba sesuatu yang nggak biasa nih 😅 Aku di sini untuk bantu hal-hal seputar rumah sakit aja ya. Ada yang bisa aku bantu?"
             }
@@ -148,12 +208,18 @@ def moderate_content(text: str) -> dict:
     
     return {"safe": True, "category": "clean", "disclaimer": ""}
 
+EMAIL_REGEX = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+PHONE_REGEX = re.compile(r'\b(08|62|0)\d{8,12}\b')
+PHONE_DASHED_REGEX = re.compile(r'\b\d{4}-\d{4}-\d{4}\b')
+ID_NUMBER_REGEX = re.compile(r'\b\d{16}\b')
+CARD_NUMBER_REGEX = re.compile(r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b')
+
 def anonymize_pii(text: str) -> str:
-    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]', text)
-    text = re.sub(r'\b(08|62|0)\d{8,12}\b', '[PHONE]', text)
-    text = re.sub(r'\b\d{4}-\d{4}-\d{4}\b', '[PHONE]', text)
-    text = re.sub(r'\b\d{16}\b', '[ID_NUMBER]', text)
-    text = re.sub(r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b', '[CARD_NUMBER]', text)
+    text = EMAIL_REGEX.sub('[EMAIL]', text)
+    text = PHONE_REGEX.sub('[PHONE]', text)
+    text = PHONE_DASHED_REGEX.sub('[PHONE]', text)
+    text = ID_NUMBER_REGEX.sub('[ID_NUMBER]', text)
+    text = CARD_NUMBER_REGEX.sub('[CARD_NUMBER]', text)
     
     return text
 
@@ -161,55 +227,57 @@ def anonymize_pii(text: str) -> str:
 def detect_pii(text: str) -> dict:
     pii_types = []
     
-    if re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text):
+    if EMAIL_REGEX.search(text):
         pii_types.append("email")
     
-    if re.search(r'\b(08|62|0)\d{8,12}\b', text):
+    if PHONE_REGEX.search(text):
         pii_types.append("phone")
     
-    if re.search(r'\b\d{16}\b', text):
+    if ID_NUMBER_REGEX.search(text):
         pii_types.append("id_number")
     
     return {
         "contains_pii": len(pii_types) > 0,
         "types": pii_types
     }
+
+OUTPUT_DANGEROUS_PATTERNS = [
+    r'system\s+prompt',
+    r'instruction\s+set',
+    r'developer\s+set',
+    r'policy\s+guideline',
+
+    r'<\|.*?\|>',
+    r'\[INST\]',
+    r'\[\s*system\s*\]',
+    r'\[\s*instruction\s*\]',
+    r'\[\s*answer\s*\]',
+    r'\[\s*user\s*\]',
+    r'\[\s*developer\s*\]',
+    r'\[\s*policy\s*\]',
+    r'\[\s*assistant\s*\]',
+
+    r'^\s*system\s*:',
+    r'^\s*instruction\s*:',
+    r'^\s*assistant\s*:',
+    r'^\s*developer\s*:',
+    r'^\s*policy\s*:',
+
+    r'\[\s*sys\s*\]',
+    r'\[\s*intr\s*\]',
+    r'\[\s*inst\s*\]',
+
+    r'<\|[^|]*\|>',
+    r'<\|INST\|>',
+    r'<\|SYS\|>',
+    r'<\|BEGIN[^|]*\|>',
+    r'\[END[^\]]*\]',
+]
+OUTPUT_DANGEROUS_REGEXES = [re.compile(pattern, re.IGNORECASE) for pattern in OUTPUT_DANGEROUS_PATTERNS]
+
 def sanitize_output(text: str) -> dict:
-    dangerous_patterns = [
-        r'system\s+prompt',
-        r'instruction\s+set',
-        r'developer\s+set',
-        r'policy\s+guideline',
-
-        r'<\|.*?\|>',
-        r'\[INST\]',
-        r'\[\s*system\s*\]',
-        r'\[\s*instruction\s*\]',
-        r'\[\s*answer\s*\]',
-        r'\[\s*user\s*\]',
-        r'\[\s*developer\s*\]',
-        r'\[\s*policy\s*\]',
-        r'\[\s*assistant\s*\]',
-
-        r'^\s*system\s*:',
-        r'^\s*instruction\s*:',
-        r'^\s*assistant\s*:',
-        r'^\s*developer\s*:',
-        r'^\s*policy\s*:',
-
-        r'\[\s*sys\s*\]',
-        r'\[\s*intr\s*\]',
-        r'\[\s*inst\s*\]',
-
-        r'<\|[^|]*\|>',
-        r'<\|INST\|>',
-        r'<\|SYS\|>',
-        r'<\|BEGIN[^|]*\|>',
-        r'\[END[^\]]*\]',
-    ]
-    
-    for pattern in dangerous_patterns:
-        if re.search(pattern, text, re.IGNORECASE):
+    for regex in OUTPUT_DANGEROUS_REGEXES:
+        if regex.search(text):
             logging.warning("[SECURITY] Dangerous content in LLM output")
             return {
                 "safe": False,
@@ -229,7 +297,10 @@ def check_security(user_input: str, user_id: str = "guest") -> dict:
             "disclaimer": "",
             "metadata": {"reason": "rate_limit"}
         }
+    return check_content(user_input)
 
+def check_content(user_input: str) -> dict:
+    """Bagian check_security yang murni dari teks (tanpa rate limit), dipakai juga oleh replay.py."""
     length_check = validate_input_length(user_input)
     if not length_check["valid"]:
         return {
@@ -270,6 +341,7 @@ def check_security(user_input: str, user_id: str = "guest") -> dict:
         "disclaimer": moderation.get("disclaimer", ""),
         "metadata": {
             "reason": "allowed",
+            "category": moderation["category"],
             "contains_pii": pii_check["contains_pii"],
             "pii_types": pii_check["types"]
         }
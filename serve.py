@@ -0,0 +1,140 @@
+"""
+Entry point produksi: gunicorn (worker gthread) dengan preload_app.
+
+Master memuat app beserta semua cache read-only (regex security, indeks
+fuzzy rule, indeks retrieval, model intent, template, aset hasil build)
+sekali, lalu memanggil gc.freeze() sebelum fork. Objek yang sudah
+dibekukan tidak pernah disentuh GC di worker, jadi halaman memorinya tetap
+dibagi copy-on-write dan tidak ikut tersalin ke tiap worker.
+
+    python serve.py
+
+Konfigurasi lewat env: HOST, PORT, WEB_CONCURRENCY (jumlah worker),
+GUNICORN_THREADS, GUNICORN_TIMEOUT, GUNICORN_MAX_REQUESTS.
+"""
+import gc
+import os
+import sys
+import logging
+
+from config import HOST, PORT, WEB_CONCURRENCY, GUNICORN_THREADS, GUNICORN_TIMEOUT, GUNICORN_MAX_REQUESTS
+
+
+def process_memory(pid='self') -> dict:
+    """RSS/PSS/private memory sebuah proses (KB) dari /proc/<pid>/smaps_rollup.
+
+    PSS membagi halaman bersama secara proporsional antar proses, jadi jumlah
+    PSS semua worker adalah pemakaian memori sebenarnya; private_kb adalah
+    bagian yang sudah tersalin (tidak lagi dibagi copy-on-write).
+    """
+    usage = {"pid": os.getpid() if pid == 'self' else int(pid)}
+    try:
+        kb = {}
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.endswith("kB\n"):
+                    key, value = line.split(':', 1)
+                    kb[key] = int(value.split()[0])
+        usage.update({
+            "rss_kb": kb.get('Rss', 0),
+            "pss_kb": kb.get('Pss', 0),
+            "shared_kb": kb.get('Shared_Clean', 0) + kb.get('Shared_Dirty', 0),
+            "private_kb": kb.get('Private_Clean', 0) + kb.get('Private_Dirty', 0)
+        })
+    except (OSError, ValueError):
+        import resource
+        usage["rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage
+
+
+def warm_up():
+    """Muat app dan semua cache read-only di master, lalu bekukan heap untuk fork."""
+    gc.disable()
+
+    from app import app
+    from database import init_db
+    from rules import get_fuzzy_matcher
+    from retrieval import get_retriever
+    from intent_classifier import get_intent_classifier
+    from llm import get_backend_pool, get_model_router, get_singleflight
+    from security import get_rate_limiter
+    from assets import get_asset_manifest
+    from bulk_io import refresh_doctor_roster
+    from tenants import get_tenant_registry
+
+    def warm_tenant_caches():
+        for tenant in get_tenant_registry().all():
+            get_fuzzy_matcher(tenant)
+            get_retriever(tenant)
+
+    warm_tenant_caches()
+    get_intent_classifier()
+    get_backend_pool()
+    get_model_router()
+    get_singleflight()
+    get_rate_limiter()
+    get_asset_manifest()
+    app.jinja_env.get_template('index.html')
+
+    # Skema cukup dicek sekali di master; koneksinya ditutup sebelum fork
+    # supaya tidak ada socket Postgres yang dibagi antar worker.
+    try:
+        init_db(app)
+        refresh_doctor_roster()
+        warm_tenant_caches()
+        app._db_initialized = True
+    except Exception as e:
+        logging.warning(f"[SERVE] init_db di master gagal, worker akan mencoba saat request pertama: {e}")
+
+    gc.collect()
+    gc.freeze()
+    logging.info(f"[SERVE] Preload selesai: {gc.get_freeze_count()} objek dibekukan, memory master {process_memory()}")
+    logging.info(f"[SERVE] {WEB_CONCURRENCY} worker x {GUNICORN_THREADS} thread di {HOST}:{PORT}")
+    return app
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    logging.info(f"[SERVE] Worker {os.getpid()} siap: {process_memory()}")
+
+
+def worker_exit(server, worker):
+    logging.info(f"[SERVE] Worker {worker.pid} berhenti")
+
+
+def main():
+    from gunicorn.app.base import BaseApplication
+
+    class ChatbotApplication(BaseApplication):
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return warm_up()
+
+    options = {
+        "bind": f"{HOST}:{PORT}",
+        "workers": WEB_CONCURRENCY,
+        "worker_class": "gthread",
+        "threads": GUNICORN_THREADS,
+        "timeout": GUNICORN_TIMEOUT,
+        "max_requests": GUNICORN_MAX_REQUESTS,
+        "max_requests_jitter": GUNICORN_MAX_REQUESTS // 10,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+    }
+    ChatbotApplication(options).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+const KIKO_AVATAR = document.body.dataset.avatarUrl;
+
+const chatWindow = document.getElementById('chat-window');
+const input = document.getElementById('user-input');
+const sendButton = document.getElementById('send-button');
+
+async function logout() {
+    await fetch('/api/auth/logout', { method: 'POST' });
+    window.location.href = document.body.dataset.loginUrl;
+}
+
+// Tag yang boleh ada di balasan bot (rule memakai <b>, <i>, <br>); atribut selalu dibuang.
+const BOT_ALLOWED_TAGS = new Set(['B', 'STRONG', 'I', 'EM', 'U', 'BR', 'P', 'UL', 'OL', 'LI']);
+
+function sanitizeBotHtml(html) {
+    const template = document.createElement('template');
+    template.innerHTML = html;
+    const clean = document.createDocumentFragment();
+    const copy = (source, target) => {
+        source.childNodes.forEach(node => {
+            if (node.nodeType === Node.TEXT_NODE) {
+                target.appendChild(document.createTextNode(node.textContent));
+            } else if (node.nodeType === Node.ELEMENT_NODE && BOT_ALLOWED_TAGS.has(node.tagName)) {
+                const el = document.createElement(node.tagName);
+                copy(node, el);
+                target.appendChild(el);
+            } else if (node.nodeType === Node.ELEMENT_NODE && !['SCRIPT', 'STYLE', 'TEMPLATE'].includes(node.tagName)) {
+                copy(node, target);
+            }
+        });
+    };
+    copy(template.content, clean);
+    return clean;
+}
+
+function createMessage(text, isUser) {
+    const div = document.createElement('div');
+    div.className = `flex message-enter ${isUser ? 'justify-end' : 'justify-start'}`;
+
+    const content = isUser 
+        ? `<div class="flex gap-3 max-w-[85%] flex-row-reverse">
+             <div class="w-10 h-10 rounded-full bg-gray-600 text-white flex items-center justify-center flex-shrink-0"><i data-lucide="user" class="w-5 h-5"></i></div>
+             <div class="message-text bg-blue-600 text-white rounded-lg p-4 shadow-sm text-sm"></div>
+           </div>`
+        : `<div class="flex gap-3 max-w-[85%]">
+             <img src="${KIKO_AVATAR}" class="w-10 h-10 rounded-full flex-shrink-0 border border-gray-200">
+             <div class="message-text bg-white border border-gray-200 rounded-lg p-4 shadow-sm text-sm text-gray-800"></div>
+           </div>`;
+
+    div.innerHTML = content;
+    // Teks pesan (termasuk riwayat dari database) tidak pernah masuk innerHTML apa adanya.
+    const bubble = div.querySelector('.message-text');
+    if (isUser) {
+        bubble.textContent = text;
+    } else {
+        bubble.appendChild(sanitizeBotHtml(String(text)));
+    }
+    return div;
+}
+
+function appendMessage(text, isUser) {
+    chatWindow.appendChild(createMessage(text, isUser));
+    lucide.createIcons();
+    chatWindow.scrollTop = chatWindow.scrollHeight;
+}
+
+let historyCursor = null;
+let historyDone = false;
+let historyLoading = false;
+
+async function loadHistory() {
+    if (historyLoading || historyDone) return;
+    historyLoading = true;
+
+    try {
+        const params = new URLSearchParams({ limit: 20 });
+        if (historyCursor) params.set('cursor', historyCursor);
+        const res = await fetch(`/api/chat/history?${params}`);
+        const data = await res.json();
+        if (!data.success) return;
+
+        const previousHeight = chatWindow.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        data.messages.slice().reverse().forEach(m => {
+            fragment.appendChild(createMessage(m.message, true));
+            fragment.appendChild(createMessage(m.response, false));
+        });
+        chatWindow.insertBefore(fragment, chatWindow.firstChild);
+        lucide.createIcons();
+        chatWindow.scrollTop += chatWindow.scrollHeight - previousHeight;
+
+        historyCursor = data.next_cursor;
+        historyDone = !data.next_cursor;
+    } catch (e) {
+        historyDone = true;
+    } finally {
+        historyLoading = false;
+    }
+}
+
+chatWindow.addEventListener('scroll', () => {
+    if (chatWindow.scrollTop < 80) loadHistory();
+});
+
+function updateQuota(quota) {
+    if (!quota) return;
+    const el = document.getElementById('quota-status');
+    el.textContent = `Kuota AI: ${quota.token_budget_remaining}/${quota.token_budget_capacity}`;
+    el.classList.remove('hidden');
+}
+
+async function sendMessage(msg = null) {
+    const text = msg || input.value.trim();
+    if(!text) return;
+
+    if(!msg) input.value = '';
+    appendMessage(text, true);
+
+    const loadingId = "loading-" + Date.now();
+    const loadingDiv = document.createElement('div');
+    loadingDiv.id = loadingId;
+    loadingDiv.className = "flex justify-start message-enter";
+    loadingDiv.innerHTML = `
+        <div class="flex gap-3 max-w-[85%]">
+            <img src="${KIKO_AVATAR}" class="w-10 h-10 rounded-full flex-shrink-0 border border-gray-200">
+            <div class="bg-gray-50 border border-gray-200 rounded-lg p-4 shadow-sm flex gap-1.5 items-center h-[54px]">
+                <div class="typing-dot"></div>
+                <div class="typing-dot"></div>
+                <div class="typing-dot"></div>
+            </div>
+        </div>`;
+    chatWindow.appendChild(loadingDiv);
+    chatWindow.scrollTop = chatWindow.scrollHeight;
+
+    try {
+        // WebSocket dipakai bila terbuka dan tidak sedang menunggu jawaban lain; selain itu POST biasa.
+        const data = (socket && !socketPending)
+            ? await askSocket(text, token => streamInto(loadingId, token))
+            : await postMessage(text);
+        updateQuota(data.quota);
+
+        const loader = document.getElementById(loadingId);
+        if(loader) loader.remove();
+
+        const reply = data.reply.reply || data.reply;
+        appendMessage(reply, false);
+
+    } catch (e) {
+        const loader = document.getElementById(loadingId);
+        if(loader) loader.remove();
+        appendMessage("Maaf, koneksi server terganggu.", false);
+    }
+}
+
+async function postMessage(text) {
+    const res = await fetch('/api/chat', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({ message: text })
+    });
+    return res.json();
+}
+
+let socket = null;
+let socketPending = null;
+let socketRetryMs = 1000;
+
+function connectSocket() {
+    if (!('WebSocket' in window)) return;
+    const proto = location.protocol === 'https:' ? 'wss' : 'ws';
+    const ws = new WebSocket(`${proto}://${location.host}/ws/chat`);
+
+    ws.onopen = () => {
+        socket = ws;
+        socketRetryMs = 1000;
+    };
+    ws.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (!socketPending) return;
+        if (data.type === 'token') {
+            socketPending.onToken(data.text);
+        } else if (data.type === 'reply') {
+            const pending = socketPending;
+            socketPending = null;
+            pending.resolve(data);
+        } else if (data.type === 'error') {
+            const pending = socketPending;
+            socketPending = null;
+            pending.resolve({ reply: data.message });
+        }
+    };
+    ws.onclose = () => {
+        socket = null;
+        if (socketPending) {
+            socketPending.reject(new Error('socket closed'));
+            socketPending = null;
+        }
+        setTimeout(connectSocket, socketRetryMs);
+        socketRetryMs = Math.min(socketRetryMs * 2, 30000);
+    };
+}
+
+function askSocket(text, onToken) {
+    return new Promise((resolve, reject) => {
+        socketPending = { resolve, reject, onToken };
+        socket.send(JSON.stringify({ message: text }));
+    });
+}
+
+function streamInto(loadingId, token) {
+    const loader = document.getElementById(loadingId);
+    if (!loader) return;
+    let bubble = loader.querySelector('.stream-text');
+    if (!bubble) {
+        const box = loader.querySelector('.typing-dot').parentElement;
+        box.className = 'stream-text bg-white border border-gray-200 rounded-lg p-4 shadow-sm text-sm text-gray-800 whitespace-pre-wrap';
+        box.textContent = '';
+        bubble = box;
+    }
+    bubble.textContent += token;
+    chatWindow.scrollTop = chatWindow.scrollHeight;
+}
+
+sendButton.onclick = () => sendMessage();
+
+input.addEventListener('keydown', function(e) {
+    if (e.key === 'Enter') {
+        e.preventDefault();
+        sendMessage();
+    }
+});
+
+document.querySelectorAll('.quick-btn').forEach(b => {
+    b.onclick = () => sendMessage(b.dataset.msg);
+});
+
+window.onload = async () => { 
+    lucide.createIcons(); 
+    input.focus(); 
+    await loadHistory();
+    chatWindow.scrollTop = chatWindow.scrollHeight;
+    connectSocket();
+};
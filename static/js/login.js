@@ -0,0 +1,45 @@
+lucide.createIcons();
+const form = document.getElementById('loginForm');
+const alert = document.getElementById('alert');
+const submitBtn = document.getElementById('submitBtn');
+
+function showAlert(message, type = 'error') {
+    alert.textContent = message;
+    alert.className = `mb-4 p-3 rounded-lg text-sm ${
+        type === 'error' ? 'bg-red-50 text-red-700 border border-red-200' : 'bg-green-50 text-green-700 border border-green-200'
+    }`;
+    alert.classList.remove('hidden');
+}
+
+form.addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const email = document.getElementById('email').value;
+    const password = document.getElementById('password').value;
+
+    submitBtn.disabled = true;
+    submitBtn.textContent = 'Memproses...';
+
+    try {
+        const res = await fetch('/api/auth/login', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({ email, password })
+        });
+
+        const data = await res.json();
+
+        if (data.success) {
+            showAlert('Login berhasil! Mengalihkan...', 'success');
+            // Redirect ke halaman utama
+            setTimeout(() => window.location.href = document.body.dataset.indexUrl, 1000);
+        } else {
+            showAlert(data.message || 'Login gagal');
+            submitBtn.disabled = false;
+            submitBtn.textContent = 'Masuk';
+        }
+    } catch (error) {
+        showAlert('Terjadi kesalahan koneksi.');
+        submitBtn.disabled = false;
+        submitBtn.textContent = 'Masuk';
+    }
+});
@@ -0,0 +1,47 @@
+lucide.createIcons();
+const form = document.getElementById('signupForm');
+const alert = document.getElementById('alert');
+const submitBtn = document.getElementById('submitBtn');
+
+function showAlert(message, type = 'error') {
+    alert.textContent = message;
+    alert.className = `mb-4 p-3 rounded-lg text-sm ${
+        type === 'error' ? 'bg-red-50 text-red-700 border border-red-200' : 'bg-green-50 text-green-700 border border-green-200'
+    }`;
+    alert.classList.remove('hidden');
+}
+
+form.addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const name = document.getElementById('name').value;
+    const email = document.getElementById('email').value;
+    const password = document.getElementById('password').value;
+    const confirmPassword = document.getElementById('confirmPassword').value;
+
+    if (password !== confirmPassword) { showAlert('Password tidak sama'); return; }
+
+    submitBtn.disabled = true;
+    submitBtn.textContent = 'Memproses...';
+
+    try {
+        const res = await fetch('/api/auth/signup', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({ name, email, password })
+        });
+        const data = await res.json();
+
+        if (data.success) {
+            showAlert('Pendaftaran berhasil! Mengalihkan...', 'success');
+            setTimeout(() => window.location.href = document.body.dataset.indexUrl, 1000);
+        } else {
+            showAlert(data.message || 'Pendaftaran gagal');
+            submitBtn.disabled = false;
+            submitBtn.textContent = 'Daftar';
+        }
+    } catch (error) {
+        showAlert('Terjadi kesalahan sistem.');
+        submitBtn.disabled = false;
+        submitBtn.textContent = 'Daftar';
+    }
+});
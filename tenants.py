@@ -0,0 +1,277 @@
+"""
+Multi-tenant: satu proses melayani beberapa RS dalam satu grup.
+
+Tiap tenant adalah snapshot immutable berisi nama RS, roster dokter, FAQ,
+petunjuk fasilitas, info lokasi dan system prompt LLM. Tenant `default`
+dibangun dari data.py; tenant lain dibaca dari TENANTS_FILE (JSON):
+
+    {
+      "bandung": {
+        "name": "RS Sehat Selalu Bandung",
+        "hosts": ["bandung.sehatselalu.id"],
+        "admins": ["admin@bandung.sehatselalu.id"],
+        "location_info": "📍 <b>Lokasi Kami:</b><br>RS Sehat Selalu Bandung ...",
+        "doctors": {"umum": [...], "psikiater": [...]},
+        "faq": {...},
+        "facility_directions": {...},
+        "system_prompt": "... {name} ..."
+      }
+    }
+
+Field yang tidak diisi memakai objek milik tenant default (bukan salinan),
+jadi tenant yang hanya mengganti nama dan lokasi nyaris tidak menambah
+memori. `{name}` di system prompt diganti nama RS tenant.
+
+Hak admin terikat ke tenant: `admins` (email) tidak diwariskan dari default;
+admin tenant default adalah ADMIN_EMAILS. Endpoint admin per tenant (export
+chat, statistik, import/export massal) hanya menerima admin tenant request
+itu, jadi mengganti header tenant tidak memberi akses ke data RS lain.
+
+Tenant per request dipilih dari header TENANT_HEADER (harus id tenant yang
+dikenal, bila tidak 404), lalu dari Host; host yang tidak terdaftar jatuh ke
+tenant default. Header sebaiknya di-set reverse proxy, bukan klien.
+
+Pool koneksi, classifier, single-flight LLM dan bus invalidasi tetap satu
+per proses. Cache turunan data tenant (indeks retrieval, fuzzy matcher)
+disimpan di TenantCache: satu dict bersama, key id tenant. Mengganti
+snapshot (mis. roster dari database) menaikkan versi tenant, sehingga entri
+lama otomatis dianggap basi tanpa perlu dikunci.
+"""
+import os
+import gc
+import sys
+import json
+import logging
+from types import MappingProxyType, ModuleType, FunctionType, BuiltinFunctionType, MethodType
+
+from flask import g, has_request_context, jsonify, request
+
+from config import TENANTS_FILE, TENANT_HEADER, DEFAULT_TENANT
+from config import ADMIN_EMAILS
+from data import HOSPITAL_NAME, HOSPITAL_FULL_NAME, doctors_db, INFO_FAQ, FACILITY_DIRECTIONS, LOCATION_INFO, SYSTEM_PROMPT
+
+TENANT_FIELDS = ("doctors", "faq", "facility_directions", "location_info", "system_prompt")
+_TENANT_ENVIRON_KEY = "HTTP_" + TENANT_HEADER.upper().replace("-", "_")
+
+
+def freeze(value):
+    """Salinan read-only: dict -> MappingProxyType, list -> tuple (rekursif)."""
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Kebalikan freeze, untuk jsonify."""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+class Tenant:
+    __slots__ = ("id", "version", "name", "hosts", "admins", "doctors", "all_doctors", "faq",
+                 "facility_directions", "location_info", "system_prompt")
+
+    def __init__(self, tenant_id: str, name: str, hosts: tuple, doctors, faq, facility_directions,
+                 location_info: str, system_prompt: str, version: int = 1, admins=()):
+        values = {
+            "id": tenant_id, "version": version, "name": name, "hosts": tuple(hosts),
+            "admins": frozenset(email.strip().lower() for email in admins),
+            "doctors": doctors, "all_doctors": tuple(doctors.get("umum", ())) + tuple(doctors.get("psikiater", ())),
+            "faq": faq, "facility_directions": facility_directions,
+            "location_info": location_info, "system_prompt": system_prompt,
+        }
+        for slot, value in values.items():
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Tenant immutable; pakai TenantRegistry.replace()")
+
+    def __repr__(self):
+        return f"<Tenant {self.id} v{self.version}>"
+
+    def replace(self, **changes) -> "Tenant":
+        """Snapshot baru dengan versi +1; field yang tidak diubah tetap objek yang sama."""
+        fields = {field: getattr(self, field) for field in TENANT_FIELDS}
+        fields.update({field: freeze(value) for field, value in changes.items()})
+        return Tenant(self.id, self.name, self.hosts, version=self.version + 1, admins=self.admins, **fields)
+
+
+def _default_tenant() -> Tenant:
+    return Tenant(
+        DEFAULT_TENANT, HOSPITAL_NAME, (), freeze(doctors_db), freeze(INFO_FAQ), freeze(FACILITY_DIRECTIONS),
+        LOCATION_INFO, SYSTEM_PROMPT.replace("{name}", HOSPITAL_FULL_NAME), admins=ADMIN_EMAILS
+    )
+
+
+class TenantRegistry:
+    def __init__(self, config: dict | None = None):
+        self.default = _default_tenant()
+        self.tenants = {self.default.id: self.default}
+        # Snapshot dari konfigurasi (data.py / TENANTS_FILE), sebelum diganti data database.
+        self.configured = {self.default.id: self.default}
+        self.by_host = {}
+        for tenant_id, settings in (config or {}).items():
+            self.add(tenant_id, settings)
+
+    def add(self, tenant_id: str, settings: dict) -> Tenant:
+        base = self.default
+        unknown = set(settings) - set(TENANT_FIELDS) - {"name", "hosts", "admins"}
+        if unknown:
+            raise ValueError(f"Tenant {tenant_id}: field tidak dikenal {', '.join(sorted(unknown))}")
+        name = settings.get("name", base.name)
+        fields = {field: freeze(settings[field]) if field in settings else getattr(base, field)
+                  for field in TENANT_FIELDS}
+        if "system_prompt" in settings or name != base.name:
+            fields["system_prompt"] = settings.get("system_prompt", SYSTEM_PROMPT).replace("{name}", name)
+        hosts = tuple(host.lower() for host in settings.get("hosts", ()))
+        # Admin tidak diwariskan: tenant tanpa "admins" tidak punya admin (kecuali default = ADMIN_EMAILS).
+        admins = settings.get("admins", ADMIN_EMAILS if tenant_id == base.id else ())
+        tenant = Tenant(tenant_id, name, hosts, admins=admins, **fields)
+        if tenant_id == self.default.id:
+            self.default = tenant
+        self.tenants[tenant_id] = self.configured[tenant_id] = tenant
+        for host in hosts:
+            self.by_host[host] = tenant_id
+        return tenant
+
+    def get(self, tenant_id: str) -> Tenant | None:
+        return self.tenants.get(tenant_id)
+
+    def all(self) -> list:
+        return list(self.tenants.values())
+
+    def resolve(self, host: str, header: str | None = None) -> Tenant | None:
+        """Tenant untuk request; None bila header menyebut tenant yang tidak dikenal."""
+        if header:
+            return self.tenants.get(header)
+        tenant_id = self.by_host.get(host.rsplit(":", 1)[0].lower()) if self.by_host else None
+        return self.tenants[tenant_id] if tenant_id else self.tenants[self.default.id]
+
+    def replace(self, tenant_id: str, **changes) -> Tenant:
+        """Pasang snapshot baru untuk tenant; request yang sedang berjalan tetap memakai snapshot lamanya."""
+        tenant = self.tenants[tenant_id].replace(**changes)
+        self.tenants[tenant_id] = tenant
+        if tenant_id == self.default.id:
+            self.default = tenant
+        return tenant
+
+
+def load_tenant_config(path: str = TENANTS_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+_tenant_registry_instance = None
+
+def get_tenant_registry():
+    global _tenant_registry_instance
+    if _tenant_registry_instance is None:
+        _tenant_registry_instance = TenantRegistry(load_tenant_config())
+        if len(_tenant_registry_instance.tenants) > 1:
+            logging.info(f"[TENANT] {len(_tenant_registry_instance.tenants)} tenant dimuat dari {TENANTS_FILE}")
+    return _tenant_registry_instance
+
+def current_tenant() -> Tenant:
+    """Tenant request ini; di luar request (CLI, thread latar) tenant default."""
+    if has_request_context():
+        tenant = g.get("tenant")
+        if tenant is not None:
+            return tenant
+    return get_tenant_registry().default
+
+
+def bind_tenant():
+    environ = request.environ
+    header = environ.get(_TENANT_ENVIRON_KEY)
+    tenant = get_tenant_registry().resolve(environ.get("HTTP_HOST", ""), header)
+    if tenant is None:
+        return jsonify({"success": False, "message": f"Tenant '{header}' tidak dikenal"}), 404
+    g.tenant = tenant
+
+def tenant_template_context() -> dict:
+    return {"hospital_name": current_tenant().name}
+
+def init_tenancy(app):
+    """Daftarkan resolusi tenant per request dan nama RS untuk template."""
+    app.before_request(bind_tenant)
+    app.context_processor(tenant_template_context)
+
+
+class TenantCache:
+    """Cache per tenant di satu dict bersama, dibangun lazy dengan build(tenant)."""
+
+    def __init__(self, name: str, build):
+        self.name = name
+        self.build = build
+        self.entries = {}
+        _tenant_caches.append(self)
+
+    def get(self, tenant: Tenant):
+        entry = self.entries.get(tenant.id)
+        if entry is not None and entry[0] == tenant.version:
+            return entry[1]
+        value = self.build(tenant)
+        current = self.entries.get(tenant.id)
+        # Request yang masih memegang snapshot lama tidak boleh menimpa cache versi baru.
+        if current is None or current[0] <= tenant.version:
+            self.entries[tenant.id] = (tenant.version, value)
+        return value
+
+    def peek(self, tenant: Tenant):
+        entry = self.entries.get(tenant.id)
+        return entry[1] if entry is not None and entry[0] == tenant.version else None
+
+    def values(self) -> list:
+        return [value for _, value in list(self.entries.values())]
+
+    def evict(self, key=None):
+        """key = id tenant; None = semua tenant."""
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
+
+_tenant_caches = []
+
+
+_SHARED_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+def deep_size(root, seen: set) -> int:
+    """Ukuran objek beserta isinya, melewati objek yang sudah ada di `seen` (dibagi dengan tenant sebelumnya)."""
+    size = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
+
+def memory_report() -> list:
+    """Memori tambahan per tenant: snapshot data + cache yang sudah dibangun.
+
+    Tenant dihitung berurutan (default dulu) dengan satu himpunan `seen`,
+    jadi objek yang dipakai bersama hanya dihitung pada tenant pertama yang
+    memakainya; angka tenant berikutnya adalah biaya menambah tenant itu.
+    """
+    seen = set()
+    report = []
+    for tenant in get_tenant_registry().all():
+        row = {"id": tenant.id, "name": tenant.name, "version": tenant.version, "hosts": list(tenant.hosts),
+               "doctors": len(tenant.all_doctors), "snapshot_kb": round(deep_size(tenant, seen) / 1024, 1)}
+        total = row["snapshot_kb"]
+        for cache in _tenant_caches:
+            value = cache.peek(tenant)
+            row[f"{cache.name}_kb"] = round(deep_size(value, seen) / 1024, 1) if value is not None else None
+            total += row[f"{cache.name}_kb"] or 0
+        row["total_kb"] = round(total, 1)
+        report.append(row)
+    return report
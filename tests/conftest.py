@@ -0,0 +1,120 @@
+"""
+Fixture bersama: server Ollama tiruan di proses yang sama dan pool backend
+berisi server-server tersebut. Tidak butuh Ollama maupun PostgreSQL.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('INVALIDATION_BACKEND', 'none')
+
+import llm
+
+
+class FakeOllama:
+    """Server NDJSON tiruan; `mode` bisa diganti selagi jalan: ok, error, slow."""
+
+    def __init__(self, tokens: tuple = None, token_delay: float = 0.0, slow_seconds: float = 2.0):
+        self.mode = "ok"
+        self.token_delay = token_delay
+        self.slow_seconds = slow_seconds
+        self.posts = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.send_response(500 if fake.mode == "error" else 200)
+                self.end_headers()
+                self.wfile.write(b'{"models": []}')
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                with fake.lock:
+                    fake.posts += 1
+                if fake.mode == "error":
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                try:
+                    if fake.mode == "slow":
+                        time.sleep(fake.slow_seconds)
+                    for token in fake.tokens:
+                        time.sleep(fake.token_delay)
+                        self.wfile.write((json.dumps({"message": {"content": token}, "done": False}) + "\n").encode())
+                        self.wfile.flush()
+                    self.wfile.write((json.dumps({
+                        "message": {"content": ""}, "done": True, "prompt_eval_count": 10, "eval_count": len(fake.tokens)
+                    }) + "\n").encode())
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 256
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.tokens = tokens or ("Halo ", "dari ", f"port {self.server.server_address[1]}.")
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_ollama():
+    """Pabrik FakeOllama; semua server dimatikan setelah tes."""
+    servers = []
+
+    def start(**kwargs) -> FakeOllama:
+        server = FakeOllama(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def backend_pool(monkeypatch):
+    """Pabrik BackendPool yang dipasang sebagai pool global llm, dengan breaker cepat untuk tes."""
+    pools = []
+
+    def build(*servers, hedge_seconds: float = 0.0) -> llm.BackendPool:
+        pool = llm.BackendPool([server.url for server in servers])
+        for backend in pool.backends.values():
+            backend.breaker.open_seconds = 0.3
+            backend.breaker.probe_interval = 0.05
+        monkeypatch.setattr(llm, "_backend_pool_instance", pool)
+        monkeypatch.setattr(llm, "LLM_HEDGE_SECONDS", hedge_seconds)
+        pools.append(pool)
+        return pool
+
+    yield build
+    for pool in pools:
+        for backend in list(pool.backends.values()):
+            backend.breaker.stop()
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
@@ -0,0 +1,129 @@
+"""Failover, circuit breaker dan hedging BackendPool terhadap server Ollama tiruan."""
+import llm
+from conftest import wait_until
+
+CircuitBreaker = llm.CircuitBreaker
+
+
+def _payload():
+    return llm._build_payload("jadwal dokter anak")
+
+
+def _port(server) -> str:
+    return server.url.rsplit(":", 1)[1]
+
+
+def test_failover_routes_every_request_to_healthy_backend(fake_ollama, backend_pool):
+    a, b = fake_ollama(), fake_ollama()
+    a.mode = "error"
+    pool = backend_pool(a, b)
+    backend_a, backend_b = pool.backends[a.url], pool.backends[b.url]
+    # A selalu dipilih duluan (skor beban 0) sampai circuit-nya terbuka.
+    backend_b.ewma_latency = 1.0
+
+    answers = [llm._generate(_payload()) for _ in range(10)]
+
+    assert all(answer is not None and _port(b) in answer["content"] for answer in answers)
+    assert backend_a.breaker.state == CircuitBreaker.OPEN
+    assert a.posts == backend_a.breaker.min_calls
+    assert pool.get_state()["available"] == 1
+
+
+def test_breaker_open_skips_backend(fake_ollama, backend_pool):
+    a = fake_ollama()
+    a.mode = "error"
+    pool = backend_pool(a)
+    backend_a = pool.backends[a.url]
+    backend_a.breaker.open_seconds = 60
+
+    for _ in range(backend_a.breaker.min_calls):
+        assert llm._generate(_payload()) is None
+    assert backend_a.breaker.state == CircuitBreaker.OPEN
+
+    posts = a.posts
+    assert llm._generate(_payload()) is None
+    assert a.posts == posts
+    assert pool.get_state()["available"] == 0
+
+
+def test_half_open_trial_success_closes_breaker(fake_ollama, backend_pool):
+    a, b = fake_ollama(), fake_ollama()
+    pool = backend_pool(a, b)
+    backend_a, backend_b = pool.backends[a.url], pool.backends[b.url]
+    a.mode = "error"
+    with backend_a.breaker.lock:
+        backend_a.breaker._open("tes")
+
+    a.mode = "ok"
+    assert wait_until(lambda: backend_a.breaker.state == CircuitBreaker.HALF_OPEN)
+    backend_a.ewma_latency, backend_b.ewma_latency = 0.0, 1.0
+    result = llm._generate(_payload())
+
+    assert result is not None and _port(a) in result["content"]
+    assert backend_a.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_trial_failure_reopens_and_falls_over(fake_ollama, backend_pool):
+    a, b = fake_ollama(), fake_ollama()
+    pool = backend_pool(a, b)
+    backend_a, backend_b = pool.backends[a.url], pool.backends[b.url]
+    with backend_a.breaker.lock:
+        backend_a.breaker.state = CircuitBreaker.HALF_OPEN
+    a.mode = "error"
+    backend_a.ewma_latency, backend_b.ewma_latency = 0.0, 1.0
+
+    result = llm._generate(_payload())
+
+    assert result is not None and _port(b) in result["content"]
+    assert backend_a.breaker.state == CircuitBreaker.OPEN
+
+
+def test_retry_when_primary_fails_before_hedge_delay(fake_ollama, backend_pool):
+    a, b = fake_ollama(), fake_ollama()
+    a.mode = "error"
+    pool = backend_pool(a, b, hedge_seconds=1.0)
+    pool.backends[b.url].ewma_latency = 1.0
+
+    result = llm._generate(_payload())
+
+    assert result is not None and _port(b) in result["content"]
+    assert (a.posts, b.posts) == (1, 1)
+
+
+def test_hedge_cancels_slow_trial_and_releases_slot(fake_ollama, backend_pool):
+    a, b = fake_ollama(slow_seconds=1.0), fake_ollama()
+    pool = backend_pool(a, b, hedge_seconds=0.2)
+    backend_a, backend_b = pool.backends[a.url], pool.backends[b.url]
+    with backend_a.breaker.lock:
+        backend_a.breaker.state = CircuitBreaker.HALF_OPEN
+    a.mode = "slow"
+    backend_a.ewma_latency, backend_b.ewma_latency = 0.0, 1.0
+
+    result = llm._generate(_payload())
+
+    assert result is not None and _port(b) in result["content"]
+    assert wait_until(lambda: backend_a.in_flight == 0, timeout=a.slow_seconds + 2)
+    assert backend_a.breaker.state == CircuitBreaker.HALF_OPEN
+    assert backend_a.breaker.available()
+    assert pool.get_state()["available"] == 2
+
+    # Slot percobaan yang dilepas dipakai request berikutnya dan menutup circuit.
+    a.mode = "ok"
+    backend_a.ewma_latency = 0.0
+    result = llm._generate(_payload())
+    assert result is not None and _port(a) in result["content"]
+    assert backend_a.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_remove_backend_stops_probe_thread(fake_ollama, backend_pool):
+    a, b = fake_ollama(), fake_ollama()
+    pool = backend_pool(a, b)
+    backend_a = pool.backends[a.url]
+    backend_a.breaker.open_seconds = 60
+    with backend_a.breaker.lock:
+        backend_a.breaker._open("tes")
+    probe_thread = backend_a.breaker._probe_thread
+
+    assert pool.remove_backend(a.url)
+    assert wait_until(lambda: not probe_thread.is_alive(), timeout=1.0)
+    assert list(pool.backends) == [b.url]
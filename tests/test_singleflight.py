@@ -0,0 +1,68 @@
+"""Single-flight: request identik serentak menjadi satu panggilan backend."""
+import threading
+
+import pytest
+
+import llm
+from tenants import TenantRegistry
+
+TOKENS = ("Poli ", "anak ", "buka ", "Senin ", "sampai ", "Jumat.")
+QUESTION = "jam buka poli anak?"
+
+
+@pytest.fixture
+def backend(fake_ollama, backend_pool, monkeypatch):
+    # Token dialirkan pelan-pelan supaya request benar-benar tumpang tindih.
+    server = fake_ollama(tokens=TOKENS, token_delay=0.05)
+    backend_pool(server)
+    monkeypatch.setattr(llm, "_singleflight_instance", llm.SingleFlight())
+    return server
+
+
+def burst(calls: list) -> list:
+    """Jalankan call_llm_with_usage(**kwargs) untuk tiap kwargs secara serentak."""
+    results = [None] * len(calls)
+    gate = threading.Barrier(len(calls))
+
+    def worker(index: int):
+        gate.wait()
+        results[index] = llm.call_llm_with_usage(QUESTION, **calls[index])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_requests_make_one_backend_call(backend):
+    results = burst([{}] * 10)
+
+    assert backend.posts == 1
+    assert all(result is not None for result in results)
+    assert {result["content"] for result in results} == {"".join(TOKENS)}
+    sources = [result["source"] for result in results]
+    assert sources.count("llm") == 1 and sources.count("cache") == 9
+    assert llm.get_singleflight().get_stats()["coalesced"] == 9
+
+
+def test_different_system_prompts_are_not_coalesced(backend):
+    registry = TenantRegistry()
+    results = burst([{"tenant": registry.default}, {"tenant": registry.default, "context": "Poli anak di lantai 2."}])
+
+    assert backend.posts == 2
+    assert [result["source"] for result in results] == ["llm", "llm"]
+
+
+def test_different_tenants_are_not_coalesced(backend):
+    registry = TenantRegistry({
+        "bandung": {"name": "RS Sehat Selalu Bandung"},
+        # Nama dan prompt sama dengan default: tetap tenant lain, tetap tidak digabung.
+        "cabang": {},
+    })
+    results = burst([{"tenant": registry.default}, {"tenant": registry.get("bandung")},
+                     {"tenant": registry.get("cabang")}])
+
+    assert backend.posts == 3
+    assert [result["source"] for result in results] == ["llm", "llm", "llm"]
@@ -0,0 +1,161 @@
+"""
+Normalisasi slang dan koreksi typo untuk rule engine.
+
+Setiap kata di input dipetakan lewat kamus slang, lalu (jika masih belum
+dikenal) dicocokkan ke kosakata rule memakai indeks delete ala SymSpell:
+semua varian hapus-1/hapus-2 huruf dari kosakata dihitung sekali saat
+build, sehingga lookup per kata cukup beberapa akses dict.
+"""
+import re
+import time
+import logging
+from itertools import combinations
+
+SLANG_DICTIONARY = {
+    "gmn": "gimana", "gmna": "gimana", "piye": "gimana", "kumaha": "gimana",
+    "dmn": "dimana", "dmana": "dimana", "dmna": "dimana", "neng ndi": "dimana", "endi": "dimana",
+    "kpn": "kapan", "brp": "berapa", "brapa": "berapa", "jm": "jam",
+    "dok": "dokter", "dktr": "dokter",
+    "jdwl": "jadwal", "jdw": "jadwal",
+    "mksh": "makasih", "makasi": "makasih", "maacih": "makasih", "trims": "terima kasih",
+    "trimakasih": "terima kasih", "tq": "thanks", "thx": "thanks", "tengkyu": "thanks",
+    "bkin": "buat", "bikin": "buat", "jnji": "janji", "bokin": "booking",
+    "alamat": "lokasi", "alamatnya": "lokasi",
+    "kamar kecil": "toilet", "wese": "wc", "jamban": "toilet",
+    "solat": "sholat", "shalat": "sholat", "mushola": "musholla", "musala": "musholla",
+    "halo2": "halo", "hallo": "halo", "helo": "halo", "hay": "hai", "hy": "hai",
+    "askum": "assalamualaikum", "asw": "assalamualaikum",
+    "daah": "dadah", "bye2": "bye", "dadaa": "dadah",
+    "opo": "apa", "ape": "apa", "yg": "yang", "utk": "untuk", "sy": "saya", "gw": "saya",
+    "gue": "saya", "aq": "aku", "ak": "aku", "bs": "bisa", "tdk": "tidak", "sm": "sama",
+}
+
+COMMON_WORDS = {
+    "hari", "salam", "jadi", "sama", "lagi", "kami", "kita", "mana", "sakit", "kaki", "tangan",
+    "mata", "gigi", "kulit", "perut", "dada", "kepala", "demam", "batuk", "pilek", "obat",
+    "rumah", "pagi", "siang", "sore", "malam", "besok", "kemarin", "minggu", "bulan", "tahun",
+    "senin", "selasa", "rabu", "kamis", "jumat", "sabtu", "yang", "untuk", "dengan", "dari",
+    "pada", "atau", "juga", "sudah", "belum", "masih", "bisa", "boleh", "harus", "perlu",
+    "tidak", "bukan", "saya", "kamu", "anda", "mereka", "dia", "ini", "itu", "apa", "siapa",
+    "kapan", "berapa", "gimana", "bagaimana", "kenapa", "mengapa", "baik", "buruk", "besar",
+    "kecil", "lama", "baru", "ingin", "mau", "tolong", "mohon", "kasih", "terima", "biaya",
+    "harga", "kamar", "pasien", "keluarga", "suami", "istri", "ibu", "bapak", "adik", "kakak",
+    "dalam", "luar", "atas", "bawah", "depan", "belakang", "antri", "antre", "nomor", "kartu",
+    "rawat", "inap", "jalan", "periksa", "operasi", "perawat", "suster", "bidan", "vaksin",
+    "hamil", "lahir", "darah", "resep", "hasil", "surat", "rujukan", "asuransi", "bpjs",
+}
+
+
+def _deletes(word: str, max_distance: int) -> set:
+    variants = set()
+    for distance in range(1, max_distance + 1):
+        if len(word) - distance < 1:
+            break
+        for positions in combinations(range(len(word)), distance):
+            variants.add("".join(c for i, c in enumerate(word) if i not in positions))
+    return variants
+
+
+def _edit_distance(a: str, b: str, max_distance: int) -> int:
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        previous_previous, previous = previous, current
+    return previous[len(b)]
+
+
+class FuzzyMatcher:
+    WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, vocabulary, slang: dict = SLANG_DICTIONARY, protected=COMMON_WORDS,
+                 max_distance: int = 2, min_length: int = 4, max_length: int = 20, base=None):
+        """`base`: matcher bersama yang indeks, slang dan pengaturannya dipakai ulang; indeks
+        matcher ini hanya berisi kata di luar vocabulary base (mis. roster dokter per tenant).
+        Base boleh punya base lagi, jadi lapisan bersama bisa bertingkat."""
+        started = time.perf_counter()
+        base_layers = base.layers if base is not None else ()
+        if base is not None:
+            self.vocabulary = {w for w in vocabulary if w and not any(w in layer.vocabulary for layer in base_layers)}
+            self.slang, self.slang_phrases, self.protected = base.slang, base.slang_phrases, base.protected
+            max_distance, min_length, max_length = base.max_distance, base.min_length, base.max_length
+        else:
+            self.vocabulary = {w for w in vocabulary if w}
+            self.slang = {k: v for k, v in slang.items() if " " not in k}
+            self.slang_phrases = [(re.compile(rf"\b{re.escape(k)}\b"), v) for k, v in slang.items() if " " in k]
+            self.protected = set(protected)
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.max_length = max_length
+        self.cache = {}
+        self.layers = (self,) + base_layers
+
+        # Hampir semua variant hanya milik satu kata: simpan str-nya langsung, set hanya
+        # bila dipakai bersama. Menghemat ~200 byte per entri, terasa saat ada banyak tenant.
+        self.deletes = {}
+        for word in self.vocabulary:
+            if len(word) < self.min_length:
+                continue
+            for variant in _deletes(word, self.max_distance) | {word}:
+                existing = self.deletes.get(variant)
+                if existing is None:
+                    self.deletes[variant] = word
+                elif isinstance(existing, str):
+                    self.deletes[variant] = {existing, word}
+                else:
+                    existing.add(word)
+        self.build_seconds = time.perf_counter() - started
+        logging.info(
+            f"[FUZZY] Index built: {len(self.vocabulary)} words, "
+            f"{len(self.deletes)} deletes in {self.build_seconds * 1000:.1f} ms"
+        )
+
+    def _allowed_distance(self, token: str) -> int:
+        return 1 if len(token) <= 6 else self.max_distance
+
+    def correct(self, token: str) -> str:
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
+
+        layers = self.layers
+        result = self.slang.get(token, token)
+        if (result == token and token not in self.protected
+                and not any(token in layer.vocabulary for layer in layers)
+                and self.min_length <= len(token) <= self.max_length and not token.isdigit()):
+            max_distance = self._allowed_distance(token)
+            candidates = set()
+            for variant in _deletes(token, max_distance) | {token}:
+                for layer in layers:
+                    words = layer.deletes.get(variant)
+                    if words is None:
+                        continue
+                    if isinstance(words, str):
+                        candidates.add(words)
+                    else:
+                        candidates |= words
+
+            best = None
+            for candidate in candidates:
+                distance = _edit_distance(token, candidate, max_distance)
+                if distance <= max_distance and (best is None or (distance, candidate) < best):
+                    best = (distance, candidate)
+            if best is not None:
+                result = best[1]
+
+        if len(self.cache) < 50000:
+            self.cache[token] = result
+        return result
+
+    def normalize(self, text: str) -> str:
+        text = text.lower()
+        for pattern, replacement in self.slang_phrases:
+            text = pattern.sub(replacement, text)
+        return self.WORD_PATTERN.sub(lambda m: self.correct(m.group(0)), text)
@@ -0,0 +1,230 @@
+"""
+Transport WebSocket untuk chat (/ws/chat).
+
+User diautentikasi sekali saat handshake; setelah itu pesan lewat koneksi
+yang sama tanpa decode cookie / lookup session per pesan. Handshake yang
+berhasil berarti sudah terautentikasi (gagal = HTTP 401). Pipeline-nya sama
+dengan POST /api/chat (chat_service.process_message).
+
+Frame (JSON):
+    client -> {"message": "..."}
+    server -> {"type": "token", "text": "..."}     potongan jawaban LLM, dibatch per WS_TOKEN_FLUSH_MS
+              {"type": "reply", "reply": {...}, "quota": {...}}   jawaban final yang sudah disanitasi
+              {"type": "error", "message": "..."}
+
+Heartbeat: server mengirim ping tiap WS_PING_SECONDS dan menutup koneksi
+yang diam lebih dari WS_IDLE_SECONDS. Backpressure: koneksi per proses
+dibatasi WS_MAX_CONNECTIONS, frame di atas WS_MAX_MESSAGE_BYTES ditolak oleh
+simple_websocket (koneksi ditutup), dan pesan masuk dibaca thread pembaca ke
+antrian sendiri berkapasitas WS_MAX_PENDING selagi satu pesan diproses; bila
+antrian penuh client dikirimi error lalu koneksi ditutup (1008). send()
+memblok saat client lambat membaca sehingga stream token ikut melambat
+alih-alih menumpuk di server.
+"""
+import json
+import time
+import queue
+import logging
+import threading
+
+from flask import Response, request, jsonify, session
+
+from config import (
+    SESSION_MODE, WS_MAX_CONNECTIONS, WS_PING_SECONDS, WS_IDLE_SECONDS, WS_REAUTH_SECONDS,
+    WS_MAX_MESSAGE_BYTES, WS_MAX_PENDING, WS_TOKEN_FLUSH_MS
+)
+from auth import get_current_user
+from database import close_connection
+from chat_service import process_message
+from tenants import current_tenant, get_tenant_registry
+
+CLOSE_POLICY_VIOLATION = 1008
+
+_slots = threading.BoundedSemaphore(WS_MAX_CONNECTIONS)
+_stats = {"active": 0, "opened": 0, "rejected": 0, "messages": 0, "dropped": 0, "token_frames": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str, delta: int = 1):
+    with _stats_lock:
+        _stats[key] += delta
+
+def get_socket_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats, max_connections=WS_MAX_CONNECTIONS)
+
+
+class _SocketResponse(Response):
+    """Response setelah koneksi WebSocket selesai (sama seperti flask-sock)."""
+    def __init__(self, ws):
+        super().__init__()
+        self.ws = ws
+
+    def __call__(self, *args, **kwargs):
+        if self.ws.mode == 'gunicorn':
+            raise StopIteration()
+        if self.ws.mode == 'werkzeug':
+            return super().__call__(*args, **kwargs)
+        return []
+
+
+class _Connection:
+    """Satu koneksi WebSocket: thread pembaca mengisi antrian pesan bounded milik kita.
+
+    Thread pembaca dan thread handler sama-sama bisa mengirim frame (error
+    overflow vs token/jawaban), jadi send dan close diserialkan dengan lock.
+    """
+    def __init__(self, ws):
+        from simple_websocket import ConnectionClosed
+        self.ws = ws
+        self.ConnectionClosed = ConnectionClosed
+        self.inbox = queue.Queue(maxsize=max(1, WS_MAX_PENDING))
+        self.closed = threading.Event()
+        self.send_lock = threading.Lock()
+        self.reader = threading.Thread(target=self._read, name="ws-reader", daemon=True)
+
+    def start(self):
+        self.reader.start()
+        return self
+
+    def send(self, payload: dict):
+        with self.send_lock:
+            self.ws.send(json.dumps(payload))
+
+    def close(self, reason=None, message=None):
+        self.closed.set()
+        with self.send_lock:
+            self.ws.close(reason=reason, message=message)
+
+    def _read(self):
+        try:
+            while not self.closed.is_set():
+                raw = self.ws.receive()
+                if raw is None:
+                    continue
+                try:
+                    self.inbox.put_nowait(raw)
+                except queue.Full:
+                    _count("dropped")
+                    logging.warning(f"[WS] Antrian pesan penuh ({WS_MAX_PENDING}) - koneksi ditutup")
+                    self.send({"type": "error", "message": "Terlalu banyak pesan, tunggu jawaban sebelum mengirim lagi"})
+                    self.close(reason=CLOSE_POLICY_VIOLATION, message="terlalu banyak pesan")
+                    return
+        except self.ConnectionClosed:
+            pass
+        except Exception:
+            logging.exception("[WS] Thread pembaca berhenti")
+        finally:
+            self.closed.set()
+            try:
+                self.inbox.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def receive(self, timeout: float):
+        """Pesan berikutnya; None bila koneksi sudah tertutup. queue.Empty bila idle."""
+        raw = self.inbox.get(timeout=timeout)
+        return None if raw is None or self.closed.is_set() else raw
+
+
+class _TokenBatcher:
+    """Kumpulkan token LLM dan kirim sebagai satu frame tiap WS_TOKEN_FLUSH_MS."""
+    def __init__(self, conn: _Connection):
+        self.conn = conn
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def push(self, token: str):
+        self.buffer.append(token)
+        if time.monotonic() - self.last_flush >= WS_TOKEN_FLUSH_MS / 1000:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.conn.send({"type": "token", "text": "".join(self.buffer)})
+            self.buffer = []
+            _count("token_frames")
+        self.last_flush = time.monotonic()
+
+
+def handle_chat_socket():
+    user = get_current_user()
+    close_connection()
+    if user is None:
+        return jsonify({"success": False, "message": "Silakan login terlebih dahulu"}), 401
+    if not _slots.acquire(blocking=False):
+        _count("rejected")
+        logging.warning(f"[WS] Koneksi ditolak, {WS_MAX_CONNECTIONS} koneksi sudah terbuka")
+        return jsonify({"success": False, "message": "Server sedang penuh, coba lagi nanti"}), 503
+
+    from simple_websocket import Server, ConnectionClosed
+
+    _count("opened")
+    _count("active")
+    ws = None
+    try:
+        ws = Server(request.environ, ping_interval=WS_PING_SECONDS or None, max_message_size=WS_MAX_MESSAGE_BYTES)
+        _serve(ws, user)
+    except ConnectionClosed:
+        pass
+    finally:
+        _count("active", -1)
+        _slots.release()
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+    logging.info(f"[WS] Koneksi user {user.id} ditutup")
+    return _SocketResponse(ws)
+
+def _serve(ws, user):
+    logging.info(f"[WS] Koneksi user {user.id} dibuka")
+    authenticated_at = time.monotonic()
+    # Tenant dipilih saat handshake; snapshot-nya diambil ulang per pesan supaya reload roster ikut terbaca.
+    tenant_id = current_tenant().id
+    registry = get_tenant_registry()
+    # Konteks percakapan per koneksi: session tidak bisa disimpan lagi setelah handshake.
+    state = {key: session[key] for key in ('last_intent',) if key in session}
+    conn = _Connection(ws).start()
+
+    while True:
+        try:
+            raw = conn.receive(timeout=WS_IDLE_SECONDS)
+        except queue.Empty:
+            conn.close(message="idle")
+            return
+        if raw is None:
+            return
+
+        # Mode signed cukup cek revocation list di memori; mode db re-validasi berkala.
+        if SESSION_MODE == 'signed' or time.monotonic() - authenticated_at > WS_REAUTH_SECONDS:
+            current = get_current_user()
+            close_connection()
+            if current is None:
+                conn.close(reason=CLOSE_POLICY_VIOLATION, message="session berakhir")
+                return
+            authenticated_at = time.monotonic()
+
+        try:
+            message = str(json.loads(raw).get("message", "")).strip()
+        except (ValueError, AttributeError):
+            conn.send({"type": "error", "message": "Format pesan tidak valid"})
+            continue
+        if not message:
+            continue
+
+        _count("messages")
+        batcher = _TokenBatcher(conn)
+        try:
+            result = process_message(user, message, on_token=batcher.push, tenant=registry.get(tenant_id), state=state)
+        except conn.ConnectionClosed:
+            raise
+        except Exception:
+            logging.exception(f"[WS] Gagal memproses pesan user {user.id}")
+            conn.send({"type": "error", "message": "Maaf, terjadi kesalahan saat memproses pesan. Silakan coba lagi."})
+            continue
+        finally:
+            close_connection()
+        batcher.flush()
+        conn.send(dict(result, type="reply"))